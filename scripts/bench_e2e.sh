@@ -0,0 +1,5 @@
+# End-to-end benchmark against the offline mock LLM server (no API key or token spend).
+# --latency: fixed:S | uniform:LOW,HIGH | normal:MEAN,STD | lognormal:MU,SIGMA (seconds per LLM call)
+python src/bench/e2e.py \
+    --latency lognormal:-1.5,0.3 \
+    --output bench_results/e2e.json
@@ -0,0 +1,3 @@
+# Import-time report of the CLI, queue, LLM client, execution worker, evaluator and service entry points.
+# Entry points with a budget in src/bench/importtime.py fail the run when their imports exceed it.
+python src/bench/importtime.py --output bench_results/importtime.json
@@ -0,0 +1,7 @@
+# Microbenchmarks for the MCTS and execution hot paths (mock LLM, synthetic trees and tables).
+# Store a baseline once, then compare later runs against it (ratios above --threshold are regressions).
+if [ -f bench_results/micro_baseline.json ]; then
+    python src/bench/micro.py --compare bench_results/micro_baseline.json
+else
+    python src/bench/micro.py --save_baseline bench_results/micro_baseline.json
+fi
@@ -9,4 +9,6 @@ python src/utils/evaluator.py \
 
 # Complete experiment:
 # for auto_pipeline --length_type 1 2 3 4 5 6 9 \
-# for buidlings  --length_type 1 2 3 4 5 6 7 8 9 10 11 12 13 14 15 \
\ No newline at end of file
+# for buidlings  --length_type 1 2 3 4 5 6 7 8 9 10 11 12 13 14 15 \
+# Targets too large for memory: add --streaming (row-hash comparison over target chunks),
+# optionally with --spill_dir to keep the row hashes on disk.
@@ -0,0 +1,14 @@
+# Multi-node run: enqueue the tasks once, then start this worker command on every node.
+# The queue database and result_dir must be on storage shared by all nodes.
+QUEUE=runs/auto_pipeline_queue.db
+ARGS="--base_path data/auto_pipeline --length_type 1 --start_num 0 --end_num 101 --queue $QUEUE"
+
+python src/main.py $ARGS --enqueue --log_path logs/mcts_queue_enqueue.txt
+
+python src/main.py $ARGS \
+    --result_dir result/auto_pipeline/qwen_32B/execution \
+    --log_path logs/mcts_qwen_32B_execution_$(hostname)_$$.txt
+
+# Progress and re-queueing failed tasks:
+# python src/utils/work_queue.py --queue $QUEUE stats
+# python src/utils/work_queue.py --queue $QUEUE requeue --status failed
@@ -0,0 +1,142 @@
+"""
+End-to-end benchmark: runs src/main.py on the bundled data/ tasks against the
+offline mock LLM server and reports tasks/hour, per-phase latency (from the
+per-task traces), LLM calls per task and peak memory of the solver process.
+
+    python src/bench/e2e.py --latency lognormal:-1.5,0.3 --output bench_results/e2e.json
+"""
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+import yaml
+
+from src.llm.mock_server import LatencyModel, serve
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_TASKS = [
+    # (base_path, length_type, start_num, end_num)
+    ("data/auto_pipeline", 1, 0, 1),
+    ("data/buildings", 1, 1, 2),
+]
+
+
+def _run_process(cmd: List[str], env: Dict[str, str], log_path: str):
+    """Run a command and return (wall seconds, exit status, peak RSS in MB) of that child alone."""
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(cmd, env=env, cwd=ROOT_DIR, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in KB on Linux.
+    return time.perf_counter() - start, process.returncode, usage.ru_maxrss / 1024
+
+
+def _phase_latency(trace_files: List[str]) -> Dict[str, Dict[str, float]]:
+    durations: Dict[str, List[float]] = {}
+    for path in trace_files:
+        with open(path, "r") as f:
+            for event in json.load(f)["traceEvents"]:
+                if event.get("ph") == "X":
+                    durations.setdefault(event["name"], []).append(event["dur"] / 1e6)
+    phases = {}
+    for name, values in sorted(durations.items()):
+        values = np.array(values)
+        phases[name] = {
+            "count": int(len(values)),
+            "total": float(values.sum()),
+            "mean": float(values.mean()),
+            "p50": float(np.percentile(values, 50)),
+            "p95": float(np.percentile(values, 95)),
+        }
+    return phases
+
+
+def run_benchmark(tasks=DEFAULT_TASKS, latency: str = "fixed:0", per_token_latency: float = 0.0,
+                  seed: int = 0, work_dir: str = None) -> Dict[str, Any]:
+    work_dir = work_dir or tempfile.mkdtemp(prefix="monteprep_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    server = serve(port=0, latency=LatencyModel(latency, per_token_latency, seed))
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    with open(os.path.join(ROOT_DIR, "src", "config", "default.yaml"), "r") as f:
+        config = yaml.safe_load(f)
+    config.setdefault("model_kwargs", {})["model_name"] = "mock"
+    config["tracing"] = {"enabled": True, "dir": os.path.join(work_dir, "traces")}
+    config_path = os.path.join(work_dir, "bench.yaml")
+    with open(config_path, "w") as f:
+        yaml.safe_dump(config, f)
+
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR, MOCK_LLM_BASE_URL=base_url)
+    runs = []
+    task_metrics: Dict[str, Any] = {}
+    for base_path, length_type, start_num, end_num in tasks:
+        result_dir = os.path.join(work_dir, "result", os.path.basename(base_path))
+        cmd = [sys.executable, os.path.join("src", "main.py"), "--base_path", base_path,
+               "--result_dir", result_dir, "--length_type", str(length_type),
+               "--start_num", str(start_num), "--end_num", str(end_num),
+               "--log_path", os.path.join(work_dir, "logs", f"{os.path.basename(base_path)}_{length_type}.txt"),
+               "--config", config_path]
+        wall, returncode, peak_rss = _run_process(cmd, env, os.path.join(work_dir, f"{os.path.basename(base_path)}_{length_type}.out"))
+        metrics = {}
+        for metrics_path in glob.glob(os.path.join(result_dir, "metrics_*.json")):
+            with open(metrics_path, "r") as f:
+                metrics.update(json.load(f))
+        task_metrics.update(metrics)
+        runs.append({"base_path": base_path, "length_type": length_type, "wall_time": wall,
+                     "returncode": returncode, "peak_rss_mb": peak_rss, "tasks": len(metrics)})
+    server.shutdown()
+
+    n_tasks = sum(run["tasks"] for run in runs)
+    wall_time = sum(run["wall_time"] for run in runs)
+    llm_calls = [m.get("search", {}).get("llm_calls", 0) for m in task_metrics.values()]
+    return {
+        "latency": latency,
+        "tasks": n_tasks,
+        "wall_time": wall_time,
+        "tasks_per_hour": n_tasks / wall_time * 3600 if wall_time else 0.0,
+        "llm_calls_per_task": float(np.mean(llm_calls)) if llm_calls else 0.0,
+        "peak_rss_mb": max((run["peak_rss_mb"] for run in runs), default=0.0),
+        "phases": _phase_latency(glob.glob(os.path.join(work_dir, "traces", "**", "*.trace.json"), recursive=True)),
+        "server": dict(server.llm.stats),
+        "runs": runs,
+        "task_metrics": task_metrics,
+        "work_dir": work_dir,
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"Tasks: {report['tasks']}  wall: {report['wall_time']:.2f}s  "
+          f"tasks/hour: {report['tasks_per_hour']:.1f}  LLM calls/task: {report['llm_calls_per_task']:.1f}  "
+          f"peak RSS: {report['peak_rss_mb']:.0f} MB")
+    print(f"{'phase':<40}{'count':>8}{'total s':>10}{'mean ms':>10}{'p95 ms':>10}")
+    for name, stats in report["phases"].items():
+        print(f"{name:<40}{stats['count']:>8}{stats['total']:>10.3f}{stats['mean'] * 1e3:>10.2f}{stats['p95'] * 1e3:>10.2f}")
+    for run in report["runs"]:
+        if run["returncode"] != 0:
+            print(f"WARNING: {run['base_path']} exited with {run['returncode']}, see {report['work_dir']}")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="End-to-end MontePrep benchmark against the mock LLM server")
+    parser.add_argument("--latency", type=str, default="fixed:0", help="Mock LLM latency distribution")
+    parser.add_argument("--per_token_latency", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work_dir", type=str, default=None, help="Directory for results, logs and traces (default: temp dir)")
+    parser.add_argument("--output", type=str, default=None, help="Write the report JSON here")
+    args = parser.parse_args()
+
+    report = run_benchmark(latency=args.latency, per_token_latency=args.per_token_latency,
+                           seed=args.seed, work_dir=args.work_dir)
+    print_report(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,116 @@
+"""
+Import-time report for the process entry points, based on `python -X importtime`.
+
+Each entry module is imported in a fresh interpreter (best of `--repeat` runs) and
+reported with its total import time, the heaviest third-party packages and the
+heaviest project modules. Entry points with a budget fail the run when they exceed it.
+
+    python src/bench/importtime.py
+    python src/bench/importtime.py --module src.mcts.reward --top 20
+"""
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# entry point -> (module, import budget in ms or None)
+ENTRY_POINTS = {
+    "cli": ("src.main", 150),
+    "queue": ("src.utils.work_queue", 100),
+    "llm_client": ("src.llm", 100),
+    "static_check": ("src.mcts.static_check", 100),
+    # Executing candidates and scoring results needs pandas, which dominates these two.
+    "execution_worker": ("src.mcts.reward", None),
+    "evaluator": ("src.utils.evaluator", None),
+    "solver": ("src.mcts.mcts", None),
+    "service": ("src.service", None),
+}
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Rows of `-X importtime` output: module, self and cumulative microseconds, nesting level."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append({
+            "module": name.strip(),
+            "level": (len(name) - len(name.lstrip())) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    return rows
+
+
+def profile_module(module: str, repeat: int = 3) -> Dict[str, Any]:
+    """Import `module` in `repeat` fresh interpreters and keep the fastest run."""
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr.splitlines()[-1] if proc.stderr else ''}")
+        rows = parse_importtime(proc.stderr)
+        total_us = sum(row["self_us"] for row in rows)
+        if best is None or total_us < best["total_us"]:
+            best = {"total_us": total_us, "rows": rows}
+    packages: Dict[str, int] = {}
+    project: Dict[str, int] = {}
+    for row in best["rows"]:
+        top = row["module"].split(".")[0]
+        if top == "src":
+            project[row["module"]] = row["self_us"]
+        else:
+            packages[top] = packages.get(top, 0) + row["self_us"]
+    return {
+        "module": module,
+        "total_ms": best["total_us"] / 1000,
+        "modules": len(best["rows"]),
+        "packages_ms": {name: us / 1000 for name, us in sorted(packages.items(), key=lambda item: -item[1])},
+        "project_ms": {name: us / 1000 for name, us in sorted(project.items(), key=lambda item: -item[1])},
+    }
+
+
+def run_report(entries: Dict[str, tuple], repeat: int = 3, top: int = 5) -> Dict[str, Any]:
+    report = {}
+    for name, (module, budget_ms) in entries.items():
+        result = profile_module(module, repeat)
+        result["budget_ms"] = budget_ms
+        result["over_budget"] = budget_ms is not None and result["total_ms"] > budget_ms
+        report[name] = result
+        budget = f" (budget {budget_ms} ms{', OVER' if result['over_budget'] else ''})" if budget_ms is not None else ""
+        print(f"{name:<18} {module:<24} {result['total_ms']:8.1f} ms  {result['modules']:4d} modules{budget}")
+        heaviest = list(result["packages_ms"].items())[:top]
+        if heaviest:
+            print("    packages: " + ", ".join(f"{pkg} {ms:.1f}" for pkg, ms in heaviest))
+        own = list(result["project_ms"].items())[:top]
+        if own:
+            print("    project:  " + ", ".join(f"{mod} {ms:.1f}" for mod, ms in own))
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Import-time report for MontePrep entry points")
+    parser.add_argument("--module", type=str, default=None, help="Report a single module instead of the entry points")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per module; the fastest run is kept")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest packages and project modules to list")
+    parser.add_argument("--budget_ms", type=float, default=None, help="Budget for --module")
+    parser.add_argument("--output", type=str, default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    entries = {args.module: (args.module, args.budget_ms)} if args.module else ENTRY_POINTS
+    report = run_report(entries, args.repeat, args.top)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    over = [name for name, result in report.items() if result["over_budget"]]
+    if over:
+        print(f"{len(over)} entry point(s) over budget: {', '.join(over)}")
+        sys.exit(1)
@@ -0,0 +1,306 @@
+"""
+Microbenchmarks for the MCTS and execution hot paths, with a mock LLMClient,
+synthetic search trees and scalable synthetic tables. Results can be stored as a
+baseline and later runs compared against it.
+
+    python src/bench/micro.py --save_baseline bench_results/micro_baseline.json
+    python src/bench/micro.py --compare bench_results/micro_baseline.json
+"""
+import copy
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.llm.mock_server import template_response
+from src.mcts.data import DataProcessor
+from src.mcts.mcts import MCTSSolver
+from src.mcts.node import MCTSNode
+from src.mcts import profile
+from src.mcts.reward import llmRewardModel
+from src.mcts.stats import ArrayStatsNode, NodeStats
+from src.mcts.types import MCTSNodeType
+from src.utils.evaluator import calculate_similarity
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+REGRESSION_THRESHOLD = 1.2
+
+
+class MockLLMClient:
+    """Drop-in LLMClient answering from the mock server templates, without HTTP."""
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.call_count = 0
+        self.token_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+    def generate_response(self, prompt, n=1, temperature=None):
+        self.call_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        contents = [template_response(prompt) for _ in range(n)]
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = sum(len(c) // 4 for c in contents)
+        self.token_usage["prompt_tokens"] += prompt_tokens
+        self.token_usage["completion_tokens"] += completion_tokens
+        self.token_usage["total_tokens"] += prompt_tokens + completion_tokens
+        return [{"content": c, "reasoning_content": ""} for c in contents], False
+
+    def reset_token_usage(self):
+        self.token_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        self.call_count = 0
+
+
+# ---------------------------------------------------------------- synthetic data
+def synthetic_tree(branching: int, depth: int, seed: int = 0, node_class=MCTSNode) -> MCTSNode:
+    """A fully expanded tree with random visit counts and values."""
+    rng = random.Random(seed)
+    schema = "Source Tables:\n" + "\n".join(f"- col_{i}" for i in range(50))
+    root = node_class(MCTSNodeType.ROOT, depth=0, table_schema_dict=schema, llm_kwargs={"n": branching})
+    root.path_nodes = [root]
+    level = [root]
+    for d in range(1, depth + 1):
+        next_level = []
+        for parent in level:
+            for _ in range(branching):
+                node_type = MCTSNodeType.END if d == depth else MCTSNodeType.TRANSFORMATION
+                child = node_class(node_type, parent_node=parent, depth=d, table_schema_dict=schema,
+                                 transformation=[f"target = test_0[['col_{rng.randrange(50)}']]"],
+                                 final_transformation=[f"target = test_0[['col_{rng.randrange(50)}']]"] if d == depth else None,
+                                 llm_kwargs=parent.llm_kwargs)
+                child.path_nodes = parent.path_nodes + [child]
+                parent.children.append(child)
+                next_level.append(child)
+        level = next_level
+    # Visit counts consistent with backpropagation: a parent's N is at least the sum of its children's.
+    def fill(node):
+        if not node.children:
+            node.N = rng.randint(1, 5)
+            node.Q = rng.random() * node.N
+            return node.N, node.Q
+        totals = [fill(child) for child in node.children]
+        node.N = sum(n for n, _ in totals) + 1
+        node.Q = sum(q for _, q in totals)
+        return node.N, node.Q
+    fill(root)
+    return root
+
+
+def node_chain(depth: int) -> MCTSNode:
+    """A single root-to-leaf path as produced by repeated expansion."""
+    root = synthetic_tree(1, depth)
+    node = root
+    while node.children:
+        node = node.children[0]
+    return node
+
+
+def synthetic_task(directory: str, rows: int, columns: int = 12, seed: int = 0) -> Path:
+    """Write an Auto-Pipeline style task folder (test_0.csv, target.csv) with `rows` source rows."""
+    rng = np.random.default_rng(seed)
+    folder = Path(directory) / f"length1_{rows}"
+    folder.mkdir(parents=True, exist_ok=True)
+    data = {"id": np.arange(rows), "name": [f"name_{i % 1000}" for i in range(rows)]}
+    for i in range(columns - 2):
+        data[f"value_{i}"] = rng.random(rows) * 100 if i % 2 else rng.integers(0, 1000, rows)
+    pd.DataFrame(data).to_csv(folder / "test_0.csv")
+    pd.DataFrame(columns=["Name", "Total"]).to_csv(folder / "target.csv")
+    return folder
+
+
+SYNTHETIC_PIPELINE = [
+    "df = test_0[test_0['value_0'] > 10].copy()",
+    "df['Total'] = df['value_1'] * 2",
+    "df = df.groupby('name', as_index=False)['Total'].sum()",
+    "target = df.rename(columns={'name': 'Name'})",
+]
+
+
+# ------------------------------------------------------------------- benchmarks
+def bench_deepcopy():
+    # Tree links are shared by MCTSNode.__deepcopy__, so the cost no longer depends on depth;
+    # what is copied is the node's own state, here the size of a late-stage node.
+    leaf = node_chain(5)
+    leaf.schema_match = json.dumps([{"target_column": f"col_{i}", "sources": {"test_0": [f"src_{i}"]}}
+                                    for i in range(20)])
+    leaf.column_functions = "\n".join(f"- col_{i}: copy of src_{i}" for i in range(20))
+    leaf.transformation = [f"df['col_{i}'] = test_0['src_{i}']" for i in range(10)]
+    return lambda: copy.deepcopy(leaf)
+
+
+def _solver_for_tree(branching: int, depth: int, array_stats: bool):
+    solver = MCTSSolver(1, depth, 1.0, {"n": branching}, MockLLMClient(), llmRewardModel({}), array_stats=array_stats)
+    if not array_stats:
+        return solver, synthetic_tree(branching, depth)
+    root = synthetic_tree(branching, depth, node_class=ArrayStatsNode)
+    solver.node_stats = NodeStats()
+    solver.node_stats.attach_tree(root)
+    return solver, root
+
+
+def bench_select(branching: int, depth: int, array_stats: bool = False):
+    solver, root = _solver_for_tree(branching, depth, array_stats)
+    return lambda: solver.select(root)
+
+
+def bench_find_paths(branching: int, depth: int, array_stats: bool = False):
+    solver, root = _solver_for_tree(branching, depth, array_stats)
+    return lambda: solver.find_all_valid_reasoning_paths(root)
+
+
+def bench_execute_real(folder: str, transformation: List[str]):
+    path = Path(ROOT_DIR) / folder
+    return lambda: llmRewardModel.execute_transformation(path, transformation)
+
+
+def bench_execute_synthetic(work_dir: str, rows: int):
+    folder = synthetic_task(work_dir, rows)
+    return lambda: llmRewardModel.execute_transformation(folder, SYNTHETIC_PIPELINE)
+
+
+def bench_process_tables(work_dir: str, rows: int, cold: bool):
+    folder = synthetic_task(work_dir, rows)
+
+    def run():
+        if cold:
+            profile.clear_cache()
+            cache = folder / ".table_profiles.json"
+            if cache.exists():
+                cache.unlink()
+        DataProcessor(folder, "auto_pipeline").process_tables()
+    return run
+
+
+def bench_similarity(rows: int, columns: int = 10, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    data = {f"num_{i}": rng.random(rows) for i in range(columns // 2)}
+    data.update({f"str_{i}": rng.integers(0, 1000, rows).astype(str) for i in range(columns - columns // 2)})
+    target = pd.DataFrame(data)
+    result = target.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+    result.iloc[::97, 0] += 1.0
+    return lambda: calculate_similarity(result, target)
+
+
+def bench_expand(work_dir: str, rows: int):
+    folder = synthetic_task(work_dir, rows)
+    llm_kwargs = {"n": 2, "static_precheck": True}
+    solver = MCTSSolver(1, 5, 1.0, llm_kwargs, MockLLMClient(), llmRewardModel(llm_kwargs))
+    schema = DataProcessor(folder, "auto_pipeline").process_tables()
+    schema_str = (f"Source Tables:\n{schema['source_tables']}\n Source Data Description:\n\n\n"
+                  f"Target Table:\n{schema['target_table']}\nTarget Data Description:\n")
+
+    def run():
+        root = MCTSNode(MCTSNodeType.ROOT, table_schema_dict=schema_str, table_path=folder,
+                        llm_client=solver.llm_client, llm_kwargs=llm_kwargs)
+        root.path_nodes = [root]
+        solver.expand(root)
+    return run
+
+
+def registry(work_dir: str, quick: bool) -> List[Tuple[str, Callable[[], Callable]]]:
+    sizes = [1_000, 10_000] if quick else [1_000, 10_000, 100_000]
+    buildings_pipeline = ["target = test_0.rename(columns={'DT_STRATA': 'CST'})"]
+    benchmarks = []
+    benchmarks.append(("deepcopy_node", bench_deepcopy))
+    for branching, depth in ((3, 4), (4, 5), (8, 4), (64, 2)) if not quick else ((3, 4),):
+        benchmarks.append((f"select/b={branching},d={depth}", lambda b=branching, d=depth: bench_select(b, d)))
+        benchmarks.append((f"select/array/b={branching},d={depth}",
+                           lambda b=branching, d=depth: bench_select(b, d, True)))
+        benchmarks.append((f"find_all_valid_reasoning_paths/b={branching},d={depth}",
+                           lambda b=branching, d=depth: bench_find_paths(b, d)))
+        benchmarks.append((f"find_all_valid_reasoning_paths/array/b={branching},d={depth}",
+                           lambda b=branching, d=depth: bench_find_paths(b, d, True)))
+    benchmarks.append(("execute_transformation/buildings/group1_1",
+                       lambda: bench_execute_real("data/buildings/group1_1", buildings_pipeline)))
+    for rows in sizes:
+        benchmarks.append((f"execute_transformation/rows={rows}", lambda r=rows: bench_execute_synthetic(work_dir, r)))
+        benchmarks.append((f"process_tables/cold/rows={rows}", lambda r=rows: bench_process_tables(work_dir, r, True)))
+        benchmarks.append((f"process_tables/warm/rows={rows}", lambda r=rows: bench_process_tables(work_dir, r, False)))
+        benchmarks.append((f"calculate_similarity/rows={rows}", lambda r=rows: bench_similarity(r)))
+    benchmarks.append(("expand_root/mock_llm/rows=1000", lambda: bench_expand(work_dir, 1_000)))
+    return benchmarks
+
+
+# ---------------------------------------------------------------------- runner
+def measure(func: Callable, min_time: float = 0.2, max_repeat: int = 50) -> Dict[str, float]:
+    """Call `func` until `min_time` has elapsed (at least 3 times); report per-call seconds."""
+    func()  # warm-up
+    times = []
+    total = 0.0
+    while (total < min_time or len(times) < 3) and len(times) < max_repeat:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        total += elapsed
+    return {"min": min(times), "median": statistics.median(times), "repeat": len(times)}
+
+
+def run_benchmarks(name_filter: Optional[str] = None, quick: bool = False, min_time: float = 0.2) -> Dict[str, Any]:
+    work_dir = tempfile.mkdtemp(prefix="monteprep_micro_")
+    results = {}
+    try:
+        for name, setup in registry(work_dir, quick):
+            if name_filter and name_filter not in name:
+                continue
+            results[name] = measure(setup(), min_time=min_time)
+            print(f"{name:<55}{results[name]['median'] * 1e3:>12.3f} ms  (min {results[name]['min'] * 1e3:.3f}, n={results[name]['repeat']})")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "python": sys.version.split()[0],
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """Print median ratios against the baseline; return the names that regressed beyond `threshold`."""
+    regressions = []
+    print(f"{'benchmark':<55}{'baseline ms':>12}{'current ms':>12}{'ratio':>8}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base:
+            continue
+        ratio = result["median"] / base["median"] if base["median"] else float("inf")
+        flag = "  REGRESSION" if ratio > threshold else ""
+        print(f"{name:<55}{base['median'] * 1e3:>12.3f}{result['median'] * 1e3:>12.3f}{ratio:>8.2f}{flag}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="MontePrep microbenchmarks")
+    parser.add_argument("--filter", type=str, default=None, help="Only run benchmarks whose name contains this string")
+    parser.add_argument("--quick", action="store_true", help="Smaller trees and tables")
+    parser.add_argument("--min_time", type=float, default=0.2, help="Minimum measured seconds per benchmark")
+    parser.add_argument("--save_baseline", type=str, default=None, help="Store the results as a baseline JSON")
+    parser.add_argument("--compare", type=str, default=None, help="Compare against a stored baseline JSON")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Median ratio reported as a regression")
+    args = parser.parse_args()
+
+    current = run_benchmarks(args.filter, args.quick, args.min_time)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
@@ -1,3 +1,5 @@
+import os
+
 qwen_api = ""
 
 MODELS = {
@@ -24,5 +26,13 @@ MODELS = {
         'is_inference': False,
         'top_p': 0.8,
         'temperature': 0.1    
+    },
+    'mock': {
+        'api_key': "mock",
+        'base_url': os.environ.get("MOCK_LLM_BASE_URL", "http://127.0.0.1:8765/v1"),
+        'model': "mock",
+        'is_inference': False,
+        'top_p': 0.8,
+        'temperature': 0.1
     }
 }
\ No newline at end of file
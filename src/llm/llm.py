@@ -1,9 +1,13 @@
 from src.llm.config import MODELS
-from openai import OpenAI
+from src.utils import metrics, tracing
 import json
+import threading
+import time
 
 class LLMClient:
     def __init__(self, model_name):
+        # openai takes about half a second to import; only processes that talk to a model pay for it.
+        from openai import OpenAI
         self.config = MODELS[model_name]
         self.client = OpenAI(
             api_key=self.config['api_key'],
@@ -14,20 +18,34 @@ class LLMClient:
             "completion_tokens": 0,
             "total_tokens": 0
         }
+        self.call_count = 0
+        # Expansion and reward judging may share one client between threads.
+        self._usage_lock = threading.Lock()
         
-    def generate_response(self, prompt, n=1):
+    @tracing.traced("generate_response", "llm")
+    def generate_response(self, prompt, n=1, temperature=None):
+        with self._usage_lock:
+            self.call_count += 1
+        start = time.perf_counter()
         try:
             generate_params = {
                 "model": self.config['model'],
                 "messages": [{"role": "user", "content": prompt}],
                 "top_p": self.config.get('top_p', 0.8),  
-                "temperature": self.config.get('temperature', 0.7),
+                "temperature": temperature if temperature is not None else self.config.get('temperature', 0.7),
                 "n": n
             }
             completion = self.client.chat.completions.create(**generate_params)
-            self.token_usage["prompt_tokens"] += completion.usage.prompt_tokens
-            self.token_usage["completion_tokens"] += completion.usage.completion_tokens
-            self.token_usage["total_tokens"] += completion.usage.total_tokens
+            with self._usage_lock:
+                self.token_usage["prompt_tokens"] += completion.usage.prompt_tokens
+                self.token_usage["completion_tokens"] += completion.usage.completion_tokens
+                self.token_usage["total_tokens"] += completion.usage.total_tokens
+            if metrics.is_enabled():
+                labels = {"action": metrics.current_action(), "model": self.config['model']}
+                metrics.observe("llm_request_seconds", time.perf_counter() - start, **labels)
+                metrics.inc("llm_requests_total", outcome="ok", **labels)
+                metrics.inc("llm_tokens_total", completion.usage.prompt_tokens, kind="prompt", **labels)
+                metrics.inc("llm_tokens_total", completion.usage.completion_tokens, kind="completion", **labels)
             
             results = []
             for choice in completion.choices:
@@ -43,14 +61,72 @@ class LLMClient:
                 results.append(result)
             return results, False
         except Exception as e:
+            metrics.inc("llm_requests_total", action=metrics.current_action(), model=self.config['model'], outcome="error")
             return [str(e)], True
         
+    def generate_response_stream(self, prompt, n=1, temperature=None):
+        """
+        The n samples of generate_response as one streamed request (the prompt is billed
+        once). Yields (result, False) for each choice as soon as it finishes, in finishing
+        order, or (error message, True) once if the request fails.
+        """
+        with self._usage_lock:
+            self.call_count += 1
+        labels = {"action": metrics.current_action(), "model": self.config['model']}
+        start = time.perf_counter()
+        with tracing.span("generate_response_stream", "llm", n=n):
+            try:
+                stream = self.client.chat.completions.create(
+                    model=self.config['model'],
+                    messages=[{"role": "user", "content": prompt}],
+                    top_p=self.config.get('top_p', 0.8),
+                    temperature=temperature if temperature is not None else self.config.get('temperature', 0.7),
+                    n=n,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+                parts = {}
+                usage = None
+                for chunk in stream:
+                    if chunk.usage is not None:
+                        usage = chunk.usage
+                    for choice in chunk.choices:
+                        content, reasoning = parts.setdefault(choice.index, ([], []))
+                        delta = choice.delta
+                        if delta is not None:
+                            if delta.content:
+                                content.append(delta.content)
+                            if getattr(delta, "reasoning_content", None):
+                                reasoning.append(delta.reasoning_content)
+                        if choice.finish_reason is not None:
+                            parts.pop(choice.index)
+                            yield {
+                                "content": "".join(content),
+                                "reasoning_content": "".join(reasoning) if self.config.get('is_inference', True) else ""
+                            }, False
+            except Exception as e:
+                metrics.inc("llm_requests_total", outcome="error", **labels)
+                yield str(e), True
+                return
+        if usage is not None:
+            with self._usage_lock:
+                self.token_usage["prompt_tokens"] += usage.prompt_tokens
+                self.token_usage["completion_tokens"] += usage.completion_tokens
+                self.token_usage["total_tokens"] += usage.total_tokens
+        if metrics.is_enabled():
+            metrics.observe("llm_request_seconds", time.perf_counter() - start, **labels)
+            metrics.inc("llm_requests_total", outcome="ok", **labels)
+            if usage is not None:
+                metrics.inc("llm_tokens_total", usage.prompt_tokens, kind="prompt", **labels)
+                metrics.inc("llm_tokens_total", usage.completion_tokens, kind="completion", **labels)
+
     def reset_token_usage(self):
         self.token_usage = {
             "prompt_tokens": 0,
             "completion_tokens": 0,
             "total_tokens": 0
         }
+        self.call_count = 0
 if __name__ == "__main__":
     llm = LLMClient("qwen")
     response, error = llm.generate_response("hello")
@@ -0,0 +1,298 @@
+"""
+Offline OpenAI-compatible stand-in for the chat completions endpoint.
+
+Responses are replayed from a recording file when the prompt was seen before and
+otherwise generated from templates that follow the MontePrep prompt formats (the
+templated pipeline copies every target column that exists in the first source
+table). Latency is drawn from a configurable distribution, so search overhead can
+be benchmarked without a live endpoint or token spend. With `--upstream`, prompts
+missing from the recording are forwarded to a real endpoint and recorded.
+Streamed requests (`"stream": true`) receive each choice as one server-sent event
+once its own sampled latency has elapsed.
+
+    python src/llm/mock_server.py --port 8765 --latency lognormal:-0.7,0.4
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+
+
+class LatencyModel:
+    """
+    Parse "fixed:S", "uniform:LOW,HIGH", "normal:MEAN,STD" or "lognormal:MU,SIGMA" (seconds).
+    `per_token` adds a delay per completion token to mimic decoding.
+    """
+    def __init__(self, spec: str = "fixed:0", per_token: float = 0.0, seed: Optional[int] = None):
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        self.per_token = per_token
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        if kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, completion_tokens: int = 0) -> float:
+        with self.lock:
+            if self.kind == "fixed":
+                delay = self.params[0] if self.params else 0.0
+            elif self.kind == "uniform":
+                delay = self.random.uniform(*self.params)
+            elif self.kind == "normal":
+                delay = self.random.gauss(*self.params)
+            else:
+                delay = self.random.lognormvariate(*self.params)
+        return max(delay, 0.0) + self.per_token * completion_tokens
+
+
+def _parse_tables(section: str) -> List[Tuple[str, List[str]]]:
+    tables = []
+    for block in section.split("**Table Caption:**")[1:]:
+        lines = block.strip().splitlines()
+        name = lines[0].strip()
+        columns = []
+        in_columns = False
+        for line in lines[1:]:
+            line = line.strip()
+            if line.startswith("**Columns:**"):
+                in_columns = True
+                continue
+            if line.startswith("**Rows:**"):
+                break
+            if not in_columns or not line:
+                continue
+            if line.startswith("- "):
+                if not line.startswith("- ("):
+                    columns.append(line[2:])
+            else:
+                # Meta schemas list "name TYPE, name TYPE" on one line.
+                columns.extend(part.strip().rpartition(" ")[0] or part.strip() for part in line.split(",") if part.strip())
+        tables.append((name, columns))
+    return tables
+
+
+def parse_schema(prompt: str) -> Tuple[List[Tuple[str, List[str]]], List[str]]:
+    """Source tables and target columns of the task schema embedded in a prompt."""
+    target_at = prompt.rfind("Target Table:\n")
+    if target_at == -1:
+        return [], []
+    source_at = prompt.rfind("Source Tables:\n", 0, target_at)
+    source_section = prompt[source_at:target_at] if source_at != -1 else ""
+    target_section = prompt[target_at:].split("Target Data Description:")[0]
+    sources = [(name, cols) for name, cols in _parse_tables(source_section) if not name.startswith("target")]
+    target = _parse_tables(target_section)
+    return sources, target[0][1] if target else []
+
+
+def template_pipeline(prompt: str) -> List[str]:
+    sources, target_columns = parse_schema(prompt)
+    if not sources:
+        return [f"target = pd.DataFrame(columns={target_columns!r})"]
+    name, columns = sources[0]
+    code = [f"result = pd.DataFrame(index={name}.index)"]
+    for column in target_columns:
+        value = f"{name}[{column!r}]" if column in columns else "None"
+        code.append(f"result[{column!r}] = {value}")
+    code.append("target = result")
+    return code
+
+
+def template_response(prompt: str) -> str:
+    if "Please convert the following response into valid JSON format" in prompt:
+        match = re.search(r"\{.*\}", prompt, re.DOTALL)
+        return match.group(0) if match else '{"code": []}'
+    if "schema matcher" in prompt:
+        sources, target_columns = parse_schema(prompt)
+        mappings = [{"target_column": column,
+                     "sources": {name: [column] for name, columns in sources if column in columns}}
+                    for column in target_columns]
+        return "# Reasoning Process\nMatched columns by name.\n```json\n" + json.dumps(mappings, indent=2) + "\n```"
+    if "### Candidate 1" in prompt:
+        count = len(re.findall(r"^### Candidate \d+$", prompt, re.MULTILINE))
+        rewards = [{"candidate": i, "reason": "templated", "reward": "1"} for i in range(1, count + 1)]
+        return "```json\n" + json.dumps(rewards, indent=2) + "\n```"
+    if "correct reward score" in prompt:
+        return '```json\n{"reasoning": "templated", "reward": "1"}\n```'
+    if "identify functions" in prompt:
+        return "rename, adding or dropping columns"
+    code = template_pipeline(prompt)
+    return "```json\n" + json.dumps({"chain_of_thought_reasoning": "templated", "code": code}, indent=2) + "\n```"
+
+
+class MockLLM:
+    """Response source shared by all request handler threads."""
+    def __init__(self, latency: LatencyModel, recording_path: Optional[str] = None,
+                 upstream: Optional[str] = None, upstream_key: Optional[str] = None):
+        self.latency = latency
+        self.recording_path = recording_path
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.upstream_key = upstream_key
+        self.recordings: Dict[str, List[str]] = {}
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "replayed": 0, "templated": 0, "forwarded": 0}
+        if recording_path:
+            try:
+                with open(recording_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            record = json.loads(line)
+                            self.recordings.setdefault(record["key"], []).append(record["content"])
+            except FileNotFoundError:
+                pass
+
+    def _forward(self, body: Dict[str, Any]) -> List[str]:
+        body = {key: value for key, value in body.items() if key not in ("stream", "stream_options")}
+        request = urllib.request.Request(f"{self.upstream}/chat/completions", data=json.dumps(body).encode(),
+                                         headers={"Content-Type": "application/json",
+                                                  "Authorization": f"Bearer {self.upstream_key or ''}"})
+        with urllib.request.urlopen(request) as response:
+            data = json.loads(response.read())
+        return [choice["message"]["content"] for choice in data["choices"]]
+
+    def complete(self, body: Dict[str, Any]) -> Tuple[List[str], str]:
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        n = int(body.get("n", 1) or 1)
+        key = prompt_key(prompt)
+        with self.lock:
+            self.stats["requests"] += 1
+            recorded = self.recordings.get(key)
+        if recorded:
+            contents = [recorded[i % len(recorded)] for i in range(n)]
+            source = "replayed"
+        elif self.upstream:
+            contents = self._forward(body)
+            source = "forwarded"
+            if self.recording_path:
+                with self.lock, open(self.recording_path, "a", encoding="utf-8") as f:
+                    for content in contents:
+                        f.write(json.dumps({"key": key, "content": content}, ensure_ascii=False) + "\n")
+                    self.recordings.setdefault(key, []).extend(contents)
+        else:
+            contents = [template_response(prompt) for _ in range(n)]
+            source = "templated"
+        with self.lock:
+            self.stats[source] += 1
+        return contents, prompt
+
+
+def _count_tokens(text: str) -> int:
+    return max(1, (len(text) + 3) // 4)
+
+
+def make_handler(llm: MockLLM):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, payload: Dict[str, Any]):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, body: Dict[str, Any], prompt: str, contents: List[str], prompt_tokens: int,
+                    completion_tokens: int):
+            chunk = {"id": f"chatcmpl-mock-{prompt_key(prompt)[:12]}", "object": "chat.completion.chunk",
+                     "created": int(time.time()), "model": body.get("model", "mock")}
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+
+            def event(payload):
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+                self.wfile.flush()
+
+            finish_times = sorted((llm.latency.sample(_count_tokens(content)), i) for i, content in enumerate(contents))
+            start = time.perf_counter()
+            for finish, i in finish_times:
+                time.sleep(max(0.0, finish - (time.perf_counter() - start)))
+                event({**chunk, "choices": [{"index": i, "delta": {"role": "assistant", "content": contents[i]},
+                                             "finish_reason": "stop"}]})
+            if (body.get("stream_options") or {}).get("include_usage"):
+                event({**chunk, "choices": [], "usage": {"prompt_tokens": prompt_tokens,
+                                                         "completion_tokens": completion_tokens,
+                                                         "total_tokens": prompt_tokens + completion_tokens}})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+            elif self.path.rstrip("/").endswith("/stats"):
+                self._send(200, llm.stats)
+            else:
+                self._send(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send(404, {"error": {"message": "not found"}})
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            try:
+                contents, prompt = llm.complete(body)
+            except Exception as e:
+                self._send(502, {"error": {"message": str(e)}})
+                return
+            completion_tokens = sum(_count_tokens(c) for c in contents)
+            prompt_tokens = _count_tokens(prompt)
+            if body.get("stream"):
+                self._stream(body, prompt, contents, prompt_tokens, completion_tokens)
+                return
+            time.sleep(llm.latency.sample(completion_tokens))
+            self._send(200, {
+                "id": f"chatcmpl-mock-{prompt_key(prompt)[:12]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [{"index": i, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                            for i, content in enumerate(contents)],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, latency: Optional[LatencyModel] = None,
+          recording_path: Optional[str] = None, upstream: Optional[str] = None,
+          upstream_key: Optional[str] = None) -> ThreadingHTTPServer:
+    """Start the server on a daemon thread and return it; `port=0` picks a free port."""
+    llm = MockLLM(latency or LatencyModel(), recording_path, upstream, upstream_key)
+    server = ThreadingHTTPServer((host, port), make_handler(llm))
+    server.daemon_threads = True
+    server.llm = llm
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Offline OpenAI-compatible chat completions server")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=str, default="fixed:0", help="fixed:S | uniform:LOW,HIGH | normal:MEAN,STD | lognormal:MU,SIGMA")
+    parser.add_argument("--per_token_latency", type=float, default=0.0, help="Extra seconds per completion token")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--recording", type=str, default=None, help="JSONL file of recorded responses to replay")
+    parser.add_argument("--upstream", type=str, default=None, help="Forward unrecorded prompts to this base URL and record them")
+    parser.add_argument("--upstream_key", type=str, default=None)
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, LatencyModel(args.latency, args.per_token_latency, args.seed),
+                   args.recording, args.upstream, args.upstream_key)
+    print(f"Mock LLM server listening on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,6 +1,7 @@
-from src.mcts.mcts import MCTSSolver
-from src.mcts.reward import llmRewardModel
-from src.mcts.data import DataProcessor
+# The MCTS modules (pandas, numpy) are imported where a solver is built, so that
+# --enqueue and other bookkeeping runs start without them.
+from src.utils import metrics, tracing
+from src.utils.work_queue import WorkQueue, default_worker_id
 import os
 import json
 import logging
@@ -19,6 +20,11 @@ def parse_arguments():
     parser.add_argument("--start_num", type=int, default=2, help="Start folder number")
     parser.add_argument("--end_num", type=int, default=3, help="End folder number")
     parser.add_argument("--log_path", type=str, default="logs/mcts_error_log.txt", help="Log file path")
+    parser.add_argument("--config", type=str, default=None, help="Config file path (default: src/config/default.yaml)")
+    parser.add_argument("--queue", type=str, default=None, help="Work queue database on shared storage; workers pull tasks from it")
+    parser.add_argument("--enqueue", action="store_true", help="Add the tasks given by --length_type/--start_num/--end_num to --queue and exit")
+    parser.add_argument("--worker_id", type=str, default=None, help="Worker name in the queue (default: host-pid)")
+    parser.add_argument("--lease_seconds", type=float, default=300, help="Lease duration; heartbeats renew it every third of it")
     return parser.parse_args()
 
 def initialize_logging(log_path):
@@ -52,90 +58,239 @@ def handle_exception(logger, length, num, attempt, exception):
     """Unified exception handling"""
     logger.error(f"MCTS solve failed: length={length}, num={num}, attempt={attempt+1} - {str(exception)}", exc_info=True)
 
-def main():
-    args = parse_arguments()
-    logger = initialize_logging(args.log_path)
+def get_result_path(result_dir, data_type, length):
+    if data_type == "auto_pipeline":
+        result_path = os.path.join(result_dir, f"length{length}")
+    elif data_type == 'buildings':
+        result_path = os.path.join(result_dir, f"group{length}")
+    os.makedirs(result_path, exist_ok=True)
+    return result_path
 
-    # Read llm_kwargs config
-    config_path = os.path.join(os.path.dirname(__file__), "config", "default.yaml")
-    with open(config_path, "r") as f:
-        config = yaml.safe_load(f)
+def solve_task(solver, llm_client, logger, data_path, data_type, length, num, result_path, metrics_config, tracing_config):
+    """Solve one task with retries and save its pipelines; returns (task_name, metrics record) or None on failure"""
+    start_time = time.time()
+    tracing.reset()
+    metrics_before = metrics.snapshot() if metrics.is_enabled() else None
+    attempt_success = False
+    for attempt in range(3):
+        try:
+            if data_type == "auto_pipeline":
+                logger.info(f"Start solving with MCTS for length={length}, num={num}, attempt={attempt+1}...")
+            elif data_type == "buildings":
+                logger.info(f"Start solving with MCTS for group={length}, num={num}, attempt={attempt+1}...")
+            result_code = solver.solve(
+                bath_path=data_path,
+                data_type=data_type,
+                length_type=length,
+                length_value=num
+            )
+            token_usage = llm_client.token_usage
+            attempt_success = True
+            break
+        except Exception as e:
+            handle_exception(logger, length, num, attempt, e)
+    if not attempt_success:
+        metrics.inc("tasks_total", data_type=data_type, outcome="failed")
+        llm_client.reset_token_usage()
+        return None
+    elapsed_time = time.time() - start_time
+    if data_type == "auto_pipeline":
+        task_name = f"length{length}_{num}"
+    elif data_type == "buildings":
+        task_name = f"group{length}_{num}"
+    record = {
+        "elapsed_time": elapsed_time,
+        "token_usage": token_usage,
+        "search": solver.search_stats
+    }
+    llm_client.reset_token_usage()
+    if metrics.is_enabled():
+        metrics.observe("rollouts", solver.search_stats.get("rollouts", 0))
+        metrics.inc("tasks_total", data_type=data_type, outcome="solved" if result_code else "empty")
+        if metrics_config.get("jsonl"):
+            metrics.append_jsonl(metrics_config["jsonl"], {
+                "task": f"{data_type}/{task_name}",
+                "elapsed_time": elapsed_time,
+                "token_usage": token_usage,
+                "rollouts": solver.search_stats.get("rollouts", 0),
+                **metrics.summary(since=metrics_before)
+            })
+        if metrics_config.get("textfile"):
+            metrics.write_textfile(metrics_config["textfile"])
+    if tracing.is_enabled():
+        trace_path = os.path.join(tracing_config.get("dir", "traces"), data_type, f"{task_name}.trace.json")
+        tracing.export(trace_path, metadata={"task": task_name, "elapsed_time": elapsed_time})
+        logger.info(f"Saved trace to {trace_path}")
+    try:
+        json_file = os.path.join(result_path, f"{task_name}.json")
+        with open(json_file, 'w') as f:
+            json.dump(result_code, f, indent=2, ensure_ascii=False)
+        logger.info(f"Saved results to {json_file}")
+    except Exception as e:
+        logger.error(f"Failed to save JSON: {task_name} - {str(e)}")
+    return task_name, record
+
+def run_queue_worker(queue, worker_id, solver, llm_client, logger, root_dir, result_dir,
+                     metrics_config, tracing_config, poll_seconds=10):
+    """Solve tasks leased from the work queue until it is drained"""
+    time_records = {}
+    while True:
+        lease = queue.claim(worker_id)
+        if lease is None:
+            if queue.pending() == 0:
+                break
+            # Other workers still hold leases; wait in case one expires and is re-queued.
+            time.sleep(poll_seconds)
+            continue
+        with lease:
+            data_path = os.path.join(root_dir, lease.base_path)
+            data_type = os.path.basename(data_path)
+            if not check_data_path(data_path, data_type, lease.length, lease.num):
+                lease.fail(f"task folder not found under {data_path}", final=True)
+                continue
+            result_path = get_result_path(result_dir, data_type, lease.length)
+            solved = solve_task(solver, llm_client, logger, data_path, data_type, lease.length, lease.num,
+                                result_path, metrics_config, tracing_config)
+            if solved is None:
+                # solve_task already retried; `requeue --status failed` puts it back after a fix.
+                lease.fail("solve failed after 3 attempts", final=True)
+                continue
+            if lease.lost or not lease.complete(solved[1]):
+                logger.warning(f"Lease of {solved[0]} expired before completion; another worker may rerun it")
+            records = time_records.setdefault((data_type, lease.length), {})
+            records[solved[0]] = solved[1]
+            # Per-worker metrics files, so workers sharing result_dir do not overwrite each other.
+            metrics_json_path = os.path.join(result_dir, f"metrics_{data_type}_{lease.length}_{worker_id}.json")
+            with open(metrics_json_path, 'w') as f:
+                json.dump(records, f, indent=4)
+    logger.info(f"Work queue drained: {queue.stats()['counts']}")
+
+def load_pipeline_library(library_config):
+    """Pipeline library from the `library` config section, or None when disabled"""
+    if not library_config.get("path"):
+        return None
+    from src.mcts.library import PipelineLibrary
+    return PipelineLibrary(library_config["path"],
+                           min_similarity=library_config.get("min_similarity", 0.6),
+                           top_k=library_config.get("top_k", 2))
+
+def configure_execution(execution_config):
+    """Process-wide candidate execution options from the `execution` config section"""
+    from src.mcts import loading
+    loading.configure(prune_columns=execution_config.get("prune_columns", False),
+                      chunked_read_mb=execution_config.get("chunked_read_mb"),
+                      chunk_rows=execution_config.get("chunk_rows", 100000),
+                      lean_env=execution_config.get("lean_env", False),
+                      copy_on_write=execution_config.get("copy_on_write", False),
+                      category_max_ratio=execution_config.get("category_max_ratio", 0.5),
+                      min_int_bits=execution_config.get("min_int_bits", 32),
+                      downcast_floats=execution_config.get("downcast_floats", False),
+                      verify_every=execution_config.get("verify_every", 10))
+
+def build_solver(config, llm_client, logger, pipeline_library=None):
+    """MCTSSolver configured from the model_kwargs, prompt, library, search and memory config sections"""
+    from src.mcts.budget import SearchBudget
+    from src.mcts.mcts import MCTSSolver
+    from src.mcts.memory import MemoryMonitor
+    from src.mcts.reward import BatchRewardJudge, llmRewardModel
     llm_kwargs = config.get("model_kwargs", {})
-    llm_client = LLMClient(model_name=llm_kwargs.get("model_name", "qwen2.5-coder-32b-instruct")) 
-    base_path = args.base_path
-    result_dir = args.result_dir
-    length_type = args.length_type
-    length_value = list(range(args.start_num, args.end_num))
+    prompt_config = config.get("prompt", {}) or {}
+    library_config = config.get("library", {}) or {}
+    search_config = config.get("search", {}) or {}
+    memory_config = config.get("memory", {}) or {}
 
     # Configure MCTSSolver parameters
-    max_rollout_steps = 10  
-    max_depth = 5           
-    exploration_constant = 1.0
+    max_rollout_steps = search_config.get("max_rollout_steps", 10)
+    max_depth = search_config.get("max_depth", 5)
+    exploration_constant = search_config.get("exploration_constant", 1.0)
+    budget = SearchBudget(max_seconds=search_config.get("time_budget_seconds"),
+                          max_tokens=search_config.get("token_budget"),
+                          max_llm_calls=search_config.get("llm_call_budget"))
+    memory = MemoryMonitor(track=memory_config.get("track", False),
+                           use_tracemalloc=memory_config.get("tracemalloc", False),
+                           max_nodes=memory_config.get("max_nodes"),
+                           keep_end_nodes=memory_config.get("keep_end_nodes", 2))
     reward_model = llmRewardModel(llm_kwargs)  
+    reward_judge = None
+    if llm_kwargs.get("reward_method") in ("llm_only", "default") and llm_kwargs.get("reward_batch_size", 1) > 1:
+        reward_judge = BatchRewardJudge(llm_client, method=llm_kwargs["reward_method"],
+                                        batch_size=llm_kwargs["reward_batch_size"],
+                                        mode=llm_kwargs.get("reward_batch_mode", "prompt"), logger=logger)
 
-    solver = MCTSSolver(
+    return MCTSSolver(
         max_rollout_steps=max_rollout_steps,
         max_depth=max_depth,
         exploration_constant=exploration_constant,
         llm_kwargs=llm_kwargs,
         llm_client=llm_client,
         reward_model=reward_model,
-        logger=logger
+        logger=logger,
+        schema_token_budget=prompt_config.get("schema_token_budget"),
+        column_index_hints=prompt_config.get("column_index_hints", False),
+        pipeline_library=pipeline_library,
+        library_hints=library_config.get("hints", True),
+        budget=budget,
+        memory=memory,
+        reward_judge=reward_judge,
+        array_stats=search_config.get("array_stats", False)
     )
+
+def main():
+    args = parse_arguments()
+    logger = initialize_logging(args.log_path)
+
+    # Read llm_kwargs config
+    config_path = args.config or os.path.join(os.path.dirname(__file__), "config", "default.yaml")
+    with open(config_path, "r") as f:
+        config = yaml.safe_load(f)
+    llm_kwargs = config.get("model_kwargs", {})
+    library_config = config.get("library", {}) or {}
+    tracing_config = config.get("tracing", {}) or {}
+    metrics_config = config.get("metrics", {}) or {}
+    if tracing_config.get("enabled"):
+        tracing.enable()
+    if metrics_config.get("enabled"):
+        metrics.enable()
+        if metrics_config.get("port") is not None:
+            metrics_server = metrics.serve(metrics_config.get("host", "127.0.0.1"), metrics_config["port"])
+            logger.info(f"Serving metrics on http://{metrics_server.server_address[0]}:{metrics_server.server_address[1]}/metrics")
+    base_path = args.base_path
+    result_dir = args.result_dir
+    length_type = args.length_type
+    length_value = list(range(args.start_num, args.end_num))
     root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     data_path = os.path.join(root_dir, base_path)
 
     data_type = os.path.basename(data_path)
+
+    if args.queue and args.enqueue:
+        queue = WorkQueue(args.queue, lease_seconds=args.lease_seconds)
+        added = queue.enqueue(base_path, [(length, num) for length in length_type for num in length_value
+                                          if check_data_path(data_path, data_type, length, num)])
+        logger.info(f"Enqueued {added} task(s) into {args.queue}")
+        return
+
+    configure_execution(config.get("execution", {}) or {})
+    llm_client = LLMClient(model_name=llm_kwargs.get("model_name", "qwen2.5-coder-32b-instruct")) 
+    pipeline_library = load_pipeline_library(library_config)
+    solver = build_solver(config, llm_client, logger, pipeline_library)
     
-    
+    if args.queue:
+        queue = WorkQueue(args.queue, lease_seconds=args.lease_seconds)
+        run_queue_worker(queue, args.worker_id or default_worker_id(), solver, llm_client, logger,
+                         root_dir, result_dir, metrics_config, tracing_config)
+        return
+
     for length in length_type:
         time_records = {}
-        if data_type == "auto_pipeline":
-            result_path = os.path.join(result_dir, f"length{length}")
-        elif data_type == 'buildings':
-            result_path = os.path.join(result_dir, f"group{length}")
-        os.makedirs(result_path, exist_ok=True)
+        result_path = get_result_path(result_dir, data_type, length)
         for num in length_value:
-            start_time = time.time()
             if not check_data_path(data_path, data_type, length, num):
                 continue
-            attempt_success = False
-            for attempt in range(3):
-                try:
-                    if data_type == "auto_pipeline":
-                        logger.info(f"Start solving with MCTS for length={length}, num={num}, attempt={attempt+1}...")
-                    elif data_type == "buildings":
-                        logger.info(f"Start solving with MCTS for group={length}, num={num}, attempt={attempt+1}...")
-                    result_code = solver.solve(
-                        bath_path=data_path,
-                        data_type=data_type,
-                        length_type=length,
-                        length_value=num
-                    )
-                    token_usage = llm_client.token_usage
-                    attempt_success = True
-                    break
-                except Exception as e:
-                    handle_exception(logger, length, num, attempt, e)
-            if not attempt_success:
-                continue
-            elapsed_time = time.time() - start_time
-            if data_type == "auto_pipeline":
-                task_name = f"length{length}_{num}"
-            elif data_type == "buildings":
-                task_name = f"group{length}_{num}"
-            time_records[task_name] = {
-                "elapsed_time": elapsed_time,
-                "token_usage": token_usage
-            }
-            llm_client.reset_token_usage()
-            try:
-                json_file = os.path.join(result_path, f"{task_name}.json")
-                with open(json_file, 'w') as f:
-                    json.dump(result_code, f, indent=2, ensure_ascii=False)
-                logger.info(f"Saved results to {json_file}")
-            except Exception as e:
-                logger.error(f"Failed to save JSON: {task_name} - {str(e)}")
+            solved = solve_task(solver, llm_client, logger, data_path, data_type, length, num,
+                                result_path, metrics_config, tracing_config)
+            if solved is not None:
+                time_records[solved[0]] = solved[1]
 
         metrics_json_path = os.path.join(result_dir, f"metrics_{data_type}_{length}.json")
         with open(metrics_json_path, 'w') as f:
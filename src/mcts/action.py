@@ -7,8 +7,14 @@ from pathlib import Path
 from collections import defaultdict
 from src.mcts.get_prompt import *
 from src.mcts.reward import *
+from src.mcts.heuristic_match import HeuristicSchemaMatcher
+from src.mcts.static_check import analyze_transformation
+from src.mcts.sampling import AdaptiveSampler, canonical_code, canonical_schema_match, canonical_text
+from src.utils import metrics, tracing
 import copy
 import json
+import queue
+import threading
 import re
 import random
 import logging
@@ -43,7 +49,18 @@ class SchemaMatchAction(MCTSAction):
             if isinstance(path_node.parent_action, IdentifyColumnFunctionsAction):
                 previous_thoughts += f"Possible column functions: {path_node.column_functions}\n"
         hint = f"\n\nHere are my previous thoughts:\n{previous_thoughts}" if previous_thoughts else ""
-        prompt = get_schema_match_prompt(table_schema_dict=table_schema, hint=hint)
+        prompt = get_schema_match_prompt(table_schema_dict=table_schema, hint=hint, data_hints=node.data_hints or "")
+
+        if llm_kwargs.get("heuristic_schema_match") == "short_circuit":
+            mapping, confidence = HeuristicSchemaMatcher().match_task(node.table_path)
+            if confidence >= llm_kwargs.get("heuristic_match_threshold", 0.9):
+                if logger:
+                    logger.info(f"Heuristic schema match accepted (confidence {confidence:.2f}), skipping LLM sampling")
+                return [self.make_child_node(node, mapping)]
+
+        if llm_kwargs.get("adaptive_sampling", False):
+            sampler = AdaptiveSampler.from_kwargs(node.llm_client, llm_kwargs, self.schema_match, canonical_schema_match, logger)
+            return [self.make_child_node(node, schema_match) for schema_match, _ in sampler.sample(prompt)]
 
         nodes = []
         while len(nodes) < llm_kwargs["n"]:
@@ -56,18 +73,20 @@ class SchemaMatchAction(MCTSAction):
                     print(f"Error generating schema match response: {responses}")
             for resp in responses:
                 response = resp["content"]
-                child_node = copy.deepcopy(node)
-                child_node.node_type = MCTSNodeType.SCHEMA_MATCH
-                child_node.parent_node = node
-                child_node.parent_action = self
-                child_node.depth = node.depth + 1
-                child_node.children = []
-                child_node.path_nodes = node.path_nodes + [child_node]
-                new_schema_match = self.schema_match(response)
-                if new_schema_match:
-                    child_node.schema_match = new_schema_match
-                nodes.append(child_node)
+                nodes.append(self.make_child_node(node, self.schema_match(response)))
         return nodes[:llm_kwargs["n"]]
+
+    def make_child_node(self, node: "MCTSNode", schema_match: str) -> "MCTSNode":
+        child_node = copy.deepcopy(node)
+        child_node.node_type = MCTSNodeType.SCHEMA_MATCH
+        child_node.parent_node = node
+        child_node.parent_action = self
+        child_node.depth = node.depth + 1
+        child_node.children = []
+        child_node.path_nodes = node.path_nodes + [child_node]
+        if schema_match:
+            child_node.schema_match = schema_match
+        return child_node
     
     def schema_match(self, response: str):
         try:
@@ -84,6 +103,22 @@ class SchemaMatchAction(MCTSAction):
             return ""
 
 
+class HeuristicSchemaMatchAction(SchemaMatchAction):
+    """
+    Deterministic schema match from column names and declared types, without LLM calls.
+    Counts as a schema match action for the action history and for later prompts.
+    
+    Valid previous nodes:
+    - Root node
+    - Identify column functions node
+    """
+    def create_children_nodes(self, node: "MCTSNode", llm_kwargs: Dict[str, Any], logger=None) -> List["MCTSNode"]:
+        mapping, confidence = HeuristicSchemaMatcher().match_task(node.table_path)
+        if logger:
+            logger.info(f"Heuristic schema match confidence: {confidence:.2f}")
+        return [self.make_child_node(node, mapping)]
+
+
 class IdentifyColumnFunctionsAction(MCTSAction):
     """
     Identify the column functions that are most relevant to the question.
@@ -103,13 +138,18 @@ class IdentifyColumnFunctionsAction(MCTSAction):
         hint = f"\n\nHere are my previous thoughts:\n{previous_thoughts}" if previous_thoughts else ""
         prompt = get_identify_function_prompt(table_schema_dict=table_schema, hint=hint)
         
-        responses, error = node.llm_client.generate_response(prompt, n=llm_kwargs["n"])
-        if error:
-            if logger:
-                logger.warning(f"Error generating identify column functions response: {responses}")
-            else:
-                print(f"Error generating identify column functions response: {responses}")
-        contents = list(set([resp["content"] for resp in responses]))
+        if llm_kwargs.get("adaptive_sampling", False):
+            # Resample for the responses dropped as duplicates instead of returning fewer children.
+            sampler = AdaptiveSampler.from_kwargs(node.llm_client, llm_kwargs, lambda content: content, canonical_text, logger)
+            contents = [content for content, _ in sampler.sample(prompt)]
+        else:
+            responses, error = node.llm_client.generate_response(prompt, n=llm_kwargs["n"])
+            if error:
+                if logger:
+                    logger.warning(f"Error generating identify column functions response: {responses}")
+                else:
+                    print(f"Error generating identify column functions response: {responses}")
+            contents = list(set([resp["content"] for resp in responses]))
         nodes = []
         for response in contents:
             child_node = copy.deepcopy(node)
@@ -141,8 +181,17 @@ class TransformationAction(MCTSAction):
             if isinstance(path_node.parent_action, IdentifyColumnFunctionsAction):
                 previous_thoughts += f"Possible column functions: {path_node.column_functions}\n"
         hint = f"\n\nHere are my previous thoughts:\n{previous_thoughts}" if previous_thoughts else ""
-        prompt = get_transformation_prompt(table_schema_dict=table_schema, hint=hint)
+        prompt = get_transformation_prompt(table_schema_dict=table_schema, hint=hint, data_hints=node.data_hints or "")
         
+        if llm_kwargs.get("adaptive_sampling", False):
+            # Duplicate pipelines are dropped before they are executed.
+            sampler = AdaptiveSampler.from_kwargs(
+                node.llm_client, llm_kwargs, lambda content: self.extract_tranformation_answer(content, node.llm_client),
+                canonical_code, logger)
+            return [self.make_child_node(node, tranformation, llm_kwargs, logger) for tranformation, _ in sampler.sample(prompt)]
+        if llm_kwargs.get("pipelined_expansion", False):
+            return list(self.iter_children_pipelined(node, prompt, llm_kwargs, logger))
+
         nodes = []
         while len(nodes) < llm_kwargs["n"]:
             new_max_gen_nums = llm_kwargs["n"] - len(nodes)
@@ -154,19 +203,75 @@ class TransformationAction(MCTSAction):
                     print(f"Error generating transformation response: {responses}")
             for resp in responses:
                 response = resp["content"]
-                child_node = copy.deepcopy(node)
-                child_node.node_type = MCTSNodeType.TRANSFORMATION
-                child_node.parent_node = node
-                child_node.parent_action = self
-                child_node.depth = node.depth + 1
-                child_node.children = []
-                child_node.path_nodes = node.path_nodes + [child_node]
                 tranformation = self.extract_tranformation_answer(response, node.llm_client)
-                child_node.transformation = tranformation
-                _, _, columns_match,_ = llmRewardModel.execute_transformation(child_node.table_path, tranformation)
-                child_node.columns_match = columns_match
-                nodes.append(child_node)
+                nodes.append(self.make_child_node(node, tranformation, llm_kwargs, logger))
         return nodes
+
+    def iter_children_pipelined(self, node: "MCTSNode", prompt: str, llm_kwargs: Dict[str, Any], logger=None):
+        """
+        Request the n samples as one streamed completion and parse and execute each
+        candidate as soon as its choice finishes, while the other choices are still being
+        generated. Children are yielded in finishing order. Clients without streaming
+        answer with one n-sample request, executed after it returns.
+        """
+        n = llm_kwargs["n"]
+        client = node.llm_client
+        if not hasattr(client, "generate_response_stream"):
+            responses, error = client.generate_response(prompt, n=n)
+            results = [(responses, True)] if error else [(resp, False) for resp in responses]
+            yield from self._children_from_results(node, results, llm_kwargs, logger)
+            return
+
+        action_name = metrics.current_action()
+        finished = queue.Queue()
+
+        def generate():
+            # The streaming thread does not inherit the caller's metrics action.
+            try:
+                with metrics.action(action_name):
+                    for item in client.generate_response_stream(prompt, n=n):
+                        finished.put(item)
+            finally:
+                finished.put(None)
+
+        producer = threading.Thread(target=generate, name="expand-stream", daemon=True)
+        producer.start()
+        yield from self._children_from_results(node, iter(finished.get, None), llm_kwargs, logger)
+        producer.join()
+
+    def _children_from_results(self, node: "MCTSNode", results, llm_kwargs: Dict[str, Any], logger=None):
+        for resp, error in results:
+            if error:
+                if logger:
+                    logger.warning(f"Error generating transformation response: {resp}")
+                else:
+                    print(f"Error generating transformation response: {resp}")
+                continue
+            tranformation = self.extract_tranformation_answer(resp["content"], node.llm_client)
+            yield self.make_child_node(node, tranformation, llm_kwargs, logger)
+
+    def make_child_node(self, node: "MCTSNode", tranformation, llm_kwargs: Dict[str, Any], logger=None) -> "MCTSNode":
+        child_node = copy.deepcopy(node)
+        child_node.node_type = MCTSNodeType.TRANSFORMATION
+        child_node.parent_node = node
+        child_node.parent_action = self
+        child_node.depth = node.depth + 1
+        child_node.children = []
+        child_node.path_nodes = node.path_nodes + [child_node]
+        child_node.transformation = tranformation
+        columns_match = None
+        if llm_kwargs.get("static_precheck", False):
+            tables, target_columns = llmRewardModel.table_columns(child_node.table_path)
+            report = analyze_transformation(tranformation, tables, target_columns)
+            if report.rejected:
+                columns_match = False
+                metrics.inc("static_precheck_rejections_total")
+                if logger:
+                    logger.info(f"Static check rejected transformation: {report.errors or report.columns}")
+        if columns_match is None:
+            _, _, columns_match,_ = llmRewardModel.execute_transformation(child_node.table_path, tranformation)
+        child_node.columns_match = columns_match
+        return child_node
     
     def extract_tranformation_answer(self, response: str, llm_client: LLMClient) -> str:
         response = response.strip()
@@ -179,7 +284,9 @@ class TransformationAction(MCTSAction):
         except json.JSONDecodeError:
             # If the response is not valid JSON, use llm_client.generate_response() with a new prompt to optimize it
             optimization_prompt = f"Please convert the following response into valid JSON format:\n\n{response}"
-            optimized_response, error = llm_client.generate_response(optimization_prompt, n=1)
+            metrics.inc("json_repair_total", action=metrics.current_action())
+            with tracing.span("json_repair", "llm"):
+                optimized_response, error = llm_client.generate_response(optimization_prompt, n=1)
             if error or not optimized_response:
                 print(f"Error optimizing response: {error}")
                 data = {"code": []}
@@ -191,6 +298,23 @@ class TransformationAction(MCTSAction):
                     data = {"code": []}
         return data.get("code", [])
 
+class LibraryTransformationAction(TransformationAction):
+    """
+    Reuse pipelines of similar solved tasks from the pipeline library, adapted to this
+    task's table and column names, without LLM calls.
+    
+    Valid previous nodes:
+    - Root node
+    """
+    def create_children_nodes(self, node: "MCTSNode", llm_kwargs: Dict[str, Any], logger=None) -> List["MCTSNode"]:
+        nodes = []
+        for candidate in node.library_candidates or []:
+            if logger:
+                logger.info(f"Seeding library pipeline from {candidate['source_task']} (similarity {candidate['similarity']:.2f})")
+            nodes.append(self.make_child_node(node, candidate["transformation"], llm_kwargs, logger))
+        return nodes
+
+
 class TransformationRevisionAction(MCTSAction):
     """
     Revise the SQL query with the given context.
@@ -216,6 +340,12 @@ class TransformationRevisionAction(MCTSAction):
                 orginal_code = path_node.transformation
         hint = f"\n\nHere are my previous thoughts:\n{previous_thoughts}" if previous_thoughts else ""
         prompt = get_transformation_revision_prompt(table_schema_dict=table_schema, hint=hint, original_code=orginal_code, error_message=error_message, exec_result=execution_result)
+        if llm_kwargs.get("adaptive_sampling", False):
+            sampler = AdaptiveSampler.from_kwargs(
+                node.llm_client, llm_kwargs, lambda content: self.extract_tranformation_answer(content, node.llm_client),
+                canonical_code, logger)
+            return [self.make_child_node(node, revised_transformation) for revised_transformation, _ in sampler.sample(prompt)]
+
         nodes = []
         while len(nodes) < llm_kwargs["n"]:
             new_llm_kwargs = copy.deepcopy(llm_kwargs)
@@ -228,18 +358,21 @@ class TransformationRevisionAction(MCTSAction):
                     print(f"Error generating transformation revision response: {responses}")
             for resp in responses:
                 response = resp["content"]
-                child_node = copy.deepcopy(node)
-                child_node.node_type = MCTSNodeType.REVISED_TRANSFORMATION
-                child_node.parent_node = node
-                child_node.parent_action = self
-                child_node.depth = node.depth + 1
-                child_node.children = []
-                child_node.path_nodes = node.path_nodes + [child_node]
                 revised_transformation = self.extract_tranformation_answer(response, node.llm_client)
-                child_node.revised_transformation = revised_transformation
-                nodes.append(child_node)
+                nodes.append(self.make_child_node(node, revised_transformation))
         return nodes
 
+    def make_child_node(self, node: "MCTSNode", revised_transformation) -> "MCTSNode":
+        child_node = copy.deepcopy(node)
+        child_node.node_type = MCTSNodeType.REVISED_TRANSFORMATION
+        child_node.parent_node = node
+        child_node.parent_action = self
+        child_node.depth = node.depth + 1
+        child_node.children = []
+        child_node.path_nodes = node.path_nodes + [child_node]
+        child_node.revised_transformation = revised_transformation
+        return child_node
+
     def extract_tranformation_answer(self, response: str, llm_client: LLMClient) -> str:
         response = response.strip()
         if response.startswith("```json"):
@@ -251,7 +384,9 @@ class TransformationRevisionAction(MCTSAction):
         except json.JSONDecodeError:
             # If the response is not valid JSON, use llm_client.generate_response() with a new prompt to optimize it
             optimization_prompt = f"Please convert the following response into valid JSON format:\n\n{response}"
-            optimized_response, error = llm_client.generate_response(optimization_prompt, n=1)
+            metrics.inc("json_repair_total", action=metrics.current_action())
+            with tracing.span("json_repair", "llm"):
+                optimized_response, error = llm_client.generate_response(optimization_prompt, n=1)
             if error or not optimized_response:
                 print(f"Error optimizing response: {error}")
                 data = {"code": []}
@@ -285,8 +420,10 @@ class EndAction(MCTSAction):
 NODE_TYPE_TO_VALID_ACTIONS.update({
     MCTSNodeType.ROOT: [
         SchemaMatchAction,
+        HeuristicSchemaMatchAction,
         IdentifyColumnFunctionsAction,
-        TransformationAction
+        TransformationAction,
+        LibraryTransformationAction
     ],
     MCTSNodeType.SCHEMA_MATCH: [
         IdentifyColumnFunctionsAction,
@@ -294,6 +431,7 @@ NODE_TYPE_TO_VALID_ACTIONS.update({
     ],
     MCTSNodeType.IDENTIFY_COLUMN_FUNCTIONS: [
         SchemaMatchAction,
+        HeuristicSchemaMatchAction,
         TransformationAction
     ],
     MCTSNodeType.TRANSFORMATION: [
@@ -0,0 +1,70 @@
+import time
+from typing import Any, Dict, Optional
+
+
+class SearchBudget:
+    """
+    Wall-clock, token and LLM-call limits for one MCTSSolver.solve call.
+
+    Usage is measured against the LLMClient counters at `start`, so a client shared
+    across tasks is fine. Limits are checked between search steps, so a step that is
+    already running (one expansion's LLM call) may overshoot a limit slightly.
+    """
+    def __init__(self, max_seconds: Optional[float] = None, max_tokens: Optional[int] = None,
+                 max_llm_calls: Optional[int] = None):
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.max_llm_calls = max_llm_calls
+        self.llm_client = None
+        self.start_time = None
+        self.start_tokens = 0
+        self.start_calls = 0
+        self.first_valid_time = None
+        self.stop_reason = None
+
+    @property
+    def enabled(self) -> bool:
+        return any(limit is not None for limit in (self.max_seconds, self.max_tokens, self.max_llm_calls))
+
+    def start(self, llm_client=None):
+        self.llm_client = llm_client
+        self.start_time = time.perf_counter()
+        self.start_tokens = llm_client.token_usage["total_tokens"] if llm_client else 0
+        self.start_calls = getattr(llm_client, "call_count", 0) if llm_client else 0
+        self.first_valid_time = None
+        self.stop_reason = None
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start_time if self.start_time is not None else 0.0
+
+    def tokens_used(self) -> int:
+        return self.llm_client.token_usage["total_tokens"] - self.start_tokens if self.llm_client else 0
+
+    def calls_used(self) -> int:
+        return getattr(self.llm_client, "call_count", 0) - self.start_calls if self.llm_client else 0
+
+    def exhausted(self) -> Optional[str]:
+        """Name of the first exhausted budget, or None."""
+        if self.stop_reason:
+            return self.stop_reason
+        if self.max_seconds is not None and self.elapsed() >= self.max_seconds:
+            self.stop_reason = "time"
+        elif self.max_tokens is not None and self.tokens_used() >= self.max_tokens:
+            self.stop_reason = "tokens"
+        elif self.max_llm_calls is not None and self.calls_used() >= self.max_llm_calls:
+            self.stop_reason = "llm_calls"
+        return self.stop_reason
+
+    def record_valid(self):
+        """Mark that a valid (reward 1.0) pipeline was found; only the first one counts."""
+        if self.first_valid_time is None:
+            self.first_valid_time = self.elapsed()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "elapsed_time": self.elapsed(),
+            "time_to_first_valid": self.first_valid_time,
+            "tokens": self.tokens_used(),
+            "llm_calls": self.calls_used(),
+            "stop_reason": self.stop_reason,
+        }
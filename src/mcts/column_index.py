@@ -0,0 +1,169 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.mcts.schema_pruner import name_similarity, normalize_name
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 61) - 1)
+_CHUNK = 4096
+
+
+class MinHasher:
+    """
+    MinHash over 32-bit value hashes with universal hashing (a * x + b) mod (2^61 - 1),
+    evaluated for all permutations at once with numpy.
+    """
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+
+    @staticmethod
+    def hash_values(values) -> np.ndarray:
+        if len(values) == 0:
+            return np.empty(0, dtype=np.uint64)
+        hashed = pd.util.hash_array(np.asarray(values, dtype=object))
+        return np.unique(hashed & np.uint64(0xFFFFFFFF))
+
+    def sketch(self, hashes: np.ndarray) -> np.ndarray:
+        signature = np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(hashes), _CHUNK):
+            chunk = hashes[start:start + _CHUNK]
+            permuted = (np.outer(self.a, chunk) + self.b[:, None]) % MERSENNE_PRIME
+            np.minimum(signature, permuted.min(axis=1), out=signature)
+        return signature
+
+
+def jaccard_estimate(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    return float(np.mean(sig_a == sig_b))
+
+
+class LSHIndex:
+    """Banded LSH over MinHash signatures; candidates share at least one band bucket."""
+    def __init__(self, num_perm: int, bands: int):
+        assert num_perm % bands == 0, "num_perm must be divisible by bands"
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.buckets: List[Dict[bytes, List[Any]]] = [defaultdict(list) for _ in range(bands)]
+
+    def _keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def insert(self, key, signature: np.ndarray):
+        for band, bucket in self._keys(signature):
+            self.buckets[band][bucket].append(key)
+
+    def query(self, signature: np.ndarray) -> set:
+        candidates = set()
+        for band, bucket in self._keys(signature):
+            candidates.update(self.buckets[band].get(bucket, ()))
+        return candidates
+
+
+def _normalize_values(series: pd.Series) -> np.ndarray:
+    values = series.dropna()
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        # 3 and 3.0 should collide across tables with int and float columns.
+        numbers = values.astype(float)
+        whole = np.isfinite(numbers) & (numbers == np.floor(numbers)) & (numbers.abs() < 2 ** 53)
+        normalized = numbers.astype(str)
+        normalized[whole] = numbers[whole].astype(np.int64).astype(str)
+        return normalized.unique()
+    return values.astype(str).str.strip().str.lower().unique()
+
+
+def _name_shingles(name, size: int = 3) -> List[str]:
+    padded = f"^{normalize_name(name)}$"
+    return [padded[i:i + size] for i in range(max(len(padded) - size + 1, 1))]
+
+
+class ColumnIndex:
+    """
+    Per-task index of source columns for join-key and column-provenance discovery.
+
+    Column values are sketched with MinHash and bucketed with LSH, so joinable
+    column pairs are found without comparing every pair of columns. Target
+    columns are looked up through a second LSH index over name shingles, since
+    target instances are not available.
+    """
+    def __init__(self, num_perm: int = 128, value_bands: int = 32, name_bands: int = 64,
+                 min_distinct: int = 3, seed: int = 1):
+        self.hasher = MinHasher(num_perm, seed)
+        self.value_lsh = LSHIndex(num_perm, value_bands)
+        self.name_lsh = LSHIndex(num_perm, name_bands)
+        self.min_distinct = min_distinct
+        self.signatures: Dict[Tuple[str, Any], np.ndarray] = {}
+        self.distinct_counts: Dict[Tuple[str, Any], int] = {}
+
+    @classmethod
+    def from_tables(cls, table_dict: Dict[str, pd.DataFrame], **kwargs) -> "ColumnIndex":
+        index = cls(**kwargs)
+        for name, df in table_dict.items():
+            index.add_table(name, df)
+        return index
+
+    def add_table(self, table: str, df: pd.DataFrame):
+        for position, column in enumerate(df.columns):
+            key = (table, column)
+            self.name_lsh.insert(key, self.hasher.sketch(self.hasher.hash_values(_name_shingles(column))))
+            hashes = self.hasher.hash_values(_normalize_values(df.iloc[:, position]))
+            self.distinct_counts[key] = len(hashes)
+            # Near-constant columns (flags, booleans) overlap with everything; skip them.
+            if len(hashes) < self.min_distinct:
+                continue
+            signature = self.hasher.sketch(hashes)
+            self.signatures[key] = signature
+            self.value_lsh.insert(key, signature)
+
+    def joinable_pairs(self, min_containment: float = 0.5) -> List[Dict[str, Any]]:
+        """Column pairs from different tables whose value sets overlap, best first."""
+        pairs = {}
+        for key, signature in self.signatures.items():
+            for other in self.value_lsh.query(signature):
+                if other[0] == key[0] or (other, key) in pairs:
+                    continue
+                jaccard = jaccard_estimate(signature, self.signatures[other])
+                size_a, size_b = self.distinct_counts[key], self.distinct_counts[other]
+                intersection = jaccard * (size_a + size_b) / (1 + jaccard)
+                containment = min(intersection / min(size_a, size_b), 1.0)
+                if containment >= min_containment:
+                    pairs[(key, other)] = {"left": key, "right": other, "jaccard": jaccard, "containment": containment}
+        return sorted(pairs.values(), key=lambda p: (-p["containment"], -p["jaccard"]))
+
+    def target_candidates(self, target_columns: List[Any], min_similarity: float = 0.5, limit: int = 3) -> Dict[Any, List[Tuple[str, Any, float]]]:
+        """Source columns whose names are close to each target column."""
+        candidates = {}
+        for target in target_columns:
+            signature = self.hasher.sketch(self.hasher.hash_values(_name_shingles(target)))
+            scored = []
+            for table, column in self.name_lsh.query(signature):
+                similarity = name_similarity(column, target)
+                if similarity >= min_similarity:
+                    scored.append((table, column, similarity))
+            scored.sort(key=lambda c: -c[2])
+            candidates[target] = scored[:limit]
+        return candidates
+
+    def hints(self, target_columns: Optional[List[Any]] = None, max_pairs: int = 10) -> str:
+        """Render join-key and provenance candidates as prompt hints."""
+        lines = []
+        pairs = self.joinable_pairs()[:max_pairs]
+        if pairs:
+            lines.append("Join key candidates (source columns with overlapping values):")
+            for pair in pairs:
+                (table_a, col_a), (table_b, col_b) = pair["left"], pair["right"]
+                lines.append(f"- {table_a}.{col_a} ~ {table_b}.{col_b} "
+                             f"(jaccard≈{pair['jaccard']:.2f}, containment≈{pair['containment']:.2f})")
+        if target_columns:
+            provenance = [(target, cands) for target, cands in self.target_candidates(target_columns).items() if cands]
+            if provenance:
+                lines.append("Possible source columns for target columns:")
+                for target, cands in provenance:
+                    sources = ", ".join(f"{table}.{column}" for table, column, _ in cands)
+                    lines.append(f"- {target} <- {sources}")
+        return "\n".join(lines)
@@ -2,20 +2,62 @@ import json
 import os
 import pandas as pd
 import numpy as np
+from pathlib import Path
 from pandas.testing import assert_frame_equal
+from src.mcts.profile import load_task_profiles, column_names, format_table
+from src.mcts.schema_pruner import SchemaPruner, estimate_tokens
+
+def task_data_type(folder_path):
+    """
+    Data type of a task folder, following the length{n}_{m} / group{n}_{m} layouts.
+    """
+    name = Path(folder_path).name
+    if 'length' in name:
+        return "auto_pipeline"
+    if 'group' in name:
+        return "buildings"
+    return None
+
+# Fixed headings that MCTSSolver.solve adds around the table sections.
+SCHEMA_TEMPLATE_TOKENS = 20
 
 class DataProcessor:
-    def __init__(self, folder_path, data_type, meta_path = None):
+    def __init__(self, folder_path, data_type, meta_path = None, profile_cache_dir = None):
         """
+        Source tables are read lazily: prompts are built from cached table profiles,
+        so the raw CSVs are only parsed when a profile has to be (re)computed.
         """
-        self.table_dict = {}
+        self.folder_path = folder_path
+        self._table_dict = None
         self.schema_match = None
         self.meta_data = None
         self.data_type = data_type
-        self._read_csv_files(folder_path)
+        self.profile_cache_dir = profile_cache_dir
+        self.profiles = None
+        self.pruning_report = None
         if meta_path:
             self._read_meta_file(meta_path)
 
+    @property
+    def table_dict(self):
+        if self._table_dict is None:
+            self._read_csv_files(self.folder_path)
+        return self._table_dict
+
+    @table_dict.setter
+    def table_dict(self, value):
+        self._table_dict = value
+
+    def get_profiles(self):
+        """
+        Column profiles (dtype, null rate, cardinality, min/max, samples) of every table.
+        """
+        if self.profiles is None:
+            self.profiles = load_task_profiles(self.folder_path, self.data_type,
+                                               table_loader=lambda: self.table_dict,
+                                               cache_dir=self.profile_cache_dir)
+        return self.profiles
+
     def _read_csv_files(self, folder_path):
         """
         """
@@ -51,36 +93,75 @@ class DataProcessor:
         with open(meta_path, 'r', encoding='utf-8') as file:
             self.meta_data = json.load(file)
             
-    def process_tables(self):
+    @classmethod
+    def for_task(cls, folder_path, profile_cache_dir = None):
+        """
+        Build a processor for a task folder, inferring the data type from the folder layout.
+        """
+        folder_path = Path(folder_path)
+        data_type = task_data_type(folder_path)
+        meta_path = folder_path / "meta.json"
+        return cls(folder_path, data_type, meta_path if meta_path.exists() else None, profile_cache_dir)
+
+    def _meta_schema(self):
+        # e.g. "CST TEXT, 1:00 NUMERIC" -> [("CST", "TEXT"), ("1:00", "NUMERIC")]
+        schema = self.meta_data.get('Target Data Schema', '') if self.meta_data else ''
+        columns = []
+        for part in schema.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            name, _, sql_type = part.rpartition(' ')
+            columns.append((name, sql_type) if name else (sql_type, None))
+        return columns
+
+    def target_columns(self):
+        """
+        Target column names, from the target table if present, otherwise from the meta schema.
+        """
+        profiles = self.get_profiles()
+        if 'target' in profiles:
+            return column_names(profiles['target'])
+        return [name for name, _ in self._meta_schema()]
+
+    def target_column_types(self):
+        """
+        Declared (meta schema) type of each target column; target instances are not used.
         """
+        return {name: sql_type for name, sql_type in self._meta_schema() if sql_type}
+
+    def process_tables(self, token_budget = None):
         """
-        source_tables = []
+        :param token_budget: if set, source columns irrelevant to the target schema are
+                             abbreviated or dropped so the schema string fits this many tokens.
+        """
+        source_profiles = {}
         target_table = None
 
-        for key, df in self.table_dict.items():
-            caption = f"**Table Caption:** {key}"
-            columns = "**Columns:**\n" + "\n".join([f"- {col}" for col in df.columns])
-            
-            rows = []
-            for idx, (_, row) in enumerate(df.head(3).iterrows(), 1):
-                row_str = " | ".join(map(str, row.values))
-                rows.append(f"{idx}. | {row_str} |")
-            rows_str = "**Rows:**\n" + "\n".join(rows)
-            
-            table_str = f"{caption}\n{columns}\n{rows_str}"
-            
+        for key, profile in self.get_profiles().items():
             if key == 'target':
-                target_table = f"{caption}\n{columns}"
+                target_table = format_table(key, profile, with_rows=False)
             else:
-                source_tables.append(table_str)
+                source_profiles[key] = profile
         target_data_description = ""
         source_data_description = ""    
         if self.meta_data:
-            target_table = f"**Table Caption:** {self.meta_data.get('Target Data Name','')}\n**Columns:**\n{self.meta_data.get('Target Data Schema', '')}"
+            if 'Target Data Schema' in self.meta_data or target_table is None:
+                target_table = f"**Table Caption:** {self.meta_data.get('Target Data Name','')}\n**Columns:**\n{self.meta_data.get('Target Data Schema', '')}"
             target_data_description = self.meta_data.get('Target Data Description', '')
             source_data_description = self.meta_data.get('Source Data Description', '')
+
+        if token_budget:
+            pruner = SchemaPruner(token_budget)
+            reserved = estimate_tokens(f"{target_table}\n{target_data_description}\n{source_data_description}") + SCHEMA_TEMPLATE_TOKENS
+            source_tables, self.pruning_report = pruner.prune(source_profiles, self.target_columns(),
+                                                              reserved_tokens=reserved,
+                                                              target_types=self.target_column_types(),
+                                                              target_description=target_data_description)
+        else:
+            source_tables = "\n".join(format_table(key, profile) for key, profile in source_profiles.items())
         return {
-            "source_tables": "\n".join(source_tables),
+            "source_tables": source_tables,
             "target_table": target_table,
             "target_data_description": target_data_description,
             "source_data_description": source_data_description
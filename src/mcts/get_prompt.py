@@ -1,4 +1,7 @@
-def get_schema_match_prompt(table_schema_dict, hint):
+def _data_hints_section(data_hints):
+    return f"Data Hints:\n{data_hints}\n" if data_hints else ""
+
+def get_schema_match_prompt(table_schema_dict, hint, data_hints=""):
 
     return f"""
 You are a highly meticulous and intelligent schema matcher specialized in data transformation tracing.
@@ -47,7 +50,7 @@ Please respond with your reasoning process and a JSON object structured as follo
 
 Take a deep breath and think logically. If you do the task correctly, I will give you 1 million dollars.
 Table Schema:\n{table_schema_dict}
-Hint:\n{hint}
+{_data_hints_section(data_hints)}Hint:\n{hint}
 
 Please output your reasoning process first after "# Reasoning Process", and output a JSON object within ```json``` tags.
 """
@@ -99,7 +102,7 @@ Hint:\n{hint}
 Answer:
     """
 
-def get_transformation_prompt(table_schema_dict, hint):
+def get_transformation_prompt(table_schema_dict, hint, data_hints=""):
     return f"""
 You are a data transformation expert specializing in table conversions using Python and pandas.
 
@@ -136,7 +139,7 @@ Respond with a JSON object in the following format:
 **Table Schema:**
 {table_schema_dict}
 
-**Hint:**
+{_data_hints_section(data_hints)}**Hint:**
 {hint}
 
 Only output the JSON object above (starting with ```json and ending with ```), and nothing else.
@@ -253,4 +256,66 @@ Output a **JSON object enclosed in triple backticks** like this:
 {column_match_str}
 
 Only output the JSON object above (starting with ```json and ending with ```), and nothing else.
-"""
\ No newline at end of file
+"""
+
+def get_batch_reward_prompt(table_schema_dict, candidates):
+    """
+    :param candidates: list of dicts with "transformation", "resulting_table" and "column_match_str".
+    """
+    candidate_sections = "\n".join(
+        f"""### Candidate {i}
+
+**Python code:**
+{candidate["transformation"]}
+
+**Resulting Table:**
+{candidate["resulting_table"]}
+
+**Hint:**
+{candidate["column_match_str"]}
+""" for i, candidate in enumerate(candidates, start=1))
+    return f"""
+You are a data transformation expert with exceptional knowledge of table processing using Python and pandas.
+
+Your task is to evaluate, for each of the {len(candidates)} candidates below, whether its historical operations successfully transformed the **source tables** into the desired **target table structure**.
+
+For every candidate I will provide:
+
+* The sequence of historical operations performed
+* The resulting table after executing those operations
+
+All candidates share the same source tables and target table. Judge every candidate independently, **based on structure and logic**.
+
+---
+
+### Reward Criteria:
+
+| Reward  | Description                                                                                                                                                    |
+| ------- | -------------------------------------------------------------------------------------------------------------------------------------------------------------- |
+| **1**   | **Exact match**: All required transformations are complete and correct. The result table structure and logic match the target. |
+| **0.5** | **Partially correct**: Some valid transformations are present, but more steps are needed (e.g., missing aggregation, join, or pivot).                          |
+| **0**   | **Incorrect**: The logic of the operations is flawed, missing essential steps, or structurally incorrect.                                                      |
+
+---
+
+### Output Format:
+
+Output a **JSON array enclosed in triple backticks** with one object per candidate, in candidate order:
+
+```json
+[
+  {{
+    "candidate": 1,
+    "reason": "Concise explanation of correctness or flaw.",
+    "reward": "1"
+  }}
+]
+```
+
+---
+**Table Schema:**
+{table_schema_dict}
+
+{candidate_sections}
+Only output the JSON array above (starting with ```json and ending with ```), and nothing else.
+"""
@@ -0,0 +1,88 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.mcts.schema_pruner import name_similarity, normalize_name, type_compatibility
+
+
+class HeuristicSchemaMatcher:
+    """
+    Deterministic column matcher: scores every (target column, source column) pair
+    by normalized-name similarity and compatibility with the declared target type,
+    and produces the same mapping JSON that SchemaMatchAction extracts from LLM answers.
+    Only the target schema is used, never target table instances.
+    """
+    def __init__(self, min_score: float = 0.6, name_weight: float = 0.75, type_weight: float = 0.25):
+        self.min_score = min_score
+        self.name_weight = name_weight
+        self.type_weight = type_weight
+
+    def score(self, source_col: Dict[str, Any], target_name, target_dtype: Optional[str]) -> float:
+        name = name_similarity(source_col["name"], target_name)
+        types = type_compatibility(source_col.get("dtype"), target_dtype)
+        return (self.name_weight * name + self.type_weight * types) / (self.name_weight + self.type_weight)
+
+    @staticmethod
+    def _name_rank(source_name, target_name) -> int:
+        if str(source_name) == str(target_name):
+            return 2
+        return 1 if normalize_name(source_name) == normalize_name(target_name) else 0
+
+    def _best_in_table(self, profile: Dict[str, Any], target, target_dtype: Optional[str]) -> Tuple[float, Any, int]:
+        """(best score, chosen column, number of columns left tied with it after the name tie-break)."""
+        scored = [(self.score(col, target, target_dtype), col["name"]) for col in profile["columns"]]
+        if not scored:
+            return 0.0, None, 0
+        best = max(score for score, _ in scored)
+        tied = [name for score, name in scored if abs(score - best) <= 1e-9]
+        top_rank = max(self._name_rank(name, target) for name in tied)
+        tied = [name for name in tied if self._name_rank(name, target) == top_rank]
+        return best, tied[0], len(tied)
+
+    def match(self, source_profiles: Dict[str, Dict[str, Any]], target_columns: List[str],
+              target_types: Optional[Dict[str, str]] = None) -> Tuple[List[Dict[str, Any]], float]:
+        """
+        :param target_types: declared type per target column (e.g. from the meta schema).
+        :return: (mapping list in the schema-match JSON format, confidence). At most one
+                 column per source table is mapped to a target column; several tables are
+                 kept only when their best columns score equally (e.g. a join key). The
+                 confidence is the lowest best-candidate score over all target columns,
+                 divided by the number of equally good columns left in a table, so a task
+                 is only considered solved when every target column has one convincing source.
+        """
+        target_types = target_types or {}
+
+        mappings = []
+        confidence = 1.0 if target_columns else 0.0
+        for target in target_columns:
+            best_score = 0.0
+            best_sources: Dict[str, List[Any]] = {}
+            ambiguity = 1
+            for table, profile in source_profiles.items():
+                score, name, tied = self._best_in_table(profile, target, target_types.get(target))
+                if name is None or score <= 0:
+                    continue
+                if score > best_score + 1e-9:
+                    best_score, best_sources, ambiguity = score, {table: [name]}, tied
+                elif abs(score - best_score) <= 1e-9:
+                    # Same column in several tables (e.g. a join key): keep one per table.
+                    best_sources[table] = [name]
+                    ambiguity = max(ambiguity, tied)
+            if best_score < self.min_score:
+                best_sources = {}
+            mappings.append({"target_column": target, "sources": best_sources})
+            confidence = min(confidence, best_score / ambiguity)
+        return mappings, confidence
+
+    @staticmethod
+    def to_json(mappings: List[Dict[str, Any]]) -> str:
+        return json.dumps(mappings, ensure_ascii=False, indent=2)
+
+    def match_task(self, folder_path) -> Tuple[str, float]:
+        """Match a task folder from its cached table profiles; returns (mapping JSON, confidence)."""
+        from src.mcts.data import DataProcessor
+        data_processor = DataProcessor.for_task(folder_path)
+        profiles = data_processor.get_profiles()
+        source_profiles = {key: profile for key, profile in profiles.items() if key != 'target'}
+        mappings, confidence = self.match(source_profiles, data_processor.target_columns(),
+                                          target_types=data_processor.target_column_types())
+        return self.to_json(mappings), confidence
@@ -0,0 +1,286 @@
+import ast
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within a process
+    fcntl = None
+
+import numpy as np
+
+from src.mcts.schema_pruner import name_similarity, normalize_name, type_category
+from src.mcts.static_check import analyze_transformation
+
+EMBEDDING_DIM = 256
+LIBRARY_VERSION = 1
+
+
+def embed_names(names: List[Any], dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """
+    Bag-of-character-trigram embedding of a set of column names, hashed into `dim`
+    buckets and L2-normalized, so similar schemas have a high cosine similarity.
+    """
+    vector = np.zeros(dim)
+    for name in names:
+        padded = f"^{normalize_name(name)}$"
+        for i in range(max(len(padded) - 2, 1)):
+            bucket = int(hashlib.md5(padded[i:i + 3].encode()).hexdigest()[:8], 16) % dim
+            vector[bucket] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _cosine(a, b) -> float:
+    return float(np.dot(a, b))
+
+
+def _jaccard(a, b) -> float:
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a | b else 0.0
+
+
+def task_signature(folder_path) -> Dict[str, Any]:
+    """
+    Schema signature of a task: the source tables as exposed to generated code, with
+    column dtypes, and the target column names and types. No data instances are stored.
+    """
+    from src.mcts.data import DataProcessor
+    from src.mcts.reward import llmRewardModel
+
+    tables, target_columns = llmRewardModel.table_columns(folder_path)
+    data_processor = DataProcessor.for_task(folder_path)
+    profiles = data_processor.get_profiles()
+    sources = {}
+    for key, columns in tables.items():
+        if key.startswith('target'):
+            continue
+        dtypes = {col["name"]: col["dtype"] for col in profiles.get(key, {}).get("columns", [])}
+        sources[key] = [[col, dtypes.get(col)] for col in columns]
+    target_types = data_processor.target_column_types()
+    target_columns = target_columns or data_processor.target_columns()
+    return {
+        "sources": sources,
+        "target_table": next((key for key in tables if key.startswith('target')), None),
+        "target": [[col, target_types.get(col)] for col in target_columns],
+    }
+
+
+def _source_tokens(signature: Dict[str, Any]) -> set:
+    return {f"{normalize_name(name)}:{type_category(dtype)}" for columns in signature["sources"].values()
+            for name, dtype in columns}
+
+
+def signature_similarity(a: Dict[str, Any], b: Dict[str, Any], source_weight: float = 0.5) -> float:
+    """Source column (name, type) Jaccard blended with the cosine of the target schema embeddings."""
+    source = _jaccard(_source_tokens(a), _source_tokens(b))
+    target = _cosine(embed_names([name for name, _ in a["target"]]), embed_names([name for name, _ in b["target"]]))
+    return source_weight * source + (1 - source_weight) * target
+
+
+class _Renamer(ast.NodeTransformer):
+    def __init__(self, names: Dict[str, str], strings: Dict[str, str]):
+        self.names = names
+        self.strings = strings
+
+    def visit_Name(self, node):
+        if node.id in self.names:
+            return ast.copy_location(ast.Name(id=self.names[node.id], ctx=node.ctx), node)
+        return node
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, str) and node.value in self.strings:
+            return ast.copy_location(ast.Constant(value=self.strings[node.value]), node)
+        return node
+
+
+def _best_mapping(old: List[Tuple[Any, Any]], new: List[Tuple[Any, Any]], threshold: float,
+                  typed_threshold: float = 0.5) -> Dict[Any, Any]:
+    """
+    Greedy one-to-one mapping of (name, dtype) columns by name similarity, identical
+    names first. Pairs of the same type category need only `typed_threshold`.
+    """
+    pairs = []
+    for i, (old_name, old_type) in enumerate(old):
+        for j, (new_name, new_type) in enumerate(new):
+            score = name_similarity(old_name, new_name)
+            same_type = type_category(old_type) is not None and type_category(old_type) == type_category(new_type)
+            if score >= threshold or (same_type and score >= typed_threshold):
+                pairs.append((score, i, j))
+    pairs.sort(reverse=True)
+    mapping, used_old, used_new = {}, set(), set()
+    for score, i, j in pairs:
+        if i in used_old or j in used_new:
+            continue
+        used_old.add(i)
+        used_new.add(j)
+        mapping[old[i][0]] = new[j][0]
+    return mapping
+
+
+def adapt_transformation(transformation: List[str], old: Dict[str, Any], new: Dict[str, Any],
+                         column_threshold: float = 0.8) -> Optional[List[str]]:
+    """
+    Rewrite a stored pipeline for a new task: table names are mapped by column overlap,
+    column (and target column) string literals by name similarity.
+    :return: the adapted code list, or None when a source table has no counterpart.
+    """
+    try:
+        trees = [ast.parse(code) for code in transformation]
+    except SyntaxError:
+        return None
+    referenced = {node.id for tree in trees for node in ast.walk(tree) if isinstance(node, ast.Name)}
+
+    table_map = {}
+    for old_key, old_columns in old["sources"].items():
+        if old_key not in referenced:
+            continue
+        old_names = [normalize_name(name) for name, _ in old_columns]
+        candidates = sorted(((_jaccard(old_names, [normalize_name(name) for name, _ in columns]), key)
+                             for key, columns in new["sources"].items() if key not in table_map.values()), reverse=True)
+        if not candidates:
+            return None
+        table_map[old_key] = candidates[0][1]
+
+    strings = {}
+    for old_key, new_key in table_map.items():
+        strings.update(_best_mapping(old["sources"][old_key], new["sources"][new_key], column_threshold))
+    strings.update(_best_mapping(old["target"], new["target"], column_threshold))
+    if old.get("target_table") and new.get("target_table"):
+        table_map[old["target_table"]] = new["target_table"]
+    strings = {o: n for o, n in strings.items() if isinstance(o, str) and isinstance(n, str) and o != n}
+    names = {o: n for o, n in table_map.items() if o != n}
+
+    renamer = _Renamer(names, strings)
+    return [ast.unparse(ast.fix_missing_locations(renamer.visit(tree))) for tree in trees]
+
+
+class PipelineLibrary:
+    """
+    Persistent store of pipelines that reached reward 1.0, indexed by task schema
+    signature. New tasks retrieve pipelines of the most similar solved tasks, adapted
+    to their own table and column names, as seed candidates and few-shot hints.
+
+    The library is a single JSON file; writes hold an exclusive lock on a sidecar
+    `<path>.lock` file (flock, POSIX only) while they merge with the file's current
+    content and replace it atomically, so several worker threads and processes on
+    one host can share one library. flock is not reliable on every network file system.
+    """
+    def __init__(self, path: str, min_similarity: float = 0.6, top_k: int = 2):
+        self.path = path
+        self.min_similarity = min_similarity
+        self.top_k = top_k
+        self.entries: List[Dict[str, Any]] = []
+        self._mtime = None
+        # Serializes writers within one process (e.g. service worker threads); _file_lock across processes.
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        if not os.path.exists(self.path):
+            return
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == LIBRARY_VERSION:
+            self.entries = data.get("entries", [])
+            self._mtime = mtime
+
+    @staticmethod
+    def _entry_id(task: Optional[str], transformation: List[str]) -> str:
+        return hashlib.sha1(json.dumps([task, transformation]).encode()).hexdigest()
+
+    def add(self, signature: Dict[str, Any], transformation: List[str], task: Optional[str] = None) -> bool:
+        """Store a solved pipeline; returns False if it is already in the library."""
+        if not transformation:
+            return False
+        with self._lock, self._file_lock():
+            self._mtime = None  # always re-read under the lock
+            self.reload()
+            entry_id = self._entry_id(task, transformation)
+            if any(entry["id"] == entry_id for entry in self.entries):
+                return False
+            self.entries = self.entries + [{"id": entry_id, "task": task, "signature": signature,
+                                            "transformation": transformation}]
+            self._save()
+        return True
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({"version": LIBRARY_VERSION, "entries": self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def retrieve(self, signature: Dict[str, Any], task: Optional[str] = None) -> List[Tuple[float, Dict[str, Any]]]:
+        """Most similar library entries (excluding the task itself), best first."""
+        self.reload()
+        scored = []
+        for entry in self.entries:
+            if task is not None and entry.get("task") == task:
+                continue
+            score = signature_similarity(signature, entry["signature"])
+            if score >= self.min_similarity:
+                scored.append((score, entry))
+        scored.sort(key=lambda item: -item[0])
+        return scored[:self.top_k]
+
+    def candidates(self, folder_path, task: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Adapted pipelines of similar solved tasks that pass the static check on this task.
+        :return: [{"transformation", "similarity", "source_task"}]
+        """
+        if not self.entries and not os.path.exists(self.path):
+            return []
+        signature = task_signature(folder_path)
+        tables = {key: [name for name, _ in columns] for key, columns in signature["sources"].items()}
+        if signature["target_table"]:
+            tables[signature["target_table"]] = [name for name, _ in signature["target"]]
+        target_columns = [name for name, _ in signature["target"]]
+        candidates, seen = [], set()
+        for score, entry in self.retrieve(signature, task):
+            adapted = adapt_transformation(entry["transformation"], entry["signature"], signature)
+            if not adapted or tuple(adapted) in seen:
+                continue
+            if analyze_transformation(adapted, tables, target_columns).rejected:
+                continue
+            seen.add(tuple(adapted))
+            candidates.append({"transformation": adapted, "similarity": score, "source_task": entry.get("task")})
+        return candidates
+
+    @staticmethod
+    def hints(candidates: List[Dict[str, Any]]) -> str:
+        """Render retrieved pipelines as few-shot examples for the prompts."""
+        if not candidates:
+            return ""
+        lines = ["Pipelines that solved tasks with similar schemas (adapted to this task's names):"]
+        for candidate in candidates:
+            lines.append(f"- similarity {candidate['similarity']:.2f}:")
+            lines.append(json.dumps({"code": candidate["transformation"]}, ensure_ascii=False))
+        return "\n".join(lines)
@@ -0,0 +1,384 @@
+"""
+Column-pruned and chunked reading of task source tables for candidate execution.
+
+`column_plan` decides from the candidate code which source tables and columns it can
+observe. Tables that the code never names are not read. A referenced table is cut
+to the columns whose names occur in the code (string constants, attribute names,
+keyword names) plus the target columns, and only when pruning provably does not
+change the result:
+- the static interpreter knows the output columns and predicts the same ones on the
+  pruned tables;
+- the code contains no construct whose result depends on unnamed columns
+  (positional access, `df.columns`, whole-row `dropna`/`drop_duplicates`,
+  row-wise aggregates, key-less merges, iteration over frames, `query`/`eval`).
+
+Large files are read in chunks of `chunk_rows` rows. Numeric dtypes known from the
+table profiles are passed to the parser explicitly. Pruning is off by default.
+
+The lean execution environment (`lean_env`, off by default) loads tables with
+compact dtypes and, with `copy_on_write` (also off by default), turns on pandas
+copy-on-write for the process: string columns
+with few distinct values become `category`, integer columns are narrowed to the
+smallest type of at least `min_int_bits` bits that holds their range, and float
+columns become float32 when `downcast_floats` is set. With a warm profile cache the
+dtypes are chosen before parsing; otherwise each table (or chunk) is converted after
+parsing. Every `verify_every`-th lean execution of a task (starting with the first)
+is repeated on standard dtypes, with copy-on-write suspended, and compared with
+`same_result`; the other lean executions are not checked.
+"""
+import ast
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.mcts.static_check import analyze_transformation
+from src.utils import metrics
+
+_OPTIONS = {"prune_columns": False, "chunked_read_bytes": None, "chunk_rows": 100_000, "lean_env": False,
+            "copy_on_write": False, "category_max_ratio": 0.5, "min_int_bits": 32, "downcast_floats": False,
+            "verify_every": 10}
+_INT_TYPES = ((8, "int8"), (16, "int16"), (32, "int32"))
+_lean_lock = threading.Lock()
+_lean_executions: Dict[str, int] = {}
+_lean_disabled: set = set()
+_cow_lock = threading.Lock()
+_cow_suspended = 0
+
+# Results depend on every column of the receiver unless it is a column selection.
+_WHOLE_FRAME_ATTRIBUTES = {
+    "iloc", "iat", "columns", "dtypes", "select_dtypes", "values", "to_numpy", "to_dict", "to_records",
+    "shape", "size", "ndim", "axes", "T", "transpose", "stack", "unstack", "filter", "keys", "items",
+    "iteritems", "iterrows", "itertuples", "isna", "isnull", "notna", "notnull", "any", "all", "count",
+    "nunique", "describe", "info", "equals", "compare", "corr", "cov", "memory_usage", "xs", "squeeze",
+    "idxmax", "idxmin", "mode", "query", "eval", "add_prefix", "add_suffix",
+}
+# Whole-row semantics unless restricted with one of the keywords.
+_KEYED_METHODS = {
+    "dropna": {"subset"},
+    "drop_duplicates": {"subset"},
+    "duplicated": {"subset"},
+    "melt": {"value_vars"},
+    "merge": {"on", "left_on", "right_on", "left_index", "right_index"},
+}
+_ROW_WISE_METHODS = {"apply", "agg", "aggregate", "sum", "mean", "median", "min", "max", "std", "var", "prod",
+                     "cumsum", "cumprod", "cummax", "cummin", "bfill", "ffill", "fillna", "interpolate", "diff",
+                     "shift", "rank", "transform"}
+_DYNAMIC_NAMES = {"eval", "exec", "locals", "globals", "vars", "getattr", "setattr", "hasattr"}
+_ITERATING_BUILTINS = {"list", "tuple", "set", "frozenset", "sorted", "dict", "iter", "enumerate", "zip", "map"}
+
+
+def configure(prune_columns: bool = False, chunked_read_mb: Optional[float] = None, chunk_rows: int = 100_000,
+              lean_env: bool = False, copy_on_write: bool = False, category_max_ratio: Optional[float] = 0.5,
+              min_int_bits: Optional[int] = 32, downcast_floats: bool = False, verify_every: int = 10):
+    _OPTIONS["prune_columns"] = prune_columns
+    _OPTIONS["chunked_read_bytes"] = int(chunked_read_mb * (1 << 20)) if chunked_read_mb else None
+    _OPTIONS["chunk_rows"] = chunk_rows
+    _OPTIONS["lean_env"] = lean_env
+    _OPTIONS["category_max_ratio"] = category_max_ratio
+    _OPTIONS["min_int_bits"] = min_int_bits
+    _OPTIONS["downcast_floats"] = downcast_floats
+    _OPTIONS["verify_every"] = verify_every
+    was_enabled = _OPTIONS["copy_on_write"]
+    _OPTIONS["copy_on_write"] = bool(lean_env and copy_on_write)
+    if _OPTIONS["copy_on_write"] != was_enabled:
+        # Process-wide: pandas options are not thread-local and solvers may share the process.
+        pd.set_option("mode.copy_on_write", _OPTIONS["copy_on_write"])
+
+
+def pruning_enabled() -> bool:
+    return _OPTIONS["prune_columns"]
+
+
+def _folder_key(folder_path) -> str:
+    return os.path.abspath(str(folder_path))
+
+
+def lean_enabled(folder_path) -> bool:
+    """Whether executions on this task folder load compact dtypes."""
+    return _OPTIONS["lean_env"] and _folder_key(folder_path) not in _lean_disabled
+
+
+def disable_lean(folder_path):
+    """Load standard dtypes for this task folder from now on (after a verification mismatch)."""
+    with _lean_lock:
+        _lean_disabled.add(_folder_key(folder_path))
+
+
+@contextmanager
+def standard_semantics():
+    """
+    Suspend the lean environment's copy-on-write while reference executions run, so
+    that verification also catches results that depend on it. Nested and concurrent
+    uses are counted; copy-on-write is restored when the last one exits (lean
+    executions in other threads meanwhile run without it).
+    """
+    global _cow_suspended
+    if not _OPTIONS["copy_on_write"]:
+        yield
+        return
+    with _cow_lock:
+        _cow_suspended += 1
+        if _cow_suspended == 1:
+            pd.set_option("mode.copy_on_write", False)
+    try:
+        yield
+    finally:
+        with _cow_lock:
+            _cow_suspended -= 1
+            if _cow_suspended == 0 and _OPTIONS["copy_on_write"]:
+                pd.set_option("mode.copy_on_write", True)
+
+
+def verify_due(folder_path) -> bool:
+    """Count a lean execution of the task; True for the first one and every `verify_every`-th after it."""
+    every = _OPTIONS["verify_every"]
+    with _lean_lock:
+        key = _folder_key(folder_path)
+        count = _lean_executions.get(key, 0)
+        _lean_executions[key] = count + 1
+    return bool(every) and count % every == 0
+
+
+def _is_column_selection(node: ast.AST) -> bool:
+    # df['a'], df[['a', 'b']], df.loc[..., ['a', 'b']]
+    if not isinstance(node, ast.Subscript):
+        return False
+    index = node.slice
+    if isinstance(index, ast.Tuple) and len(index.elts) == 2:
+        index = index.elts[1]
+    if isinstance(index, ast.Constant):
+        return isinstance(index.value, str)
+    if isinstance(index, (ast.List, ast.Tuple)):
+        return all(isinstance(e, ast.Constant) and isinstance(e.value, str) for e in index.elts)
+    return False
+
+
+def _row_wise(call: ast.Call) -> bool:
+    for kw in call.keywords:
+        if kw.arg == "axis" and isinstance(kw.value, ast.Constant) and kw.value.value in (1, "columns"):
+            return True
+    return False
+
+
+def whole_frame_usage(tree: ast.AST) -> Optional[str]:
+    """The first construct that may observe unnamed columns, or None."""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.JoinedStr):
+            return "f-string"
+        if isinstance(node, ast.Attribute) and node.attr in _WHOLE_FRAME_ATTRIBUTES:
+            if not _is_column_selection(node.value):
+                return node.attr
+        if isinstance(node, (ast.For, ast.comprehension)) and isinstance(node.iter, (ast.Name, ast.Subscript)):
+            return "iteration"
+        if isinstance(node, ast.Call):
+            func = node.func
+            if isinstance(func, ast.Name) and func.id in _ITERATING_BUILTINS:
+                if any(isinstance(arg, (ast.Name, ast.Subscript)) for arg in node.args):
+                    return func.id
+            if isinstance(func, ast.Attribute):
+                keywords = {kw.arg for kw in node.keywords}
+                if func.attr in _KEYED_METHODS and not keywords & _KEYED_METHODS[func.attr]:
+                    if not _is_column_selection(func.value):
+                        return func.attr
+                if func.attr in _ROW_WISE_METHODS and _row_wise(node) and not _is_column_selection(func.value):
+                    return f"{func.attr}(axis=1)"
+    return None
+
+
+def _mentioned_names(tree: ast.AST) -> set:
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            names.add(node.value)
+        elif isinstance(node, ast.Attribute):
+            names.add(node.attr)
+        elif isinstance(node, ast.keyword) and node.arg:
+            names.add(node.arg)
+    return names
+
+
+def column_plan(transformation: List[str], tables: Dict[str, List[Any]],
+                target_columns: Optional[List[Any]] = None) -> Optional[Dict[str, Optional[List[Any]]]]:
+    """
+    {table name: columns to read, or None for all columns} for the tables the code
+    references; unreferenced tables are left out. None when the code does not parse.
+    """
+    try:
+        tree = ast.Module(body=[stmt for code in transformation or [] if code for stmt in ast.parse(code).body],
+                          type_ignores=[])
+    except SyntaxError:
+        return None
+    referenced = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    if referenced & _DYNAMIC_NAMES:
+        return None
+    plan: Dict[str, Optional[List[Any]]] = {key: None for key in tables if key in referenced}
+    if whole_frame_usage(tree) is not None:
+        return plan
+    full = analyze_transformation(transformation, tables, target_columns)
+    if full.errors or full.columns is None:
+        return plan
+    keep = _mentioned_names(tree) | set(target_columns or [])
+    pruned_tables = dict(tables)
+    for key in plan:
+        pruned_tables[key] = [col for col in tables[key] if col in keep]
+    pruned = analyze_transformation(transformation, pruned_tables, target_columns)
+    if pruned.errors or pruned.columns != full.columns:
+        return plan
+    for key in plan:
+        if len(pruned_tables[key]) < len(tables[key]):
+            plan[key] = pruned_tables[key]
+    return plan
+
+
+def _cached_profile(folder_path, key: str) -> Optional[Dict[str, Any]]:
+    from src.mcts.data import task_data_type
+    from src.mcts.profile import cached_profiles
+    profiles = cached_profiles(folder_path, task_data_type(folder_path))
+    return profiles.get(key) if profiles else None
+
+
+def known_dtypes(folder_path, key: str) -> Dict[str, str]:
+    """Numeric column dtypes of table `key` from the in-process profile cache, if it is warm."""
+    table = _cached_profile(folder_path, key)
+    if table is None:
+        return {}
+    return {col["name"]: col["dtype"] for col in table["columns"] if col["dtype"] in ("int64", "float64", "bool")}
+
+
+def _narrow_int(low, high) -> Optional[str]:
+    min_bits = _OPTIONS["min_int_bits"]
+    if min_bits is None:
+        return None
+    for bits, kind in _INT_TYPES:
+        info = np.iinfo(kind)
+        if bits >= min_bits and info.min <= low and high <= info.max:
+            return kind
+    return None
+
+
+def _is_categorical(distinct: int, non_null: float) -> bool:
+    ratio = _OPTIONS["category_max_ratio"]
+    return ratio is not None and non_null > 0 and distinct <= ratio * non_null
+
+
+def lean_dtypes(folder_path, key: str) -> Dict[str, str]:
+    """Parse dtypes of table `key` for the lean environment, from the profile cache if it is warm."""
+    table = _cached_profile(folder_path, key)
+    if table is None:
+        return {}
+    dtypes = {}
+    for col in table["columns"]:
+        kind = col["dtype"]
+        if kind == "int64" and col["min"] is not None:
+            kind = _narrow_int(col["min"], col["max"]) or kind
+        elif kind == "float64" and _OPTIONS["downcast_floats"]:
+            kind = "float32"
+        elif kind == "object" and _is_categorical(col["cardinality"], table["n_rows"] * (1 - col["null_rate"])):
+            kind = "category"
+        if kind in ("int8", "int16", "int32", "int64", "float32", "float64", "bool", "category"):
+            dtypes[col["name"]] = kind
+    return dtypes
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert the columns of a parsed CSV frame that still have default dtypes to compact ones."""
+    for position in range(df.shape[1]):
+        series = df.iloc[:, position]
+        kind = series.dtype
+        converted = None
+        if kind == np.int64 and len(series):
+            narrow = _narrow_int(series.min(), series.max())
+            converted = series.astype(narrow) if narrow else None
+        elif kind == np.float64 and _OPTIONS["downcast_floats"]:
+            converted = series.astype(np.float32)
+        elif kind == object and _is_categorical(series.nunique(), series.count()):
+            converted = series.astype("category")
+        if converted is not None:
+            df.isetitem(position, converted)
+    return df
+
+
+def _concat_chunks(chunks: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate chunks, keeping a column categorical if any chunk made it so (on the union of categories)."""
+    for position in range(chunks[0].shape[1]):
+        if not any(isinstance(chunk.dtypes.iloc[position], pd.CategoricalDtype) for chunk in chunks):
+            continue
+        parts = [chunk.iloc[:, position].astype("category") for chunk in chunks]
+        categories = pd.api.types.union_categoricals(parts).categories
+        for chunk, part in zip(chunks, parts):
+            chunk.isetitem(position, part.cat.set_categories(categories))
+    return pd.concat(chunks)
+
+
+def read_table(file_path: str, columns: Optional[List[Any]] = None, dtypes: Optional[Dict[str, str]] = None,
+               drop_first: bool = False, lean: bool = False) -> pd.DataFrame:
+    """
+    Read a source CSV. `columns` restricts the columns read (after dropping the leading
+    index column when `drop_first`); files above the chunking threshold are read in chunks.
+    `lean` converts the remaining default dtypes to compact ones, chunk by chunk.
+    """
+    usecols = None
+    size = os.path.getsize(file_path)
+    if columns is not None:
+        header = list(pd.read_csv(file_path, nrows=0).columns)
+        keep = set(columns)
+        usecols = [i for i, name in enumerate(header) if (drop_first and i == 0) or (name in keep)]
+        size = size * len(usecols) // max(len(header), 1)
+    dtype = {name: kind for name, kind in (dtypes or {}).items() if columns is None or name in set(columns)} or None
+    threshold = _OPTIONS["chunked_read_bytes"]
+    if threshold is not None and size > threshold:
+        chunks = [compact_frame(chunk) if lean else chunk
+                  for chunk in pd.read_csv(file_path, usecols=usecols, dtype=dtype, chunksize=_OPTIONS["chunk_rows"])]
+        if not chunks:
+            df = pd.read_csv(file_path, usecols=usecols, dtype=dtype, nrows=0)
+        else:
+            df = _concat_chunks(chunks) if lean else pd.concat(chunks)
+        mode = "chunked"
+    else:
+        df = pd.read_csv(file_path, usecols=usecols, dtype=dtype)
+        if lean:
+            df = compact_frame(df)
+        mode = "pruned" if usecols is not None else "full"
+    metrics.inc("table_loads_total", mode=mode)
+    return df.iloc[:, 1:] if drop_first else df
+
+
+def _comparable(result) -> pd.DataFrame:
+    df = result.to_frame() if isinstance(result, pd.Series) else result
+    df = df.reset_index(allow_duplicates=True)
+    for position in range(df.shape[1]):
+        series = df.iloc[:, position]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            df.isetitem(position, series.astype(series.cat.categories.dtype))
+    return df
+
+
+def same_result(result, error_info: str, reference, reference_error: str) -> bool:
+    """
+    Whether a lean execution produced the reference (standard dtype) outcome: both
+    fail, or both return equal values (dtypes and float rounding of float32 aside).
+    """
+    if bool(error_info) != bool(reference_error):
+        return False
+    if error_info or (result is None and reference is None):
+        return True
+    if not isinstance(reference, (pd.DataFrame, pd.Series)) or not isinstance(result, (pd.DataFrame, pd.Series)):
+        try:
+            return type(result) is type(reference) and bool(result == reference)
+        except (TypeError, ValueError):
+            return False
+    if type(result) is not type(reference) or list(result.shape) != list(reference.shape):
+        return False
+    if isinstance(result, pd.DataFrame) and list(result.columns) != list(reference.columns):
+        return False
+    try:
+        pd.testing.assert_frame_equal(_comparable(result), _comparable(reference), check_dtype=False,
+                                      check_index_type=False, check_column_type=False, check_categorical=False,
+                                      check_exact=False, rtol=1e-5)
+    except (AssertionError, TypeError, ValueError):
+        return False
+    return True
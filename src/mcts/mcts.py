@@ -1,11 +1,17 @@
 from src.mcts.node import *
 from src.mcts.action import *
-from src.mcts.reward import RewardModel
+from src.mcts.reward import RewardModel, BatchRewardJudge
 import math
 import random
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List, Optional
 from src.mcts.data import DataProcessor
+from src.mcts.column_index import ColumnIndex
+from src.mcts.library import PipelineLibrary, task_signature
+from src.mcts.budget import SearchBudget
+from src.mcts.memory import MemoryMonitor, iter_tree
+from src.mcts.stats import ArrayStatsNode, NodeStats
+from src.utils import metrics, tracing
 import pickle
 import logging
 
@@ -17,7 +23,16 @@ class MCTSSolver:
                  llm_kwargs: Dict[str, Any],
                  llm_client: LLMClient,
                  reward_model: RewardModel,
-                 logger=None):  
+                 logger=None,
+                 schema_token_budget: Optional[int] = None,
+                 column_index_hints: bool = False,
+                 pipeline_library: Optional[PipelineLibrary] = None,
+                 library_hints: bool = True,
+                 budget: Optional[SearchBudget] = None,
+                 memory: Optional[MemoryMonitor] = None,
+                 progress: Optional[Callable[..., None]] = None,
+                 reward_judge: Optional[BatchRewardJudge] = None,
+                 array_stats: bool = False):  
         self.llm_client = llm_client
         self.llm_kwargs = llm_kwargs
         self.reward_model = reward_model
@@ -25,15 +40,38 @@ class MCTSSolver:
         self.max_depth = max_depth
         self.exploration_constant = exploration_constant
         self.best_paths = []  
+        self.schema_token_budget = schema_token_budget
+        self.column_index_hints = column_index_hints
+        self.pipeline_library = pipeline_library
+        self.library_hints = library_hints
+        self.budget = budget or SearchBudget()
+        self.memory = memory or MemoryMonitor()
+        # Called as progress(event, **data) for "rollout", "candidate" and "done" events.
+        self.progress = progress
+        # With a judge, END nodes are queued and rewarded in batches (see submit_reward).
+        self.reward_judge = reward_judge
+        self.pending_rewards: List[MCTSNode] = []
+        # Keep Q/N in NodeStats arrays (vectorized selection, incremental END index); set up per solve.
+        self.array_stats = array_stats
+        self.node_stats: Optional[NodeStats] = None
+        self.search_stats = {}
         self.logger = logger or logging.getLogger()  
     
     def log_info(self, message: str):
         self.logger.info(message)
 
+    def emit(self, event: str, **data):
+        if self.progress is not None:
+            self.progress(event, **data)
+
     def should_terminate(self) -> bool:
         if len(self.best_paths) >= 2:
             self.log_info("Found 2 path with reward 1.0, terminating early.")
             return True
+        reason = self.budget.exhausted()
+        if reason:
+            self.log_info(f"Search budget exhausted ({reason}), returning the best pipelines so far.")
+            return True
         return False
 
     def generate_folder_path(self, bath_path: str, data_type: str, length: int, num: int) -> Path:
@@ -43,7 +81,10 @@ class MCTSSolver:
             return Path(bath_path) / f"group{length}_{num}"
         return None
 
+    @tracing.traced("select")
     def select(self, node: MCTSNode) -> MCTSNode:
+        if self.node_stats is not None:
+            return self.node_stats.select(node, self.exploration_constant)
         current = node
         while current.children and not current.is_terminal():
             if not all(child.N > 0 for child in current.children):
@@ -56,10 +97,14 @@ class MCTSSolver:
         assert node.children == [], f"Children nodes of node {node.node_type} before expansion is not empty"
         valid_action_space = get_valid_action_space_for_node(node)
         for action in valid_action_space:
-            action_nodes = action.create_children_nodes(node, self.llm_kwargs, logger=self.logger)  # 传递logger
+            with tracing.span(f"expand:{type(action).__name__}", depth=node.depth), metrics.action(type(action).__name__):
+                action_nodes = action.create_children_nodes(node, self.llm_kwargs, logger=self.logger)  # 传递logger
             node.children.extend(action_nodes)
         random.shuffle(node.children)
+        if self.node_stats is not None:
+            self.node_stats.index_children(node)
 
+    @tracing.traced("simulate")
     def simulate(self, node: MCTSNode) -> MCTSNode:
         assert node.children == [], f"Node before simulation have non-empty children"
         current = node
@@ -67,33 +112,97 @@ class MCTSSolver:
         expanded_nodes = []
         
         while not current.is_terminal():
+            if self.budget.exhausted():
+                break
             self.expand(current)
             expanded_nodes.append(current)
             current = random.choice(current.children)
             
         return current, expanded_nodes
 
+    @tracing.traced("backpropagate")
     def backpropagate(self, node: MCTSNode):
         current = node
-        reward = self.reward_model.get_reward(current, self.llm_client)
-        if reward == 1.0:
+        if node.collapsed:
+            # A collapsed subtree is re-scored with its summary instead of being searched again.
+            reward = node.Q / node.N if node.N else 0.0
+        else:
+            with metrics.action("Reward"):
+                reward = self.reward_model.get_reward(current, self.llm_client)
+        if not node.collapsed:
+            self.emit("candidate", transformation=node.final_transformation, reward=reward)
+        if reward == 1.0 and not node.collapsed:
             # pass
             self.best_paths.append(node.path_nodes)
+            self.budget.record_valid()
+        if self.node_stats is not None:
+            self.node_stats.backpropagate(node, reward)
+            return
         while current is not None:
             current.N += 1
             current.Q += reward
             current = current.parent_node
+
+    def submit_reward(self, node: MCTSNode):
+        """
+        Backpropagate an END node now, or queue it for the batched reward judge. Queued
+        paths get their visit right away (a virtual loss until the reward arrives), so
+        the next rollouts explore elsewhere.
+        """
+        if self.reward_judge is None or node.collapsed:
+            self.backpropagate(node)
+            return
+        self.pending_rewards.append(node)
+        if self.node_stats is not None:
+            self.node_stats.backpropagate(node, visits=1)
+        else:
+            current = node
+            while current is not None:
+                current.N += 1
+                current = current.parent_node
+        if len(self.pending_rewards) >= self.reward_judge.batch_size:
+            self.flush_rewards()
+
+    @tracing.traced("flush_rewards")
+    def flush_rewards(self):
+        if not self.pending_rewards:
+            return
+        nodes, self.pending_rewards = self.pending_rewards, []
+        with metrics.action("Reward"):
+            if self.budget.exhausted():
+                # No judge calls past the search budget: score what is left by column match.
+                rewards = [self.reward_model.get_reward(node, self.llm_client, method="columns_match") for node in nodes]
+            else:
+                rewards = self.reward_judge.score(nodes)
+        for node, reward in zip(nodes, rewards):
+            self.emit("candidate", transformation=node.final_transformation, reward=reward)
+            if reward == 1.0:
+                self.best_paths.append(node.path_nodes)
+                self.budget.record_valid()
+            if self.node_stats is not None:
+                self.node_stats.backpropagate(node, reward, visits=0)
+                continue
+            current = node
+            while current is not None:
+                current.Q += reward
+                current = current.parent_node
     
     def find_all_end_nodes(self, node: MCTSNode) -> List[MCTSNode]:
-        if node.node_type.value == MCTSNodeType.END.value:
-            return [node]
-        else:
-            end_nodes = []
-            for child in node.children:
-                end_nodes.extend(self.find_all_end_nodes(child))
-            return end_nodes
+        # Depth-first, in the order of the former recursive walk: collapsed END paths, then children.
+        end_nodes = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if current.node_type.value == MCTSNodeType.END.value:
+                end_nodes.append(current)
+                continue
+            end_nodes.extend(current.collapsed_end_nodes)
+            stack.extend(reversed(current.children))
+        return end_nodes
     
     def find_all_valid_reasoning_paths(self, node: MCTSNode) -> List[List[MCTSNode]]:
+        if self.node_stats is not None and node.parent_node is None:
+            return [end_node.path_nodes for end_node in self.node_stats.ranked_end_nodes()]
         end_nodes = self.find_all_end_nodes(node)
         node_scores = []
         for end_node in end_nodes:
@@ -101,6 +210,17 @@ class MCTSSolver:
             node_scores.append((avg_score, end_node.path_nodes))
         node_scores.sort(key=lambda x: x[0], reverse=True)
         return [path for _, path in node_scores]
+
+    def find_unfinished_paths(self, node: MCTSNode) -> List[List[MCTSNode]]:
+        """
+        Paths ending in a transformation whose output matches the target columns but that
+        were never closed by an END node, e.g. because the search budget ran out.
+        """
+        paths = []
+        for current in iter_tree(node):
+            if current.node_type.value == MCTSNodeType.TRANSFORMATION.value and current.columns_match:
+                paths.append(current.path_nodes)
+        return paths
     
     def solve(self, bath_path, data_type, length_type, length_value=None):
         if isinstance(length_value, List) or isinstance(length_type, List):
@@ -108,45 +228,82 @@ class MCTSSolver:
         length = length_type
         num = length_value
 
+        # The budget covers task setup (table loading, profiling, hints, library retrieval) too.
+        self.budget.start(self.llm_client)
         self.best_paths = []
+        self.pending_rewards = []
+        if self.reward_judge is not None:
+            self.reward_judge.reset_stats()
         meta_path = None
         folder_path = self.generate_folder_path(bath_path, data_type, length, num)
-        if data_type == 'buildings':
+        if data_type == 'buildings' or (folder_path / "meta.json").exists():
             meta_path = folder_path / "meta.json"
         
         data_processor = DataProcessor(folder_path, data_type, meta_path)
-        table_schema_dict = data_processor.process_tables()
+        table_schema_dict = data_processor.process_tables(token_budget=self.schema_token_budget)
+        if data_processor.pruning_report:
+            report = data_processor.pruning_report
+            self.log_info(f"Schema pruning: ~{report['tokens_before']} -> ~{report['tokens_after']} tokens, "
+                          f"abbreviated {len(report['abbreviated'])}, dropped {len(report['dropped'])} columns")
         table_schema_dict_str = f"Source Tables:\n{table_schema_dict['source_tables']}\n Source Data Description:\n{table_schema_dict['source_data_description']}\n\nTarget Table:\n{table_schema_dict['target_table']}\nTarget Data Description:\n{table_schema_dict['target_data_description']}"
-        root_node = MCTSNode(MCTSNodeType.ROOT,
+        data_hints = None
+        if self.column_index_hints:
+            source_tables = {key: df for key, df in data_processor.table_dict.items() if not key.startswith('target')}
+            data_hints = ColumnIndex.from_tables(source_tables).hints(data_processor.target_columns()) or None
+        task = f"{data_type}/{folder_path.name}"
+        library_candidates = None
+        if self.pipeline_library:
+            library_candidates = self.pipeline_library.candidates(folder_path, task=task) or None
+            if library_candidates:
+                self.log_info(f"Pipeline library: {len(library_candidates)} candidate(s) from "
+                              f"{[c['source_task'] for c in library_candidates]}")
+                if self.library_hints:
+                    library_hints = PipelineLibrary.hints(library_candidates)
+                    data_hints = f"{data_hints}\n{library_hints}" if data_hints else library_hints
+        self.node_stats = NodeStats() if self.array_stats else None
+        root_node = (ArrayStatsNode if self.array_stats else MCTSNode)(MCTSNodeType.ROOT,
                             parent_node=None,
                             parent_action=None,
                             depth=0,
                             table_schema_dict=table_schema_dict_str,
                             table_path=folder_path,
                             llm_client=self.llm_client,
-                            llm_kwargs=self.llm_kwargs)
+                            llm_kwargs=self.llm_kwargs,
+                            data_hints=data_hints,
+                            library_candidates=library_candidates)
         root_node.path_nodes = [root_node]
+        if self.node_stats is not None:
+            self.node_stats.attach(root_node)
         
+        self.memory.start()
+        rollouts = 0
         for _ in range(self.max_rollout_steps):
             if self.should_terminate():
                 break
+            rollouts += 1
+            tracing.instant("rollout", step=rollouts)
+            self.emit("rollout", step=rollouts, max_steps=self.max_rollout_steps)
             self.log_info(f"Rollout step: {_ + 1}/{self.max_rollout_steps}")
             leaf_node = self.select(root_node)
-            if leaf_node.is_terminal():
-                self.backpropagate(leaf_node)
+            if leaf_node.is_terminal() or leaf_node.collapsed:
+                self.submit_reward(leaf_node)
+                self.memory.after_rollout(root_node, rollouts, self.best_paths)
                 continue
             self.expand(leaf_node)
             leaf_node = random.choice(leaf_node.children)
             end_node, simulated_expanded_nodes = self.simulate(leaf_node)
+            if not end_node.is_terminal():
+                self.log_info(f"Search budget exhausted ({self.budget.stop_reason}) during simulation, "
+                              f"returning the best pipelines so far.")
+                break
             
-            self.backpropagate(end_node)
-            
-            # for n in simulated_expanded_nodes:
-            #     n.children = []
+            self.submit_reward(end_node)
+            self.memory.after_rollout(root_node, rollouts, self.best_paths)
                 
             if self.should_terminate():
                 break
 
+        self.flush_rewards()
         if len(self.best_paths) >= 2:
             all_valid_reasoning_paths = self.best_paths[:2]
         else:
@@ -159,9 +316,25 @@ class MCTSSolver:
                 if len(unique_paths) >= needed:
                     break
             all_valid_reasoning_paths = self.best_paths + unique_paths
+            if not all_valid_reasoning_paths and self.budget.stop_reason:
+                all_valid_reasoning_paths = self.find_unfinished_paths(root_node)[:needed]
+        if self.pipeline_library and self.best_paths:
+            signature = task_signature(folder_path)
+            for path in self.best_paths:
+                if self.pipeline_library.add(signature, path[-1].final_transformation, task=task):
+                    self.log_info(f"Added pipeline of {task} to the pipeline library")
         final_transformations = []
         for path in all_valid_reasoning_paths:
-            if path and hasattr(path[-1], "final_transformation"):
+            if path and path[-1].node_type.value == MCTSNodeType.TRANSFORMATION.value:
+                final_transformations.append(path[-1].transformation)
+            elif path and hasattr(path[-1], "final_transformation"):
                 final_transformations.append(path[-1].final_transformation)
+        self.search_stats = {**self.budget.stats(), "rollouts": rollouts}
+        if self.memory.enabled:
+            self.search_stats["memory"] = self.memory.stats()
+        if self.reward_judge is not None:
+            self.search_stats["reward_judge"] = dict(self.reward_judge.stats)
+        self.memory.stop()
+        self.emit("done", transformations=final_transformations, stats=self.search_stats)
         return final_transformations
 
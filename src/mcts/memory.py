@@ -0,0 +1,194 @@
+import sys
+import tracemalloc
+from typing import Any, Dict, List, Optional, Set
+
+from src.mcts.node import MCTSNode
+from src.mcts.types import MCTSNodeType
+
+# Shared per task (or per process) rather than owned by a node.
+_EXCLUDED_ATTRIBUTES = ("llm_client", "parent_node", "parent_action", "children", "path_nodes",
+                        "collapsed_end_nodes", "llm_kwargs", "stats")
+
+
+def _sizeof(value: Any, seen: Set[int]) -> int:
+    if id(value) in seen or isinstance(value, MCTSNode):
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_sizeof(k, seen) + _sizeof(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_sizeof(item, seen) for item in value)
+    return size
+
+
+def iter_tree(root: MCTSNode):
+    """All nodes reachable from `root`, including END paths kept by collapsed subtrees."""
+    stack = [root]
+    seen = set()
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        yield node
+        stack.extend(node.children)
+        for end_node in node.collapsed_end_nodes:
+            stack.extend(end_node.path_nodes[node.depth + 1:])
+
+
+def tree_memory(root: MCTSNode) -> Dict[str, Any]:
+    """
+    Node counts per type and bytes owned by the nodes. Objects shared between nodes
+    (schema string, hints, transformation lists) are counted once.
+    """
+    seen: Set[int] = set()
+    counts: Dict[str, int] = {}
+    nbytes: Dict[str, int] = {}
+    path_bytes = 0
+    for node in iter_tree(root):
+        name = node.node_type.name
+        size = sys.getsizeof(node) + sys.getsizeof(node.__dict__)
+        size += sum(_sizeof(value, seen) for key, value in node.__dict__.items() if key not in _EXCLUDED_ATTRIBUTES)
+        path_bytes += sys.getsizeof(node.path_nodes) + sys.getsizeof(node.children)
+        counts[name] = counts.get(name, 0) + 1
+        nbytes[name] = nbytes.get(name, 0) + size
+    total_nodes = sum(counts.values())
+    total_bytes = sum(nbytes.values()) + path_bytes
+    return {
+        "nodes": total_nodes,
+        "nodes_per_type": counts,
+        "bytes": total_bytes,
+        "bytes_per_type": nbytes,
+        "bytes_per_node": total_bytes / total_nodes if total_nodes else 0.0,
+    }
+
+
+class MemoryMonitor:
+    """
+    Search-tree memory accounting and bounded-memory mode for MCTSSolver.
+
+    With `track`, tree statistics (and with `use_tracemalloc`, traced heap usage) are
+    recorded after every rollout. With `max_nodes`, the coldest (least visited)
+    simulated subtrees are collapsed after a rollout once the tree grows past the
+    limit: the subtree root keeps its Q/N as a summary and acts as a leaf for
+    selection, and only the `keep_end_nodes` best END paths below it are retained
+    for `find_all_valid_reasoning_paths`.
+    """
+    def __init__(self, track: bool = False, use_tracemalloc: bool = False,
+                 max_nodes: Optional[int] = None, keep_end_nodes: int = 2):
+        self.track = track
+        self.use_tracemalloc = use_tracemalloc
+        self.max_nodes = max_nodes
+        self.keep_end_nodes = keep_end_nodes
+        self.snapshots: List[Dict[str, Any]] = []
+        self.collapsed_subtrees = 0
+        self.freed_nodes = 0
+        self._started_tracemalloc = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.track or self.use_tracemalloc or self.max_nodes is not None
+
+    def start(self):
+        self.snapshots = []
+        self.collapsed_subtrees = 0
+        self.freed_nodes = 0
+        if self.use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if self.use_tracemalloc:
+            tracemalloc.reset_peak()
+
+    def stop(self):
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def after_rollout(self, root: MCTSNode, rollout: int, protected: List[List[MCTSNode]]):
+        if self.max_nodes is not None:
+            self.bound(root, protected)
+        if not (self.track or self.use_tracemalloc):
+            return
+        snapshot = {"rollout": rollout}
+        if self.track:
+            usage = tree_memory(root)
+            snapshot.update(nodes=usage["nodes"], tree_bytes=usage["bytes"], nodes_per_type=usage["nodes_per_type"])
+        if self.use_tracemalloc:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot.update(traced_current=current, traced_peak=peak)
+        self.snapshots.append(snapshot)
+
+    def bound(self, root: MCTSNode, protected: List[List[MCTSNode]]):
+        """
+        Collapse cold subtrees until the tree has at most `max_nodes` nodes, or until only
+        protected paths, unvisited leaves and retained END chains are left.
+        """
+        sizes: Dict[int, int] = {}
+
+        def subtree_size(node: MCTSNode) -> int:
+            size = 1 + sum(subtree_size(child) for child in node.children)
+            size += sum(len(end.path_nodes) - node.depth - 1 for end in node.collapsed_end_nodes)
+            sizes[id(node)] = size
+            return size
+
+        total = subtree_size(root)
+        if total <= self.max_nodes:
+            return
+        # Paths that already reached reward 1.0 are returned by solve and stay intact.
+        protected_ids = {id(node) for path in protected for node in path}
+        candidates = [node for node in iter_tree(root)
+                      if node is not root and node.children and not node.is_terminal()
+                      and id(node) not in protected_ids]
+        # Coldest first; among equally visited subtrees, free the larger one first.
+        candidates.sort(key=lambda node: (node.N, -sizes[id(node)]))
+        for node in candidates:
+            if total <= self.max_nodes:
+                break
+            if node.collapsed or not self._attached(node, root):
+                continue
+            total -= self.collapse(node)
+
+    @staticmethod
+    def _attached(node: MCTSNode, root: MCTSNode) -> bool:
+        # Nodes below an already collapsed ancestor are freed with it.
+        current = node.parent_node
+        while current is not None and current is not root:
+            if current.collapsed:
+                return False
+            current = current.parent_node
+        return True
+
+    def collapse(self, node: MCTSNode) -> int:
+        """Collapse `node`'s subtree; returns the number of nodes freed."""
+        subtree = list(iter_tree(node))
+        end_nodes = [n for n in subtree if n.node_type.value == MCTSNodeType.END.value and n.N > 0]
+        end_nodes.sort(key=lambda n: n.Q / n.N, reverse=True)
+        kept = end_nodes[:self.keep_end_nodes]
+        stats = getattr(node, "stats", None)
+        if stats is not None:
+            retained = {id(n) for end in kept for n in end.path_nodes}
+            for n in subtree:
+                if n is not node and id(n) not in retained:
+                    stats.release(n)
+        # Detach everything below `node` except the chains to the kept END nodes.
+        for n in subtree:
+            n.children = []
+            n.collapsed_end_nodes = []
+        node.collapsed_end_nodes = kept
+        node.collapsed = True
+        retained = sum(len(end.path_nodes) - node.depth - 1 for end in kept)
+        freed = len(subtree) - 1 - retained
+        self.collapsed_subtrees += 1
+        self.freed_nodes += freed
+        return freed
+
+    def stats(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {}
+        if self.max_nodes is not None:
+            result.update(max_nodes=self.max_nodes, collapsed_subtrees=self.collapsed_subtrees,
+                          freed_nodes=self.freed_nodes)
+        if self.snapshots:
+            result["final"] = self.snapshots[-1]
+            result["rollouts"] = self.snapshots
+        return result
@@ -5,11 +5,13 @@ import copy
 
 def get_valid_action_space_for_node(node: "MCTSNode") -> List["MCTSAction"]:
     from src.mcts.action import (
-        SchemaMatchAction, IdentifyColumnFunctionsAction, TransformationAction,
-        TransformationRevisionAction, EndAction
+        SchemaMatchAction, HeuristicSchemaMatchAction, IdentifyColumnFunctionsAction, TransformationAction,
+        LibraryTransformationAction, TransformationRevisionAction, EndAction
     )
     if node.node_type.value == MCTSNodeType.ROOT.value:
         action_space_classes = [SchemaMatchAction, IdentifyColumnFunctionsAction, TransformationAction]
+        if getattr(node, "library_candidates", None):
+            action_space_classes.append(LibraryTransformationAction)
     elif node.node_type.value == MCTSNodeType.SCHEMA_MATCH.value:
         action_space_classes = [IdentifyColumnFunctionsAction, TransformationAction]
     elif node.node_type.value == MCTSNodeType.IDENTIFY_COLUMN_FUNCTIONS.value:
@@ -23,7 +25,14 @@ def get_valid_action_space_for_node(node: "MCTSNode") -> List["MCTSAction"]:
         action_space_classes = [EndAction]
     else:
         action_space_classes = []
+    if node.llm_kwargs and node.llm_kwargs.get("heuristic_schema_match") == "action" and SchemaMatchAction in action_space_classes:
+        action_space_classes = [HeuristicSchemaMatchAction] + action_space_classes
     history_actions_classes = [path_node.parent_action.__class__ for path_node in node.path_nodes if path_node.parent_action is not None]
+    # Both schema match variants belong to one step: after either, the other is not offered again.
+    if HeuristicSchemaMatchAction in history_actions_classes:
+        history_actions_classes.append(SchemaMatchAction)
+    if SchemaMatchAction in history_actions_classes:
+        history_actions_classes.append(HeuristicSchemaMatchAction)
     valid_action_space = [action_class() for action_class in action_space_classes if action_class not in history_actions_classes]
     return valid_action_space
 
@@ -44,7 +53,9 @@ class MCTSNode:
                  is_valid_transformation: Optional[bool] = None,
                  llm_client: Optional[LLMClient] = None,
                  llm_kwargs: Optional[Dict[str, Any]] = None,
-                 columns_match: Optional[bool] = None
+                 columns_match: Optional[bool] = None,
+                 data_hints: Optional[str] = None,
+                 library_candidates: Optional[List[Dict[str, Any]]] = None
                  ):
         self.node_type = node_type
         self.parent_node = parent_node
@@ -66,17 +77,32 @@ class MCTSNode:
         self.llm_client = llm_client
 
         self.columns_match = columns_match
+        self.data_hints = data_hints
+        self.library_candidates = library_candidates
 
         self.Q = 0
         self.N = 0
+        # Set when a bounded-memory search collapses this node's subtree to its Q/N summary.
+        self.collapsed = False
+        self.collapsed_end_nodes: List[MCTSNode] = []
     
+    # Tree links and task-wide objects are shared with the copy instead of copied;
+    # deep-copying parent_node and path_nodes would copy the whole search tree.
+    _SHARED_ATTRIBUTES = ("llm_client", "parent_node", "parent_action", "table_path", "llm_kwargs",
+                          "table_schema_dict", "data_hints", "library_candidates")
+
     def __deepcopy__(self, memo):
+        """Copy used to derive a child: the copy starts without children and with its own path list."""
         cls = self.__class__
         result = cls.__new__(cls)
         memo[id(self)] = result
         for k, v in self.__dict__.items():
-            if k == "llm_client":
-                setattr(result, k, v) 
+            if k in self._SHARED_ATTRIBUTES:
+                setattr(result, k, v)
+            elif k == "children" or k == "collapsed_end_nodes":
+                setattr(result, k, [])
+            elif k == "path_nodes":
+                setattr(result, k, list(v))
             else:
                 setattr(result, k, copy.deepcopy(v, memo))
         return result
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.utils import metrics
+
+PROFILE_VERSION = 2
+PROFILE_CACHE_FILE = ".table_profiles.json"
+SAMPLE_ROWS = 3
+SAMPLE_VALUES = 5
+
+# In-process cache: (folder, data_type) -> (stat signature, profiles)
+_MEMORY_CACHE: Dict[Any, Any] = {}
+
+
+def _to_builtin(value):
+    if value is None:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, (int, float, bool, str)):
+        return value
+    return str(value)
+
+
+def profile_table(df: pd.DataFrame, sample_rows: int = SAMPLE_ROWS, sample_values: int = SAMPLE_VALUES) -> Dict[str, Any]:
+    """
+    Compute a column profile of a DataFrame with column-wise (vectorized) pandas reductions.
+    """
+    n_rows = len(df)
+    null_rates = df.isna().mean() if n_rows else pd.Series(0.0, index=df.columns)
+    cardinality = df.nunique(dropna=True)
+    numeric = df.select_dtypes(include=[np.number, "datetime"])
+    minimums = numeric.min() if not numeric.empty else pd.Series(dtype=object)
+    maximums = numeric.max() if not numeric.empty else pd.Series(dtype=object)
+
+    columns = []
+    for position, col in enumerate(df.columns):
+        series = df.iloc[:, position]
+        samples = series.dropna().drop_duplicates().head(sample_values).tolist()
+        columns.append({
+            "name": col,
+            "dtype": str(series.dtype),
+            "null_rate": float(null_rates.iloc[position]),
+            "cardinality": int(cardinality.iloc[position]),
+            "min": _to_builtin(minimums.get(col)) if col in minimums.index else None,
+            "max": _to_builtin(maximums.get(col)) if col in maximums.index else None,
+            "sample_values": [_to_builtin(v) for v in samples],
+        })
+    return {
+        "n_rows": n_rows,
+        "columns": columns,
+        # Row-wise like the original prompt: a row of ints and floats is upcast to float (1 -> 1.0).
+        "sample_rows": [[str(value) for value in row.values] for _, row in df.head(sample_rows).iterrows()],
+    }
+
+
+def folder_fingerprint(folder_path, data_type: str) -> str:
+    """Content hash of every CSV file in the task folder."""
+    digest = hashlib.sha1(f"{PROFILE_VERSION}:{data_type}".encode())
+    for file_name in sorted(os.listdir(folder_path)):
+        if not file_name.lower().endswith('.csv'):
+            continue
+        digest.update(file_name.encode())
+        with open(os.path.join(folder_path, file_name), 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stat_signature(folder_path):
+    signature = []
+    for file_name in sorted(os.listdir(folder_path)):
+        if file_name.lower().endswith('.csv'):
+            stat = os.stat(os.path.join(folder_path, file_name))
+            signature.append((file_name, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def _cache_path(folder_path, cache_dir: Optional[str]):
+    if cache_dir:
+        name = hashlib.sha1(os.path.abspath(str(folder_path)).encode()).hexdigest()[:16]
+        return os.path.join(cache_dir, f"{name}{PROFILE_CACHE_FILE}")
+    return os.path.join(folder_path, PROFILE_CACHE_FILE)
+
+
+def load_task_profiles(folder_path, data_type: str, table_loader=None, cache_dir: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Return {table name: profile} for a task folder.
+
+    Profiles are memoized in-process and persisted next to the data (or in `cache_dir`),
+    keyed by a hash of the CSV contents, so the raw tables are only read when a file changes.
+    :param table_loader: callable returning the table dict when profiles must be (re)built.
+                         Defaults to DataProcessor's reader.
+    """
+    folder_path = str(folder_path)
+    memory_key = (os.path.abspath(folder_path), data_type)
+    signature = _stat_signature(folder_path)
+    cached = _MEMORY_CACHE.get(memory_key)
+    if cached and cached[0] == signature:
+        metrics.inc("cache_requests_total", cache="table_profile", result="hit")
+        return cached[1]
+
+    fingerprint = folder_fingerprint(folder_path, data_type)
+    cache_path = _cache_path(folder_path, cache_dir)
+    profiles = None
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            if stored.get("fingerprint") == fingerprint:
+                profiles = stored["profiles"]
+        except (OSError, ValueError, KeyError):
+            profiles = None
+
+    metrics.inc("cache_requests_total", cache="table_profile", result="miss" if profiles is None else "disk_hit")
+    if profiles is None:
+        if table_loader is None:
+            from src.mcts.data import DataProcessor
+            table_dict = DataProcessor(folder_path, data_type).table_dict
+        else:
+            table_dict = table_loader()
+        profiles = {key: profile_table(df) for key, df in table_dict.items()}
+        try:
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump({"fingerprint": fingerprint, "profiles": profiles}, f, ensure_ascii=False, default=str)
+        except OSError:
+            # Read-only data folders still get the in-process cache.
+            pass
+
+    _MEMORY_CACHE[memory_key] = (signature, profiles)
+    return profiles
+
+
+def cached_profiles(folder_path, data_type: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    {table name: profile} of a task folder from the in-process cache, or None when the
+    folder has not been profiled in this process or a CSV file changed since. Never
+    reads the tables.
+    """
+    cached = _MEMORY_CACHE.get((os.path.abspath(str(folder_path)), data_type))
+    if not cached or cached[0] != _stat_signature(str(folder_path)):
+        return None
+    return cached[1]
+
+
+def clear_cache():
+    """Forget the in-process profiles (files persisted next to the data are kept)."""
+    _MEMORY_CACHE.clear()
+
+
+def column_names(profile: Dict[str, Any]) -> List[str]:
+    return [col["name"] for col in profile["columns"]]
+
+
+def format_table(key: str, profile: Dict[str, Any], columns: Optional[List[str]] = None,
+                 abbreviated: Optional[List[str]] = None, omitted: int = 0, with_rows: bool = True) -> str:
+    """
+    Render a profiled table in the prompt format used by DataProcessor.
+    :param columns: columns rendered in full (defaults to all columns, in table order).
+    :param abbreviated: columns listed by name only, without sample values.
+    :param omitted: number of columns left out entirely.
+    """
+    names = column_names(profile)
+    if columns is None:
+        positions = list(range(len(names)))
+    else:
+        keep = set(columns)
+        positions = [i for i, name in enumerate(names) if name in keep]
+    caption = f"**Table Caption:** {key}"
+    columns_str = "**Columns:**\n" + "\n".join([f"- {names[i]}" for i in positions])
+    if abbreviated:
+        columns_str += "\n- (other columns, values not shown: " + ", ".join(map(str, abbreviated)) + ")"
+    if omitted:
+        columns_str += f"\n- ({omitted} more columns not shown)"
+    if not with_rows:
+        return f"{caption}\n{columns_str}"
+    rows = [f"{idx}. | {' | '.join(row[i] for i in positions)} |" for idx, row in enumerate(profile["sample_rows"], 1)]
+    rows_str = "**Rows:**\n" + "\n".join(rows)
+    return f"{caption}\n{columns_str}\n{rows_str}"
@@ -1,12 +1,37 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor
 from collections import defaultdict
+import contextlib
 from pathlib import Path
 from src.mcts.get_prompt import *
+from src.mcts import loading
+from src.utils import code_cache, metrics, shared_tables, tracing
 import os
+import threading
+import time
 import pandas as pd
-import ast
 import json
 
+def _parse_json(content: str):
+    """JSON of an LLM answer, inside a ```json fence or bare."""
+    start = content.find('```json')
+    end = content.find('```', start + 1)
+    if start != -1 and end != -1:
+        json_str = content[start + 7:end].strip()
+    else:
+        json_str = content.strip('` \n')
+    return json.loads(json_str)
+
+
+def _reward_value(data) -> float:
+    reward_str = str(data.get("reward", "0")) if isinstance(data, dict) else "0"
+    if reward_str == "1":
+        return 1.0
+    elif reward_str == "0.5":
+        return 0.5
+    return 0.0
+
+
 class RewardModel:
     def __init__(self, **kwargs):
         pass
@@ -25,18 +50,22 @@ class llmRewardModel(RewardModel):
     def __init__(self, llm_kwargs: Dict[str, Any]):
         self.llm_kwargs = llm_kwargs
         
-    def get_reward(self, end_node, llm_client, method="columns_match") -> float:
+    def get_reward(self, end_node, llm_client, method=None) -> float:
         """
         Calculate reward based on the specified method.
         :param end_node: The end node containing transformation and schema information.
         :param llm_client: The LLM client for generating responses.
         :param method: The method for reward calculation. Options: "default", "llm_only", "columns_match".
+                       Defaults to llm_kwargs["reward_method"] (or "columns_match").
         :return: Reward value as a float.
         """
+        method = method or self.llm_kwargs.get("reward_method", "columns_match")
         transformation = end_node.final_transformation
         table_schema = end_node.table_schema_dict
         result_table, _, columns_match, column_similarity = llmRewardModel.execute_transformation(end_node.table_path, transformation)
 
+        if method == "columns_match":
+            return column_similarity
         if method == "llm_only":
             prompt = get_reward_prompt(
                 table_schema_dict=table_schema,
@@ -44,33 +73,6 @@ class llmRewardModel(RewardModel):
                 resulting_table="",
                 column_match_str=""
             )
-            responses, has_error = llm_client.generate_response(prompt, n=1)
-            if not responses:
-                return 0.0
-            else:
-                response = responses[0]
-                try:
-                    response = response.get("content", "")
-                    start = response.find('```json')
-                    end = response.find('```', start + 1)
-                    if start != -1 and end != -1:
-                        json_str = response[start + 7:end].strip()
-                    else:
-                        json_str = response.strip('` \n')
-                    data = json.loads(json_str)
-                    reward_str = str(data.get("reward", "0"))
-                    if reward_str == "1":
-                        return 1.0
-                    elif reward_str == "0.5":
-                        return 0.5
-                    else:
-                        return 0.0
-                except Exception:
-                    return 0.0
-
-        elif method == "columns_match":
-            return column_similarity
-            
         elif method == "default":
             column_match_str = "The columns of the result table and the target table match." if columns_match else "The columns of the result table and the target table do not match."
             prompt = get_reward_prompt(
@@ -79,34 +81,26 @@ class llmRewardModel(RewardModel):
                 resulting_table=result_table,
                 column_match_str=column_match_str
             )
-            responses, has_error = llm_client.generate_response(prompt, n=1)
-            if not responses:
-                return 0.0
-            else:
-                response = responses[0]
-                try:
-                    response = response.get("content", "")
-                    start = response.find('```json')
-                    end = response.find('```', start + 1)
-                    if start != -1 and end != -1:
-                        json_str = response[start + 7:end].strip()
-                    else:
-                        json_str = response.strip('` \n')
-                    data = json.loads(json_str)
-                    reward_str = str(data.get("reward", "0"))
-                    if reward_str == "1":
-                        return 1.0
-                    elif reward_str == "0.5":
-                        return 0.5
-                    else:
-                        return 0.0
-                except Exception:
-                    return 0.0
         else:
             raise ValueError(f"Unknown reward calculation method: {method}")
-    
+        responses, has_error = llm_client.generate_response(prompt, n=1)
+        if has_error or not responses:
+            return 0.0
+        try:
+            return _reward_value(_parse_json(responses[0].get("content", "")))
+        except Exception:
+            return 0.0
+
     @staticmethod
-    def execute_transformation(folder_path, transformation):
+    @tracing.traced("load_tables", "io")
+    def load_tables(folder_path, plan=None, lean=False):
+        """
+        Load the tables of a task folder as they are exposed to generated code.
+        :param plan: {table name: columns to read, or None for all} from loading.column_plan;
+                     tables left out are not read. Default: every column of every table.
+        :param lean: load source tables with the compact dtypes of the lean execution environment.
+        :return: (table_dict, target_columns)
+        """
         table_dict = {}
         target_columns = None
         if 'length' in folder_path.name:
@@ -115,37 +109,117 @@ class llmRewardModel(RewardModel):
                     key = os.path.splitext(file_name)[0]
                     file_path = os.path.join(folder_path, file_name)
                     if key == "target":
-                        df = pd.read_csv(file_path, nrows=5).iloc[:, 1:]
-                        table_dict[key] = df
-                        target_columns = list(df.columns)
-                    else:
-                        table_dict[key] = pd.read_csv(file_path).iloc[:, 1:]
+                        if plan is None or key in plan:
+                            df = pd.read_csv(file_path, nrows=5).iloc[:, 1:]
+                            table_dict[key] = df
+                            target_columns = list(df.columns)
+                        else:
+                            target_columns = list(pd.read_csv(file_path, nrows=0).columns)[1:]
+                    elif plan is None or key in plan:
+                        dtypes = loading.lean_dtypes(folder_path, key) if lean else loading.known_dtypes(folder_path, key)
+                        table_dict[key] = loading.read_table(file_path, plan.get(key) if plan else None,
+                                                             dtypes, drop_first=True, lean=lean)
         elif 'group' in folder_path.name:
             for file_name in os.listdir(folder_path):
                 if file_name.lower().endswith('.csv'):
                     key = os.path.splitext(file_name)[0]
                     file_path = os.path.join(folder_path, file_name)
                     if not key.startswith("target"):
-                        table_dict['test_0'] = pd.read_csv(file_path)
-                    else:
+                        if plan is None or 'test_0' in plan:
+                            dtypes = (loading.lean_dtypes(folder_path, 'test_0') if lean
+                                      else loading.known_dtypes(folder_path, 'test_0'))
+                            table_dict['test_0'] = loading.read_table(file_path, plan.get('test_0') if plan else None,
+                                                                      dtypes, lean=lean)
+                    elif plan is None or key in plan:
                         df = pd.read_csv(file_path, nrows=5)
                         table_dict[key] = df
                         target_columns = list(df.columns)
-        
-        local_vars = {}
-        local_vars.update(table_dict)
-        final_df = None
-        error_info = ""
-        exec_env = {'pd': pd, **local_vars}
-        try:
-            for code in transformation:
-                if not code:
+                    else:
+                        target_columns = list(pd.read_csv(file_path, nrows=0).columns)
+        return table_dict, target_columns
+
+    @staticmethod
+    def table_columns(folder_path):
+        """
+        Column names of the tables exposed to generated code, read from the CSV headers only.
+        :return: ({table name: columns}, target_columns)
+        """
+        folder_path = Path(folder_path)
+        shared = shared_tables.lookup(folder_path)
+        if shared is not None:
+            shared_dict, target_columns = shared
+            return {key: list(df.columns) for key, df in shared_dict.items()}, target_columns
+        tables = {}
+        target_columns = None
+        for file_name in os.listdir(folder_path):
+            if not file_name.lower().endswith('.csv'):
+                continue
+            key = os.path.splitext(file_name)[0]
+            columns = list(pd.read_csv(os.path.join(folder_path, file_name), nrows=0).columns)
+            if 'length' in folder_path.name:
+                if file_name.startswith('training'):
                     continue
-                exec(code, exec_env)
-            last_var = llmRewardModel.extract_last_variable('\n'.join(transformation))
-            final_df = exec_env.get(last_var)
-        except Exception as e:
-            error_info = str(e)
+                columns = columns[1:]
+            elif 'group' in folder_path.name:
+                if not key.startswith("target"):
+                    key = 'test_0'
+            else:
+                continue
+            tables[key] = columns
+            if key.startswith("target"):
+                target_columns = columns
+        return tables, target_columns
+
+    @staticmethod
+    @tracing.traced("execute_transformation", "exec")
+    def execute_transformation(folder_path, transformation):
+        start = time.perf_counter()
+        folder_path = Path(folder_path)
+        shared = shared_tables.lookup(folder_path)
+        if shared is not None:
+            # Tables attached from shared memory are read-only; hand out shallow
+            # copies so column assignments in generated code stay local.
+            shared_dict, target_columns = shared
+            table_dict = {key: df.copy(deep=False) for key, df in shared_dict.items()}
+            lean = False
+        else:
+            plan = None
+            if loading.pruning_enabled():
+                tables, target_columns = llmRewardModel.table_columns(folder_path)
+                plan = loading.column_plan(transformation, tables, target_columns)
+            lean = loading.lean_enabled(folder_path)
+            table_dict, target_columns = llmRewardModel.load_tables(folder_path, plan, lean)
+
+        # Tasks that left the lean environment after a mismatch run without its copy-on-write too.
+        with loading.standard_semantics() if shared is None and not lean else contextlib.nullcontext():
+            final_df, error_info = llmRewardModel.run_transformation({'pd': pd, **table_dict}, transformation)
+        if shared is None and (plan is not None or lean) and error_info:
+            # The code may reach a table or column the static plan left out, or rely on
+            # default dtypes: retry on everything.
+            table_dict, target_columns = llmRewardModel.load_tables(folder_path)
+            with loading.standard_semantics():
+                final_df, error_info = llmRewardModel.run_transformation({'pd': pd, **table_dict}, transformation)
+            if lean:
+                metrics.inc("lean_executions_total", outcome="error_fallback")
+        elif shared is None and lean and loading.verify_due(folder_path):
+            table_dict = None  # release the lean tables before loading the reference ones
+            reference_dict, _ = llmRewardModel.load_tables(folder_path, plan)
+            with loading.standard_semantics():
+                reference_df, reference_error = llmRewardModel.run_transformation({'pd': pd, **reference_dict}, transformation)
+            if loading.same_result(final_df, error_info, reference_df, reference_error):
+                metrics.inc("lean_executions_total", outcome="verified")
+            else:
+                # Compact dtypes or copy-on-write changed this task's results: keep the reference
+                # and leave the lean environment for this task.
+                loading.disable_lean(folder_path)
+                final_df, error_info = reference_df, reference_error
+                metrics.inc("lean_executions_total", outcome="mismatch")
+        elif shared is None and lean:
+            metrics.inc("lean_executions_total", outcome="unverified")
+        if shared is not None and "read-only" in error_info:
+            # In-place writes into shared buffers: rerun on private copies.
+            private_dict = {key: df.copy() for key, df in shared_dict.items()}
+            final_df, error_info = llmRewardModel.run_transformation({'pd': pd, **private_dict}, transformation)
         result_table = ""
         column_similarity = 0.0
         columns_match = False
@@ -156,16 +230,140 @@ class llmRewardModel(RewardModel):
             if target_columns is not None:
                 columns_match = set(final_df.columns) == set(target_columns)
                 column_similarity = len(set(final_df.columns) & set(target_columns)) / len(set(target_columns))
+        if metrics.is_enabled():
+            metrics.observe("execution_seconds", time.perf_counter() - start)
+            if error_info:
+                metrics.inc("execution_failures_total", reason="error")
+            elif final_df is None:
+                metrics.inc("execution_failures_total", reason="no_result")
+            elif not columns_match:
+                metrics.inc("execution_failures_total", reason="columns_mismatch")
         return result_table, error_info, columns_match, column_similarity
 
+    @staticmethod
+    def run_transformation(exec_env, transformation):
+        final_df = None
+        error_info = ""
+        try:
+            code_cache.exec_transformation(transformation, exec_env)
+            last_var = code_cache.last_variable(transformation)
+            final_df = exec_env.get(last_var)
+        except Exception as e:
+            error_info = str(e)
+        return final_df, error_info
+
     @staticmethod
     def extract_last_variable(code_str):
-        tree = ast.parse(code_str)
-        last_var = None
-        for node in tree.body:
-            if isinstance(node, ast.Assign):
-                for target in reversed(node.targets):
-                    if isinstance(target, ast.Name):
-                        last_var = target.id
-                        break
-        return last_var
+        return code_cache.last_variable([code_str])
+
+
+class BatchRewardJudge:
+    """
+    LLM reward judging for the "llm_only" and "default" methods, batched over END nodes
+    queued from several rollouts.
+
+    mode="prompt" scores up to `batch_size` candidates in one multi-candidate prompt;
+    mode="concurrent" sends the usual single-candidate prompts of a batch concurrently.
+    Identical pipelines of a task are judged once. Candidates missing from a batched
+    answer are judged individually.
+    """
+    def __init__(self, llm_client, method: str = "default", batch_size: int = 4, mode: str = "prompt",
+                 max_workers: Optional[int] = None, logger=None):
+        if method not in ("llm_only", "default"):
+            raise ValueError(f"Batched judging only applies to the llm_only and default reward methods, not {method}")
+        if mode not in ("prompt", "concurrent"):
+            raise ValueError(f"Unknown batch reward mode: {mode}")
+        self.llm_client = llm_client
+        self.method = method
+        self.batch_size = batch_size
+        self.mode = mode
+        self.max_workers = max_workers or batch_size
+        self.logger = logger
+        self.cache: Dict[Any, float] = {}
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"candidates": 0, "cached": 0, "llm_calls": 0, "fallbacks": 0}
+
+    def _count(self, name: str):
+        # Concurrent mode judges from pool threads.
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _candidate(self, end_node) -> Dict[str, str]:
+        if self.method == "llm_only":
+            return {"transformation": end_node.final_transformation, "resulting_table": "", "column_match_str": ""}
+        result_table, _, columns_match, _ = llmRewardModel.execute_transformation(end_node.table_path, end_node.final_transformation)
+        column_match_str = "The columns of the result table and the target table match." if columns_match else "The columns of the result table and the target table do not match."
+        return {"transformation": end_node.final_transformation, "resulting_table": result_table,
+                "column_match_str": column_match_str}
+
+    def _judge_one(self, table_schema: str, candidate: Dict[str, str]) -> float:
+        prompt = get_reward_prompt(table_schema_dict=table_schema, **candidate)
+        self._count("llm_calls")
+        responses, has_error = self.llm_client.generate_response(prompt, n=1)
+        if has_error or not responses:
+            return 0.0
+        try:
+            return _reward_value(_parse_json(responses[0].get("content", "")))
+        except Exception:
+            return 0.0
+
+    def _judge_batch(self, table_schema: str, candidates: List[Dict[str, str]]) -> List[float]:
+        if len(candidates) == 1:
+            return [self._judge_one(table_schema, candidates[0])]
+        prompt = get_batch_reward_prompt(table_schema, candidates)
+        self._count("llm_calls")
+        responses, has_error = self.llm_client.generate_response(prompt, n=1)
+        rewards: List[Optional[float]] = [None] * len(candidates)
+        if not has_error and responses:
+            try:
+                data = _parse_json(responses[0].get("content", ""))
+                if isinstance(data, dict):
+                    data = data.get("candidates", [data])
+                for position, item in enumerate(data if isinstance(data, list) else []):
+                    index = int(item.get("candidate", position + 1)) - 1 if isinstance(item, dict) else -1
+                    if 0 <= index < len(candidates):
+                        rewards[index] = _reward_value(item)
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"Could not parse batched reward response: {e}")
+        for i, reward in enumerate(rewards):
+            if reward is None:
+                self._count("fallbacks")
+                rewards[i] = self._judge_one(table_schema, candidates[i])
+        return rewards
+
+    def score(self, end_nodes) -> List[float]:
+        """Rewards of the END nodes, in order."""
+        rewards: List[Optional[float]] = [None] * len(end_nodes)
+        # (table schema, cache key) -> positions; all nodes of one search share a schema.
+        groups: Dict[str, Dict[Any, List[int]]] = defaultdict(dict)
+        for i, node in enumerate(end_nodes):
+            self._count("candidates")
+            key = (str(node.table_path), tuple(node.final_transformation or []))
+            if key in self.cache:
+                self._count("cached")
+                rewards[i] = self.cache[key]
+            else:
+                groups[node.table_schema_dict].setdefault(key, []).append(i)
+        for table_schema, keyed in groups.items():
+            keys = list(keyed)
+            candidates = [self._candidate(end_nodes[keyed[key][0]]) for key in keys]
+            if self.mode == "prompt":
+                scored = []
+                for start in range(0, len(candidates), self.batch_size):
+                    scored.extend(self._judge_batch(table_schema, candidates[start:start + self.batch_size]))
+            else:
+                def judge(candidate):
+                    # Pool threads do not inherit the caller's metrics action.
+                    with metrics.action("Reward"):
+                        return self._judge_one(table_schema, candidate)
+                with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                    scored = list(pool.map(judge, candidates))
+            for key, reward in zip(keys, scored):
+                self.cache[key] = reward
+                for i in keyed[key]:
+                    rewards[i] = reward
+        return rewards
@@ -0,0 +1,113 @@
+import ast
+import json
+import re
+from typing import Any, Callable, Dict, List, Tuple
+
+from src.utils import metrics
+
+
+def canonical_text(text: Any) -> str:
+    return re.sub(r"\s+", " ", str(text or "")).strip().lower()
+
+
+def canonical_schema_match(schema_match: Any) -> str:
+    """Parsed mapping JSON with sorted keys, so formatting and key order do not matter."""
+    try:
+        data = json.loads(schema_match) if isinstance(schema_match, str) else schema_match
+    except (TypeError, ValueError):
+        return canonical_text(schema_match)
+    if isinstance(data, list):
+        items = [json.dumps(item, sort_keys=True) for item in data]
+        return "[" + ",".join(sorted(items)) + "]"
+    return json.dumps(data, sort_keys=True)
+
+
+def canonical_code(transformation: Any) -> str:
+    """AST dump of the statements: formatting, comments and quote style do not matter."""
+    if isinstance(transformation, str):
+        transformation = [transformation]
+    code = "\n".join(statement for statement in transformation or [] if isinstance(statement, str))
+    try:
+        return ast.dump(ast.parse(code), annotate_fields=False)
+    except SyntaxError:
+        return canonical_text(code)
+
+
+class AdaptiveSampler:
+    """
+    Sample until `n` distinct responses (by canonical form) are collected.
+
+    Each round only asks for the number of responses still missing. Sampling stops
+    early after `patience` rounds that add nothing new, and the next round is sampled
+    at a higher temperature only when the share of new responses in a round falls
+    below `min_diversity`.
+    """
+    def __init__(self, llm_client, n: int, parse: Callable[[str], Any], canonicalize: Callable[[Any], str],
+                 max_rounds: int = 3, patience: int = 1, min_diversity: float = 0.5,
+                 temperature_step: float = 0.3, max_temperature: float = 1.0, logger=None):
+        self.llm_client = llm_client
+        self.n = n
+        self.parse = parse
+        self.canonicalize = canonicalize
+        self.max_rounds = max_rounds
+        self.patience = patience
+        self.min_diversity = min_diversity
+        self.temperature_step = temperature_step
+        self.max_temperature = max_temperature
+        self.logger = logger
+        self.stats = {"rounds": 0, "completions": 0, "duplicates": 0, "temperature": None}
+
+    @classmethod
+    def from_kwargs(cls, llm_client, llm_kwargs: Dict[str, Any], parse, canonicalize, logger=None) -> "AdaptiveSampler":
+        return cls(llm_client, llm_kwargs["n"], parse, canonicalize,
+                   max_rounds=llm_kwargs.get("sampling_max_rounds", 3),
+                   patience=llm_kwargs.get("sampling_patience", 1),
+                   min_diversity=llm_kwargs.get("sampling_min_diversity", 0.5),
+                   temperature_step=llm_kwargs.get("sampling_temperature_step", 0.3),
+                   max_temperature=llm_kwargs.get("sampling_max_temperature", 1.0),
+                   logger=logger)
+
+    def _base_temperature(self) -> float:
+        config = getattr(self.llm_client, "config", None) or {}
+        return config.get("temperature", 0.7)
+
+    def sample(self, prompt: str) -> List[Tuple[Any, str]]:
+        """Distinct (parsed, raw content) pairs, at most `n`, in sampling order."""
+        seen = set()
+        results: List[Tuple[Any, str]] = []
+        temperature = None
+        stale_rounds = 0
+        for _ in range(self.max_rounds):
+            missing = self.n - len(results)
+            if missing <= 0:
+                break
+            self.stats["rounds"] += 1
+            if temperature is None:
+                responses, error = self.llm_client.generate_response(prompt, n=missing)
+            else:
+                responses, error = self.llm_client.generate_response(prompt, n=missing, temperature=temperature)
+            if error:
+                if self.logger:
+                    self.logger.warning(f"Error generating response: {responses}")
+                break
+            new = 0
+            for resp in responses:
+                content = resp["content"]
+                parsed = self.parse(content)
+                key = self.canonicalize(parsed)
+                self.stats["completions"] += 1
+                if key in seen:
+                    self.stats["duplicates"] += 1
+                    metrics.inc("sampled_duplicates_total", action=metrics.current_action())
+                    continue
+                seen.add(key)
+                results.append((parsed, content))
+                new += 1
+            stale_rounds = stale_rounds + 1 if new == 0 else 0
+            if stale_rounds >= self.patience:
+                break
+            if responses and new / len(responses) < self.min_diversity:
+                base = temperature if temperature is not None else self._base_temperature()
+                temperature = min(base + self.temperature_step, self.max_temperature)
+                self.stats["temperature"] = temperature
+        return results[:self.n]
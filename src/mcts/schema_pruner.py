@@ -0,0 +1,199 @@
+import re
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.mcts.profile import column_names, format_table
+
+_ENCODING = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Token count of a prompt fragment. Uses tiktoken when its encoding is available
+    locally, otherwise the usual ~4 characters per token approximation.
+    """
+    global _ENCODING
+    if _ENCODING is None:
+        try:
+            import tiktoken
+            _ENCODING = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _ENCODING = False
+    if _ENCODING:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def normalize_name(name) -> str:
+    return re.sub(r"[^0-9a-z]", "", str(name).lower())
+
+
+def _name_tokens(name) -> set:
+    # Split snake_case, kebab-case and camelCase names into lower-case words.
+    spaced = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", str(name))
+    return {token for token in re.split(r"[^0-9a-zA-Z]+", spaced.lower()) if token}
+
+
+def name_similarity(a, b) -> float:
+    norm_a, norm_b = normalize_name(a), normalize_name(b)
+    if not norm_a or not norm_b:
+        return 0.0
+    if norm_a == norm_b:
+        return 1.0
+    ratio = SequenceMatcher(None, norm_a, norm_b).ratio()
+    tokens_a, tokens_b = _name_tokens(a), _name_tokens(b)
+    jaccard = len(tokens_a & tokens_b) / len(tokens_a | tokens_b) if tokens_a and tokens_b else 0.0
+    containment = 0.9 if (norm_a in norm_b or norm_b in norm_a) and min(len(norm_a), len(norm_b)) >= 3 else 0.0
+    return max(ratio, jaccard, containment)
+
+
+def type_category(dtype: Optional[str]) -> Optional[str]:
+    """Map a pandas dtype or SQL column type to numeric / datetime / bool / text."""
+    if not dtype:
+        return None
+    dtype = str(dtype).lower()
+    if dtype.startswith(("int", "uint", "float", "numeric", "decimal", "real", "double", "bigint", "smallint")):
+        return "numeric"
+    if dtype.startswith(("datetime", "date", "timestamp", "time")):
+        return "datetime"
+    if dtype.startswith(("bool",)):
+        return "bool"
+    return "text"
+
+
+def type_compatibility(source_dtype: Optional[str], target_dtype: Optional[str]) -> float:
+    source, target = type_category(source_dtype), type_category(target_dtype)
+    if source is None or target is None:
+        return 0.5
+    if source == target:
+        return 1.0
+    # Anything can be rendered as text, and dates often arrive as strings.
+    if target == "text" or (source == "text" and target == "datetime"):
+        return 0.5
+    return 0.0
+
+
+def _description_words(text: str) -> set:
+    return {word.lower() for word in re.findall(r"[0-9A-Za-z_]+", text or "")}
+
+
+class SchemaPruner:
+    """
+    Rank source columns by relevance to the target schema and abbreviate or drop
+    the least relevant ones until the source-table section fits a token budget.
+    Relevance combines name similarity to the target columns with compatibility
+    with their declared types; no table values are compared.
+
+    Columns whose name closely matches a target column, that are named in the
+    target description, or that are shared by several source tables (likely join
+    keys) are never pruned. A column is only dropped when the evidence against it
+    is strong (a dissimilar name and a type no declared target type can take);
+    otherwise it is at most abbreviated. When even the most pruned schema does not
+    fit the budget, nothing is pruned.
+    """
+    def __init__(self, token_budget: int, protect_score: float = 0.8, name_weight: float = 0.7,
+                 drop_name_score: float = 0.5):
+        self.token_budget = token_budget
+        self.protect_score = protect_score
+        self.name_weight = name_weight
+        self.drop_name_score = drop_name_score
+
+    def _evidence(self, col: Dict[str, Any], target_columns: List[str],
+                  target_types: Dict[str, str]) -> Tuple[float, Optional[float]]:
+        """(best name similarity to a target column, best compatibility with a declared target type or None)."""
+        best_name = max((name_similarity(col["name"], target) for target in target_columns), default=0.0)
+        declared = [sql_type for sql_type in target_types.values() if sql_type]
+        best_type = max((type_compatibility(col.get("dtype"), sql_type) for sql_type in declared), default=None)
+        return best_name, best_type
+
+    def score_columns(self, source_profiles: Dict[str, Dict[str, Any]], target_columns: List[str],
+                      target_types: Optional[Dict[str, str]] = None,
+                      target_description: str = "") -> Tuple[Dict[Tuple[str, Any], float], Set[Tuple[str, Any]]]:
+        """
+        :param target_types: declared type per target column (e.g. from the meta schema).
+        :param target_description: target data description from the task metadata.
+        :return: (relevance score per column, 1.0 for protected columns; columns that may be dropped)
+        """
+        target_types = target_types or {}
+        mentioned = _description_words(target_description)
+        name_counts = {}
+        for profile in source_profiles.values():
+            for name in set(normalize_name(n) for n in column_names(profile)):
+                name_counts[name] = name_counts.get(name, 0) + 1
+
+        scores, droppable = {}, set()
+        for key, profile in source_profiles.items():
+            for col in profile["columns"]:
+                best_name, best_type = self._evidence(col, target_columns, target_types)
+                score = self.name_weight * best_name + (1 - self.name_weight) * (0.5 if best_type is None else best_type)
+                if (best_name >= self.protect_score or str(col["name"]).lower() in mentioned
+                        or name_counts.get(normalize_name(col["name"]), 0) > 1):
+                    score = max(score, 1.0)
+                elif best_type == 0.0 and best_name < self.drop_name_score:
+                    droppable.add((key, col["name"]))
+                scores[(key, col["name"])] = score
+        return scores, droppable
+
+    def render(self, source_profiles, demoted: List[Tuple[str, Any]], dropped: List[Tuple[str, Any]]) -> str:
+        demoted_set, dropped_set = set(demoted), set(dropped)
+        tables = []
+        for key, profile in source_profiles.items():
+            names = column_names(profile)
+            keep = [n for n in names if (key, n) not in demoted_set and (key, n) not in dropped_set]
+            abbreviated = [n for n in names if (key, n) in demoted_set and (key, n) not in dropped_set]
+            omitted = sum(1 for n in names if (key, n) in dropped_set)
+            tables.append(format_table(key, profile, columns=keep, abbreviated=abbreviated, omitted=omitted))
+        return "\n".join(tables)
+
+    def prune(self, source_profiles: Dict[str, Dict[str, Any]], target_columns: List[str],
+              reserved_tokens: int = 0, target_types: Optional[Dict[str, str]] = None,
+              target_description: str = "") -> Tuple[str, Dict[str, Any]]:
+        """
+        :param reserved_tokens: tokens already used by the rest of the schema string.
+        :return: (source_tables string, report with token estimates and pruned columns)
+        """
+        full = self.render(source_profiles, [], [])
+        budget = self.token_budget - reserved_tokens
+        report = {"tokens_before": estimate_tokens(full), "abbreviated": [], "dropped": [], "skipped": False}
+        if report["tokens_before"] <= budget:
+            report["tokens_after"] = report["tokens_before"]
+            return full, report
+
+        scores, droppable = self.score_columns(source_profiles, target_columns, target_types, target_description)
+        candidates = sorted((score, i, column) for i, (column, score) in enumerate(scores.items()) if score < 1.0)
+        candidates = [column for _, _, column in candidates]
+        drop_candidates = [column for column in candidates if column in droppable]
+
+        def fits(demoted, dropped):
+            return estimate_tokens(self.render(source_profiles, demoted, dropped)) <= budget
+
+        if not fits(candidates, drop_candidates):
+            # The protected columns alone exceed the budget: pruning would lose information
+            # without making the schema fit, so the full schema is kept.
+            report.update({"tokens_after": report["tokens_before"], "skipped": True})
+            return full, report
+
+        # Token count decreases monotonically with the number of pruned columns,
+        # so the smallest sufficient prefix can be found by binary search.
+        def smallest_prefix(n, check):
+            low, high = 0, n
+            while low < high:
+                mid = (low + high) // 2
+                if check(mid):
+                    high = mid
+                else:
+                    low = mid + 1
+            return low
+
+        n_demoted = smallest_prefix(len(candidates), lambda k: fits(candidates[:k], []))
+        n_dropped = 0
+        if not fits(candidates[:n_demoted], []):
+            n_dropped = smallest_prefix(len(drop_candidates), lambda k: fits(candidates, drop_candidates[:k]))
+        demoted, dropped = candidates[:n_demoted], drop_candidates[:n_dropped]
+        pruned = self.render(source_profiles, demoted, dropped)
+        report.update({
+            "tokens_after": estimate_tokens(pruned),
+            "abbreviated": [f"{key}.{name}" for key, name in demoted if (key, name) not in set(dropped)],
+            "dropped": [f"{key}.{name}" for key, name in dropped],
+        })
+        return pruned, report
@@ -0,0 +1,659 @@
+"""
+Static output-schema inference for generated pandas pipelines.
+
+An abstract interpreter walks the `code` statement list of a candidate and
+tracks the column set of every DataFrame variable through common pandas
+operations (selection, rename, drop, merge, concat, groupby/agg, melt,
+column assignment, ...). Anything it does not model degrades to "unknown",
+so a candidate is only rejected when it is certain to fail at run time
+(syntax error, undefined name, missing column on a fully known frame, no
+output variable), and columns_match is only predicted when the output
+columns are fully known.
+"""
+import ast
+import builtins
+from typing import Any, Dict, List, Optional
+
+_BUILTINS = set(dir(builtins))
+
+
+class Unknown:
+    def __repr__(self):
+        return "Unknown"
+
+
+UNKNOWN = Unknown()
+NONE = object()  # the value of an `inplace=True` call
+
+
+class Frame:
+    """A DataFrame whose columns are known (list) or unknown (None)."""
+    def __init__(self, columns: Optional[List[Any]], index_names: Optional[List[Any]] = None):
+        self.columns = list(columns) if columns is not None else None
+        # [] = default unnamed index, list = named levels, None = unknown
+        self.index_names = index_names
+
+    def copy(self, columns=Ellipsis, index_names=Ellipsis) -> "Frame":
+        return Frame(self.columns if columns is Ellipsis else columns,
+                     self.index_names if index_names is Ellipsis else index_names)
+
+    def update(self, other: "Frame"):
+        # In-place mutation: every variable aliasing this frame sees the change, as in pandas.
+        self.columns = list(other.columns) if other.columns is not None else None
+        self.index_names = other.index_names
+
+
+class Series:
+    def __init__(self, name: Any = None, index_names: Optional[List[Any]] = None):
+        self.name = name
+        self.index_names = index_names
+
+
+class GroupBy:
+    def __init__(self, frame: Frame, keys: Optional[List[Any]], as_index: bool = True, selection: Any = None, selected_many: bool = False):
+        self.frame = frame
+        self.keys = keys
+        self.as_index = as_index
+        self.selection = selection
+        self.selected_many = selected_many
+
+
+class Indexer:
+    def __init__(self, frame: Frame, kind: str):
+        self.frame = frame
+        self.kind = kind
+
+
+class Accessor:
+    """Series.str / Series.dt accessors: every call returns a Series."""
+
+
+class PandasModule:
+    pass
+
+
+class StaticError(Exception):
+    pass
+
+
+# Frame methods that keep the column set unchanged.
+_SAME_COLUMNS = {
+    "copy", "head", "tail", "sort_values", "sort_index", "drop_duplicates", "dropna", "fillna", "ffill", "bfill",
+    "astype", "query", "sample", "round", "abs", "replace", "where", "mask", "clip", "nlargest", "nsmallest",
+    "infer_objects", "convert_dtypes", "reindex_like", "interpolate", "isna", "notna", "isnull", "notnull",
+}
+_GROUPBY_AGGREGATIONS = {"sum", "mean", "max", "min", "first", "last", "count", "nunique", "median", "std", "var", "prod", "any", "all"}
+
+
+def _literal(node):
+    try:
+        return ast.literal_eval(node)
+    except Exception:
+        return UNKNOWN
+
+
+def _as_list(value):
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    if isinstance(value, (str, int, float)):
+        return [value]
+    return None
+
+
+def _eager_nodes(stmt: ast.AST):
+    """Nodes evaluated when the statement runs: function and lambda bodies only run when called."""
+    stack = [stmt]
+    while stack:
+        node = stack.pop()
+        yield node
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            stack.extend(node.args.defaults)
+            stack.extend(d for d in node.args.kw_defaults if d is not None)
+            if not isinstance(node, ast.Lambda):
+                stack.extend(node.decorator_list)
+        else:
+            stack.extend(ast.iter_child_nodes(node))
+
+
+def _is_mask_expression(node: ast.AST) -> bool:
+    return (isinstance(node, (ast.Compare, ast.BoolOp))
+            or (isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.Invert))))
+
+
+def _kwargs(call: ast.Call) -> Dict[str, ast.AST]:
+    return {kw.arg: kw.value for kw in call.keywords if kw.arg is not None}
+
+
+class StaticReport:
+    def __init__(self):
+        self.errors: List[str] = []
+        self.output_var: Optional[str] = None
+        self.columns: Optional[List[Any]] = None
+        self.columns_match: Optional[bool] = None
+        self.column_similarity: Optional[float] = None
+
+    @property
+    def rejected(self) -> bool:
+        """True when the candidate is certain to fail or to miss the target columns."""
+        return bool(self.errors) or self.columns_match is False
+
+    def __repr__(self):
+        return f"StaticReport(errors={self.errors}, output_var={self.output_var}, columns={self.columns}, columns_match={self.columns_match})"
+
+
+class PipelineInterpreter:
+    def __init__(self, tables: Dict[str, List[Any]]):
+        self.env: Dict[str, Any] = {name: Frame(columns, []) for name, columns in tables.items()}
+        self.env["pd"] = PandasModule()
+        self.defined = set(self.env)
+
+    # ---------------------------------------------------------------- helpers
+    def _require(self, frame: Frame, columns: List[Any]):
+        if frame.columns is None:
+            return
+        missing = [c for c in columns if c not in frame.columns]
+        if missing:
+            raise StaticError(f"KeyError: column(s) {missing} not found; available columns: {frame.columns}")
+
+    def _check_names(self, stmt: ast.AST):
+        bound = set()
+        for node in ast.walk(stmt):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+                bound.add(node.id)
+            elif isinstance(node, ast.arg):
+                bound.add(node.arg)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                bound.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                bound.add(node.name)
+        for node in _eager_nodes(stmt):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+                if node.id not in self.defined and node.id not in bound and node.id not in _BUILTINS:
+                    raise StaticError(f"NameError: name '{node.id}' is not defined")
+        self.defined.update(bound)
+
+    def _invalidate_frames(self):
+        for value in self.env.values():
+            if isinstance(value, Frame):
+                value.update(Frame(None, None))
+
+    # ------------------------------------------------------------ statements
+    def run_statement(self, stmt: ast.stmt):
+        self._check_names(stmt)
+        if isinstance(stmt, ast.Assign):
+            value = self.eval(stmt.value)
+            for target in stmt.targets:
+                self._assign(target, value)
+        elif isinstance(stmt, ast.AugAssign):
+            self.eval(stmt.value)
+            if isinstance(stmt.target, ast.Subscript):
+                self.eval(stmt.target)
+        elif isinstance(stmt, ast.Expr):
+            self.eval(stmt.value)
+        elif isinstance(stmt, ast.Delete):
+            for target in stmt.targets:
+                if isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name):
+                    frame = self.env.get(target.value.id)
+                    key = _literal(target.slice)
+                    if isinstance(frame, Frame) and frame.columns is not None and isinstance(key, str):
+                        self._require(frame, [key])
+                        frame.update(frame.copy(columns=[c for c in frame.columns if c != key]))
+                elif isinstance(target, ast.Name):
+                    self.env.pop(target.id, None)
+        elif isinstance(stmt, (ast.Import, ast.ImportFrom)):
+            for alias in stmt.names:
+                self.env[(alias.asname or alias.name).split(".")[0]] = UNKNOWN
+        else:
+            # Loops, conditionals, function definitions...: give up on frame columns.
+            self._invalidate_frames()
+
+    def _assign(self, target: ast.AST, value):
+        if isinstance(target, ast.Name):
+            self.env[target.id] = value
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for element in target.elts:
+                self._assign(element, UNKNOWN)
+        elif isinstance(target, ast.Subscript):
+            base = target.value
+            if isinstance(base, ast.Attribute) and base.attr in ("loc", "iloc") and isinstance(base.value, ast.Name):
+                frame = self.env.get(base.value.id)
+                if isinstance(frame, Frame) and base.attr == "loc" and isinstance(target.slice, ast.Tuple) and len(target.slice.elts) == 2:
+                    self._add_columns(frame, _as_list(_literal(target.slice.elts[1])))
+                return
+            if isinstance(base, ast.Name):
+                frame = self.env.get(base.id)
+                if isinstance(frame, Frame):
+                    self._add_columns(frame, _as_list(_literal(target.slice)))
+        elif isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name):
+            frame = self.env.get(target.value.id)
+            if isinstance(frame, Frame) and target.attr == "columns":
+                columns = list(value) if isinstance(value, (list, tuple)) else None
+                if columns is not None and frame.columns is not None and len(columns) != len(frame.columns):
+                    raise StaticError(f"ValueError: Length mismatch: expected {len(frame.columns)} columns, got {len(columns)}")
+                frame.update(frame.copy(columns=columns))
+
+    @staticmethod
+    def _add_columns(frame: Frame, columns: Optional[List[Any]]):
+        if columns is None:
+            frame.update(frame.copy(columns=None))
+        elif frame.columns is not None:
+            frame.update(frame.copy(columns=frame.columns + [c for c in columns if c not in frame.columns]))
+
+    # ----------------------------------------------------------- expressions
+    def eval(self, node: ast.AST):
+        if isinstance(node, ast.Name):
+            return self.env.get(node.id, UNKNOWN)
+        if isinstance(node, (ast.Constant, ast.List, ast.Tuple, ast.Dict, ast.Set)):
+            value = _literal(node)
+            if value is UNKNOWN:
+                for child in ast.iter_child_nodes(node):
+                    self.eval(child)
+            return value
+        if isinstance(node, ast.Subscript):
+            return self._subscript(node)
+        if isinstance(node, ast.Attribute):
+            return self._attribute(node)
+        if isinstance(node, ast.Call):
+            return self._call(node)
+        if isinstance(node, (ast.BinOp, ast.Compare, ast.BoolOp, ast.UnaryOp)):
+            operands = [self.eval(child) for child in ast.iter_child_nodes(node) if isinstance(child, ast.expr)]
+            frames = [o for o in operands if isinstance(o, Frame)]
+            if frames:
+                return frames[0].copy() if len(frames) == 1 else Frame(None, None)
+            if any(isinstance(o, Series) for o in operands):
+                return Series()
+            return UNKNOWN
+        # Lambdas, comprehensions, f-strings, ...
+        return UNKNOWN
+
+    def _subscript(self, node: ast.Subscript):
+        base = self.eval(node.value)
+        key = _literal(node.slice)
+        if isinstance(base, Frame):
+            if isinstance(key, str):
+                self._require(base, [key])
+                return Series(key, base.index_names)
+            if isinstance(key, list) and all(isinstance(k, str) for k in key):
+                self._require(base, key)
+                return base.copy(columns=key)
+            if isinstance(node.slice, ast.Slice) or _is_mask_expression(node.slice):
+                # Row slice or boolean mask.
+                self.eval(node.slice)
+                return base.copy()
+            if key is UNKNOWN:
+                # A mask held in a variable keeps the columns; any other computed key
+                # (a column list in a variable, `df.columns[...]`, a comprehension) is unknown.
+                if isinstance(self.eval(node.slice), Series):
+                    return base.copy()
+                return Frame(None, None)
+            return UNKNOWN
+        if isinstance(base, Indexer):
+            return self._indexer(base, node.slice)
+        if isinstance(base, GroupBy):
+            if isinstance(key, str):
+                self._require(base.frame, [key])
+                return GroupBy(base.frame, base.keys, base.as_index, key, False)
+            if isinstance(key, list):
+                self._require(base.frame, key)
+                return GroupBy(base.frame, base.keys, base.as_index, key, True)
+            return GroupBy(base.frame, base.keys, base.as_index, None, True)
+        self.eval(node.slice)
+        if isinstance(base, Series):
+            return Series(base.name, base.index_names)
+        return UNKNOWN
+
+    def _indexer(self, indexer: Indexer, slice_node: ast.AST):
+        frame = indexer.frame
+        if indexer.kind != "loc":
+            return Frame(None, None)
+        if isinstance(slice_node, ast.Tuple) and len(slice_node.elts) == 2:
+            self.eval(slice_node.elts[0])
+            columns = _literal(slice_node.elts[1])
+            if isinstance(columns, str):
+                self._require(frame, [columns])
+                return Series(columns, frame.index_names)
+            if isinstance(columns, list) and all(isinstance(c, str) for c in columns):
+                self._require(frame, columns)
+                return frame.copy(columns=columns)
+            if isinstance(slice_node.elts[1], ast.Slice) and slice_node.elts[1].lower is None and slice_node.elts[1].upper is None:
+                return frame.copy()
+            return Frame(None, frame.index_names)
+        self.eval(slice_node)
+        return frame.copy()
+
+    def _attribute(self, node: ast.Attribute):
+        base = self.eval(node.value)
+        if isinstance(base, Frame):
+            if node.attr in ("loc", "iloc"):
+                return Indexer(base, node.attr)
+            if node.attr == "columns":
+                return list(base.columns) if base.columns is not None else UNKNOWN
+            if base.columns is not None and node.attr in base.columns:
+                return Series(node.attr, base.index_names)
+            return UNKNOWN
+        if isinstance(base, Series):
+            if node.attr in ("str", "dt", "cat"):
+                return Accessor()
+            return UNKNOWN
+        return UNKNOWN
+
+    # ------------------------------------------------------------------ calls
+    def _call(self, node: ast.Call):
+        kwargs = _kwargs(node)
+        if not isinstance(node.func, ast.Attribute):
+            for arg in node.args + list(kwargs.values()):
+                self.eval(arg)
+            return UNKNOWN
+        base = self.eval(node.func.value)
+        method = node.func.attr
+        args = [self.eval(arg) for arg in node.args]
+        literal_kwargs = {k: _literal(v) for k, v in kwargs.items()}
+        evaluated_kwargs = {k: self.eval(v) for k, v in kwargs.items()}
+        unpacked = [kw.value for kw in node.keywords if kw.arg is None]
+        if unpacked and isinstance(base, (Frame, GroupBy, PandasModule)):
+            # `**{...}` keywords (e.g. assign(**{"1:00": ...})) can name any column, or hide inplace=True.
+            for value in unpacked:
+                self.eval(value)
+            if isinstance(base, Frame):
+                base.update(Frame(None, None))
+            return Frame(None, None)
+
+        if isinstance(base, PandasModule):
+            return self._pandas_call(method, node, args, literal_kwargs, evaluated_kwargs)
+        if isinstance(base, Frame):
+            result = self._frame_call(base, method, node, args, literal_kwargs, evaluated_kwargs)
+            if literal_kwargs.get("inplace") is True:
+                base.update(result if isinstance(result, Frame) else Frame(None, None))
+                return NONE
+            return result
+        if isinstance(base, GroupBy):
+            return self._groupby_call(base, method, node, literal_kwargs)
+        if isinstance(base, Series):
+            return self._series_call(base, method, node, literal_kwargs)
+        if isinstance(base, Accessor):
+            return Series()
+        return UNKNOWN
+
+    def _pandas_call(self, method, node, args, literal_kwargs, evaluated_kwargs):
+        if method == "merge" and len(args) >= 2 and isinstance(args[0], Frame) and isinstance(args[1], Frame):
+            return self._merge(args[0], args[1], literal_kwargs)
+        if method == "concat" and node.args:
+            frames = self.eval(node.args[0]) if not isinstance(node.args[0], (ast.List, ast.Tuple)) else [self.eval(e) for e in node.args[0].elts]
+            if isinstance(frames, list) and frames and all(isinstance(f, Frame) for f in frames):
+                return self._concat(frames, literal_kwargs)
+            return Frame(None, None)
+        if method == "melt" and args and isinstance(args[0], Frame):
+            return self._melt(args[0], literal_kwargs)
+        if method in ("to_datetime", "to_numeric", "to_timedelta", "Series", "cut", "qcut"):
+            return Series()
+        if method == "DataFrame":
+            return Frame(None, None)
+        return UNKNOWN
+
+    def _frame_call(self, frame: Frame, method, node, args, literal_kwargs, evaluated_kwargs):
+        columns = frame.columns
+        if method in _SAME_COLUMNS:
+            return frame.copy()
+        if method == "rename":
+            mapping = literal_kwargs.get("columns", UNKNOWN)
+            if mapping is UNKNOWN and node.args and literal_kwargs.get("axis") in (1, "columns"):
+                mapping = _literal(node.args[0])
+            if "columns" not in literal_kwargs and not (node.args and literal_kwargs.get("axis") in (1, "columns")):
+                return frame.copy()  # index rename only
+            if not isinstance(mapping, dict) or columns is None:
+                return Frame(None, frame.index_names)
+            return frame.copy(columns=[mapping.get(c, c) for c in columns])
+        if method == "drop":
+            if "columns" in literal_kwargs:
+                dropped = _as_list(literal_kwargs["columns"])
+            elif node.args and literal_kwargs.get("axis") in (1, "columns"):
+                dropped = _as_list(_literal(node.args[0]))
+            else:
+                return frame.copy()  # row drop
+            if dropped is None or columns is None:
+                return Frame(None, frame.index_names)
+            if literal_kwargs.get("errors") != "ignore":
+                self._require(frame, dropped)
+            return frame.copy(columns=[c for c in columns if c not in dropped])
+        if method == "merge" and args and isinstance(args[0], Frame):
+            return self._merge(frame, args[0], literal_kwargs)
+        if method == "assign":
+            if columns is None:
+                return frame.copy()
+            return frame.copy(columns=columns + [k for k in literal_kwargs if k not in columns])
+        if method == "filter":
+            items = literal_kwargs.get("items", _literal(node.args[0]) if node.args else UNKNOWN)
+            if isinstance(items, list) and columns is not None:
+                return frame.copy(columns=[c for c in columns if c in items])
+            return Frame(None, frame.index_names)
+        if method == "reset_index":
+            return self._reset_index(columns, frame.index_names, literal_kwargs)
+        if method == "set_index":
+            keys = _as_list(literal_kwargs.get("keys", _literal(node.args[0]) if node.args else UNKNOWN))
+            if keys is None or columns is None:
+                return Frame(None, None)
+            self._require(frame, keys)
+            if literal_kwargs.get("append") is True:
+                return Frame(None, None)
+            remaining = columns if literal_kwargs.get("drop") is False else [c for c in columns if c not in keys]
+            return Frame(remaining, keys)
+        if method == "groupby":
+            by = literal_kwargs.get("by", _literal(node.args[0]) if node.args else UNKNOWN)
+            keys = _as_list(by)
+            if keys is not None:
+                self._require(frame, keys)
+            return GroupBy(frame, keys, literal_kwargs.get("as_index", True) is not False)
+        if method == "melt":
+            return self._melt(frame, literal_kwargs)
+        if method == "insert" and len(node.args) >= 2:
+            position, name = _literal(node.args[0]), _literal(node.args[1])
+            if isinstance(position, int) and isinstance(name, str) and columns is not None:
+                frame.update(frame.copy(columns=columns[:position] + [name] + columns[position:]))
+            else:
+                self._add_columns(frame, None)
+            return NONE
+        if method == "apply":
+            return Series() if literal_kwargs.get("axis") in (1, "columns") and "result_type" not in literal_kwargs else UNKNOWN
+        if method in ("pivot", "pivot_table", "unstack", "stack", "transpose", "explode", "join", "agg", "aggregate", "describe"):
+            return Frame(None, None)
+        return UNKNOWN
+
+    def _reset_index(self, columns, index_names, literal_kwargs):
+        if literal_kwargs.get("drop") is True:
+            return Frame(columns, [])
+        if columns is None or index_names is None:
+            return Frame(None, [])
+        if index_names == []:
+            added = ["level_0" if "index" in columns else "index"]
+        else:
+            added = list(index_names)
+        return Frame(added + columns, [])
+
+    def _merge(self, left: Frame, right: Frame, kw):
+        if left.columns is None or right.columns is None or any(k in kw for k in ("left_index", "right_index")):
+            return Frame(None, [])
+        suffixes = kw.get("suffixes", ("_x", "_y"))
+        if not isinstance(suffixes, (list, tuple)) or len(suffixes) != 2:
+            return Frame(None, [])
+        how = kw.get("how", "inner")
+        if "left_on" in kw or "right_on" in kw:
+            left_on, right_on = _as_list(kw.get("left_on")), _as_list(kw.get("right_on"))
+            if left_on is None or right_on is None or left_on != right_on:
+                if left_on is not None:
+                    self._require(left, left_on)
+                if right_on is not None:
+                    self._require(right, right_on)
+                return Frame(None, [])
+            on = left_on
+        elif how == "cross":
+            on = []
+        elif "on" in kw:
+            on = _as_list(kw["on"])
+            if on is None:
+                return Frame(None, [])
+        else:
+            on = [c for c in left.columns if c in right.columns]
+            if not on:
+                return Frame(None, [])
+        self._require(left, on)
+        self._require(right, on)
+        overlap = [c for c in left.columns if c in right.columns and c not in on]
+        left_suffix = suffixes[0] or ""
+        right_suffix = suffixes[1] or ""
+        if overlap and not left_suffix and not right_suffix:
+            return Frame(None, [])
+        result = [f"{c}{left_suffix}" if c in overlap else c for c in left.columns]
+        result += [f"{c}{right_suffix}" if c in overlap else c for c in right.columns if c not in on]
+        if len(set(result)) != len(result):
+            return Frame(None, [])
+        return Frame(result, [])
+
+    def _concat(self, frames: List[Frame], kw):
+        if any(f.columns is None for f in frames):
+            return Frame(None, None)
+        axis = kw.get("axis", 0)
+        if axis in (1, "columns"):
+            return Frame([c for f in frames for c in f.columns], None)
+        if kw.get("join") == "inner":
+            columns = [c for c in frames[0].columns if all(c in f.columns for f in frames[1:])]
+        else:
+            columns = []
+            for f in frames:
+                columns += [c for c in f.columns if c not in columns]
+        return Frame(columns, [] if kw.get("ignore_index") is True else None)
+
+    def _melt(self, frame: Frame, kw):
+        id_vars = _as_list(kw.get("id_vars", []))
+        value_vars = kw.get("value_vars")
+        if id_vars is None or frame.columns is None:
+            return Frame(None, [])
+        self._require(frame, id_vars)
+        if value_vars is not None and _as_list(value_vars) is not None:
+            self._require(frame, _as_list(value_vars))
+        var_name = kw.get("var_name", "variable")
+        value_name = kw.get("value_name", "value")
+        if not isinstance(var_name, str) or not isinstance(value_name, str):
+            return Frame(None, [])
+        return Frame(id_vars + [var_name, value_name], [])
+
+    def _groupby_call(self, group: GroupBy, method, node, literal_kwargs):
+        frame, keys = group.frame, group.keys
+        if keys is None or frame.columns is None:
+            if method in ("transform",):
+                return Series() if not group.selected_many else Frame(None, None)
+            return Frame(None, None)
+        if group.selection is not None and not group.selected_many:
+            values = [group.selection]
+        elif group.selection is not None:
+            values = list(group.selection)
+        else:
+            values = [c for c in frame.columns if c not in keys]
+
+        single = group.selection is not None and not group.selected_many
+        if method == "transform":
+            return Series(group.selection, frame.index_names) if single else frame.copy(columns=values)
+        if method == "size":
+            if group.as_index:
+                return Series(None, keys)
+            return Frame(keys + ["size"], [])
+        if method in ("agg", "aggregate"):
+            spec = _literal(node.args[0]) if node.args else UNKNOWN
+            if isinstance(spec, dict) and all(isinstance(v, str) for v in spec.values()) and not single:
+                self._require(frame, list(spec))
+                values = list(spec)
+            elif not node.args and literal_kwargs and not single and all(isinstance(v, tuple) and len(v) == 2 for v in literal_kwargs.values()):
+                # Named aggregation: new_name=("column", "func")
+                self._require(frame, [v[0] for v in literal_kwargs.values()])
+                values = list(literal_kwargs)
+            elif not isinstance(spec, str):
+                return Frame(None, None)
+        elif method not in _GROUPBY_AGGREGATIONS:
+            return Frame(None, None)
+        if single:
+            return Series(group.selection, keys) if group.as_index else Frame(keys + values, [])
+        return self._grouped_frame(keys, values, group.as_index)
+
+    @staticmethod
+    def _grouped_frame(keys, values, as_index):
+        if as_index:
+            return Frame(values, keys)
+        return Frame(keys + values, [])
+
+    def _series_call(self, series: Series, method, node, literal_kwargs):
+        if method == "reset_index":
+            if literal_kwargs.get("drop") is True:
+                return Series(series.name, [])
+            if series.index_names is None:
+                return Frame(None, [])
+            name = literal_kwargs.get("name", series.name if series.name is not None else 0)
+            index_columns = series.index_names or ["index"]
+            return Frame(index_columns + [name], [])
+        if method == "to_frame":
+            name = _literal(node.args[0]) if node.args else literal_kwargs.get("name", series.name)
+            if name is None or name is UNKNOWN:
+                return Frame(None, series.index_names)
+            return Frame([name], series.index_names)
+        if method == "rename" and node.args:
+            name = _literal(node.args[0])
+            if isinstance(name, (str, int)):
+                return Series(name, series.index_names)
+        if method in ("unique", "tolist", "to_list", "to_numpy", "nunique", "sum", "mean", "max", "min", "count"):
+            return UNKNOWN
+        if method in ("value_counts",):
+            return Series("count", [series.name] if series.name is not None else None)
+        return Series(series.name, series.index_names)
+
+
+def last_assigned_variable(statements: List[ast.stmt]) -> Optional[str]:
+    # Same rule as llmRewardModel.extract_last_variable.
+    last_var = None
+    for node in statements:
+        if isinstance(node, ast.Assign):
+            for target in reversed(node.targets):
+                if isinstance(target, ast.Name):
+                    last_var = target.id
+                    break
+    return last_var
+
+
+def analyze_transformation(transformation: List[str], tables: Dict[str, List[Any]],
+                           target_columns: Optional[List[Any]] = None) -> StaticReport:
+    """
+    Abstractly execute a candidate's statement list.
+    :param tables: column names of every DataFrame in the execution environment.
+    :param target_columns: when given and the output columns are fully known,
+                           columns_match / column_similarity are predicted.
+    """
+    report = StaticReport()
+    statements = []
+    for code in transformation or []:
+        if not code:
+            continue
+        try:
+            statements.extend(ast.parse(code).body)
+        except SyntaxError as e:
+            report.errors.append(f"SyntaxError: {e.msg} in `{code}`")
+            return report
+    interpreter = PipelineInterpreter(tables)
+    for stmt in statements:
+        try:
+            interpreter.run_statement(stmt)
+        except StaticError as e:
+            report.errors.append(f"{e} in `{ast.unparse(stmt)}`")
+            return report
+    report.output_var = last_assigned_variable(statements)
+    if report.output_var is None:
+        report.errors.append("No output variable is assigned")
+        return report
+    result = interpreter.env.get(report.output_var)
+    if result is NONE or isinstance(result, (int, float, str, bool, list, tuple, dict, set)):
+        # Assigned a plain Python value (or an inplace call's None): execution yields no table.
+        report.columns_match = False if target_columns is not None else None
+        report.column_similarity = 0.0 if target_columns is not None else None
+        return report
+    if isinstance(result, Frame) and result.columns is not None:
+        report.columns = result.columns
+        if target_columns:
+            report.columns_match = set(result.columns) == set(target_columns)
+            report.column_similarity = len(set(result.columns) & set(target_columns)) / len(set(target_columns))
+    return report
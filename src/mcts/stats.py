@@ -0,0 +1,201 @@
+"""
+Array-backed visit statistics for MCTSSolver.
+
+Q and N of every node of a search tree live in contiguous NumPy arrays indexed
+by a per-node id, so UCT selection over wide nodes, backpropagation along a path
+and the ranking of END nodes are vectorized. END nodes are indexed incrementally
+as expansions create them, instead of being found by walking the tree when the
+search returns.
+"""
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.mcts.node import MCTSNode
+from src.mcts.types import MCTSNodeType
+
+# Below this many children, NumPy call overhead exceeds the scoring work; score them in Python.
+VECTORIZE_MIN_CHILDREN = 32
+
+
+class NodeStats:
+    def __init__(self, capacity: int = 256):
+        self.Q = np.zeros(capacity, dtype=np.float64)
+        self.N = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.size = 0
+        self.end_ids: List[int] = []
+        self.end_nodes: List[Optional[MCTSNode]] = []
+        self._end_positions: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return int(self.alive[:self.size].sum())
+
+    def _grow(self):
+        capacity = len(self.Q) * 2
+        for name in ("Q", "N", "alive"):
+            array = getattr(self, name)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    def add(self, Q: float = 0.0, N: int = 0) -> int:
+        if self.size == len(self.Q):
+            self._grow()
+        stat_id = self.size
+        self.Q[stat_id] = Q
+        self.N[stat_id] = N
+        self.alive[stat_id] = True
+        self.size += 1
+        return stat_id
+
+    def attach(self, node: "ArrayStatsNode"):
+        """Move a node's own Q/N into the arrays."""
+        node.stat_id = self.add(node._Q, node._N)
+        node.stats = self
+
+    def attach_tree(self, root: "ArrayStatsNode"):
+        """Attach an already built tree, e.g. a synthetic one."""
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            self.attach(node)
+            stack.extend(node.children)
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            self.index_children(node)
+            stack.extend(node.children)
+
+    def index_children(self, node: "ArrayStatsNode"):
+        """Record the children of a freshly expanded node: their ids in child order and new END nodes."""
+        node.child_ids = np.fromiter((child.stat_id for child in node.children), dtype=np.int64, count=len(node.children))
+        for child in node.children:
+            if child.node_type.value == MCTSNodeType.END.value and child.stat_id not in self._end_positions:
+                self._end_positions[child.stat_id] = len(self.end_ids)
+                self.end_ids.append(child.stat_id)
+                self.end_nodes.append(child)
+
+    def release(self, node: "ArrayStatsNode"):
+        """Forget a node dropped from the tree (bounded-memory collapse)."""
+        self.alive[node.stat_id] = False
+        position = self._end_positions.pop(node.stat_id, None)
+        if position is not None:
+            self.end_nodes[position] = None
+
+    @staticmethod
+    def _child_ids(node: "ArrayStatsNode") -> np.ndarray:
+        ids = node.__dict__.get("child_ids")
+        if ids is None or len(ids) != len(node.children):
+            ids = np.fromiter((child.stat_id for child in node.children), dtype=np.int64, count=len(node.children))
+            node.child_ids = ids
+        return ids
+
+    @staticmethod
+    def _path_ids(node: "ArrayStatsNode") -> np.ndarray:
+        ids = node.__dict__.get("path_ids")
+        if ids is None:
+            ids = np.fromiter((path_node.stat_id for path_node in node.path_nodes), dtype=np.int64,
+                              count=len(node.path_nodes))
+            node.path_ids = ids
+        return ids
+
+    def select(self, root: "ArrayStatsNode", exploration_constant: float) -> "ArrayStatsNode":
+        """UCT descent, with the same first-unvisited and first-maximum tie rules as MCTSSolver.select."""
+        current = root
+        while current.children and not current.is_terminal():
+            ids = self._child_ids(current)
+            if len(ids) < VECTORIZE_MIN_CHILDREN:
+                visits = self.N[ids].tolist()
+                if 0 in visits:
+                    return current.children[visits.index(0)]
+                values = self.Q[ids].tolist()
+                log_parent = math.log(self.N[current.stat_id])
+                best = max(range(len(visits)), key=lambda i: values[i] / visits[i]
+                           + exploration_constant * math.sqrt(log_parent / visits[i]))
+                current = current.children[best]
+                continue
+            visits = self.N[ids]
+            unvisited = np.flatnonzero(visits == 0)
+            if unvisited.size:
+                return current.children[unvisited[0]]
+            scores = self.Q[ids] / visits + exploration_constant * np.sqrt(np.log(self.N[current.stat_id]) / visits)
+            current = current.children[int(np.argmax(scores))]
+        return current
+
+    def backpropagate(self, node: "ArrayStatsNode", reward: float = 0.0, visits: int = 1):
+        ids = self._path_ids(node)
+        if visits:
+            self.N[ids] += visits
+        if reward:
+            self.Q[ids] += reward
+
+    @staticmethod
+    def _tree_position(end_node: "ArrayStatsNode") -> tuple:
+        """Sort key of an END node in the depth-first order of MCTSSolver.find_all_end_nodes."""
+        key = []
+        path = end_node.path_nodes
+        for parent, node in zip(path, path[1:]):
+            collapsed = parent.collapsed_end_nodes
+            position = next((i for i, end in enumerate(collapsed) if end is end_node), None)
+            if position is not None:
+                # The kept END nodes of a collapsed subtree come before its node's children.
+                key.append(position - len(collapsed))
+                break
+            key.append(next((i for i, child in enumerate(parent.children) if child is node), len(parent.children)))
+        return tuple(key)
+
+    def ranked_end_nodes(self) -> List["ArrayStatsNode"]:
+        """
+        Indexed END nodes still in the tree, best average reward first. Ties keep the
+        depth-first tree order (over the shuffled children), as in the node-based ranking.
+        """
+        positions = [i for i, node in enumerate(self.end_nodes) if node is not None]
+        if not positions:
+            return []
+        ids = np.asarray(self.end_ids, dtype=np.int64)[positions]
+        visits = self.N[ids]
+        scores = np.divide(self.Q[ids], visits, out=np.zeros(len(ids)), where=visits > 0).tolist()
+        nodes = [self.end_nodes[i] for i in positions]
+        order = sorted(range(len(nodes)), key=lambda i: (-scores[i], self._tree_position(nodes[i])))
+        return [nodes[i] for i in order]
+
+
+class ArrayStatsNode(MCTSNode):
+    """MCTSNode whose Q and N are stored in a NodeStats once attached."""
+    _SHARED_ATTRIBUTES = MCTSNode._SHARED_ATTRIBUTES + ("stats",)
+    stats: Optional[NodeStats] = None
+    stat_id = -1
+
+    @property
+    def Q(self) -> float:
+        return float(self.stats.Q[self.stat_id]) if self.stats is not None else self._Q
+
+    @Q.setter
+    def Q(self, value: float):
+        if self.stats is not None:
+            self.stats.Q[self.stat_id] = value
+        else:
+            self._Q = value
+
+    @property
+    def N(self) -> int:
+        return int(self.stats.N[self.stat_id]) if self.stats is not None else self._N
+
+    @N.setter
+    def N(self, value: int):
+        if self.stats is not None:
+            self.stats.N[self.stat_id] = value
+        else:
+            self._N = value
+
+    def __deepcopy__(self, memo):
+        stats = self.stats
+        result = super().__deepcopy__(memo)
+        # Derived ids describe this node's place in the tree, not the copy's.
+        result.__dict__.pop("child_ids", None)
+        result.__dict__.pop("path_ids", None)
+        if stats is not None:
+            result.stat_id = stats.add(self.Q, self.N)
+        return result
@@ -0,0 +1,181 @@
+"""
+Compile a synthesized pipeline (the `final_transformation` code list returned by
+MCTSSolver.solve) into a validated artifact with declared inputs and outputs,
+which src/pipeline/runtime.py can apply to new source files.
+"""
+import ast
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from src.mcts.static_check import analyze_transformation, last_assigned_variable
+
+ARTIFACT_VERSION = 1
+
+
+class PipelineCompileError(Exception):
+    pass
+
+
+class PipelineArtifact:
+    """
+    A precompiled pipeline.
+
+    `statements` holds one top-level Python statement per entry; they are compiled
+    to code objects once when the artifact is built or loaded. `inputs` maps every
+    table name the code reads to its expected columns and read options, and
+    `output` records the output variable and the columns it must have.
+    """
+    def __init__(self, statements: List[str], inputs: Dict[str, Dict[str, Any]], output: Dict[str, Any],
+                 code: Optional[List[str]] = None, validation: Optional[Dict[str, Any]] = None):
+        self.statements = statements
+        self.inputs = inputs
+        self.output = output
+        self.code = code if code is not None else list(statements)
+        self.validation = validation or {}
+        self.trees = [ast.parse(stmt).body[0] for stmt in statements]
+        self.code_objects = [compile(ast.Module(body=[tree], type_ignores=[]), f"<pipeline:{i}>", "exec")
+                             for i, tree in enumerate(self.trees)]
+
+    @property
+    def digest(self) -> str:
+        return hashlib.sha1("\n".join(self.statements).encode()).hexdigest()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": ARTIFACT_VERSION,
+            "digest": self.digest,
+            "python": f"{sys.version_info.major}.{sys.version_info.minor}",
+            "pandas": pd.__version__,
+            "code": self.code,
+            "statements": self.statements,
+            "inputs": self.inputs,
+            "output": self.output,
+            "validation": self.validation,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PipelineArtifact":
+        if data.get("version") != ARTIFACT_VERSION:
+            raise PipelineCompileError(f"Unsupported artifact version: {data.get('version')}")
+        artifact = cls(data["statements"], data["inputs"], data["output"], data.get("code"), data.get("validation"))
+        if data.get("digest") and data["digest"] != artifact.digest:
+            raise PipelineCompileError("Artifact digest does not match its statements")
+        return artifact
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path) -> "PipelineArtifact":
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def split_statements(transformation: List[str]) -> List[str]:
+    """Split the code list into top-level statements, raising on syntax errors."""
+    statements = []
+    for code in transformation or []:
+        if not code:
+            continue
+        try:
+            tree = ast.parse(code)
+        except SyntaxError as e:
+            raise PipelineCompileError(f"SyntaxError: {e.msg} in `{code}`") from e
+        statements.extend(ast.unparse(stmt) for stmt in tree.body)
+    if not statements:
+        raise PipelineCompileError("Empty pipeline")
+    return statements
+
+
+def referenced_names(statements: List[str]) -> set:
+    names = set()
+    for stmt in statements:
+        for node in ast.walk(ast.parse(stmt)):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+                names.add(node.id)
+    return names
+
+
+def compile_pipeline(transformation: List[str], tables: Dict[str, List[Any]],
+                     target_columns: Optional[List[Any]] = None,
+                     read_options: Optional[Dict[str, Any]] = None) -> PipelineArtifact:
+    """
+    Validate and compile a pipeline against the column names of the tables it runs on.
+    :param tables: {table name: columns} of the execution environment the pipeline was searched on.
+    :param target_columns: when given, the statically inferred output columns must match them.
+    :param read_options: CSV read options shared by every input (e.g. {"drop_first_column": True}).
+    """
+    statements = split_statements(transformation)
+    report = analyze_transformation(statements, tables, target_columns)
+    if report.errors:
+        raise PipelineCompileError("; ".join(report.errors))
+    if report.columns_match is False:
+        raise PipelineCompileError(f"Output columns {report.columns} do not match the target schema {target_columns}")
+
+    used = referenced_names(statements)
+    inputs = {name: {"columns": list(columns), "read_options": dict(read_options or {})}
+              for name, columns in tables.items() if name in used}
+    output = {
+        "variable": last_assigned_variable([ast.parse(stmt).body[0] for stmt in statements]),
+        "columns": list(target_columns) if target_columns is not None else report.columns,
+    }
+    return PipelineArtifact(statements, inputs, output, code=list(transformation),
+                            validation={"static_columns": report.columns})
+
+
+def compile_task(folder_path, transformation: List[str], verify: bool = True) -> PipelineArtifact:
+    """
+    Compile a pipeline found for a task folder. With `verify`, the pipeline is also
+    executed on the task's source tables and must yield a DataFrame with the declared
+    output columns.
+    """
+    from src.mcts.reward import llmRewardModel
+
+    folder_path = Path(folder_path)
+    tables, target_columns = llmRewardModel.table_columns(folder_path)
+    read_options = {"drop_first_column": 'length' in folder_path.name}
+    artifact = compile_pipeline(transformation, tables, target_columns, read_options)
+    for key, spec in artifact.inputs.items():
+        if key.startswith('target'):
+            # Code may read the target schema, but a production run has no target file.
+            spec["schema_only"] = True
+            spec["read_options"] = {}
+
+    if verify:
+        from src.pipeline.runtime import PipelineError, PipelineRuntime
+        table_dict, _ = llmRewardModel.load_tables(folder_path)
+        try:
+            result = PipelineRuntime(artifact).run_frames(table_dict)
+        except PipelineError as e:
+            raise PipelineCompileError(f"Verification run failed: {e}") from e
+        artifact.validation.update({
+            "verified_on": str(folder_path),
+            "rows": len(result),
+            "dtypes": {str(col): str(dtype) for col, dtype in result.dtypes.items()},
+        })
+    return artifact
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Compile a synthesized pipeline into a runtime artifact")
+    parser.add_argument('--result_json', type=str, required=True, help="Result JSON written by src/main.py")
+    parser.add_argument('--task_folder', type=str, required=True, help="Task folder the pipeline was searched on")
+    parser.add_argument('--output', type=str, required=True, help="Artifact path")
+    parser.add_argument('--index', type=int, default=0, help="Which of the returned pipelines to compile")
+    parser.add_argument('--no_verify', action='store_true', help="Skip the verification run on the task tables")
+    args = parser.parse_args()
+
+    with open(args.result_json, 'r') as f:
+        pipelines = json.load(f)
+    artifact = compile_task(args.task_folder, pipelines[args.index], verify=not args.no_verify)
+    artifact.save(args.output)
+    print(f"Compiled {len(artifact.statements)} statements, inputs {list(artifact.inputs)} -> {args.output}")
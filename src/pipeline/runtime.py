@@ -0,0 +1,339 @@
+"""
+Apply a compiled pipeline artifact to new source files.
+
+One input (by default the largest file) is streamed in chunks. The leading
+statements that only do row-local work on it (column selection, filtering,
+renames, element-wise column expressions, ...) run chunk by chunk; the derived
+frames are materialized only when a statement needs the whole table (groupby,
+pivot, merge, sort, ...), after which the rest of the pipeline runs in memory.
+A fully row-local pipeline writing to an output file never holds more than one
+chunk in memory.
+"""
+import ast
+import os
+from typing import Any, Dict, List, Optional, Set
+
+import pandas as pd
+
+from src.pipeline.compiler import PipelineArtifact
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# Methods that map every row of their input to rows of their output independently.
+ROW_LOCAL_METHODS = {
+    "astype", "fillna", "replace", "rename", "copy", "assign", "isna", "notna", "isnull", "notnull",
+    "map", "round", "abs", "clip", "where", "mask", "between", "isin", "add", "sub", "mul", "div",
+    "truediv", "floordiv", "mod", "pow", "radd", "rsub", "rmul", "rdiv", "eq", "ne", "lt", "le",
+    "gt", "ge", "add_prefix", "add_suffix", "filter", "to_datetime", "to_numeric", "to_timedelta",
+    "strftime", "log", "exp", "sqrt", "floor", "ceil",
+}
+# Row-local only with axis=1 / columns=..., e.g. `df.apply(f, axis=1)` or `df.drop(columns=[...])`.
+AXIS_METHODS = {"apply", "drop", "sum", "mean", "max", "min", "prod", "any", "all", "count", "median"}
+# Whole-table attributes of a frame.
+TABLE_ATTRIBUTES = {"index", "values", "shape", "size", "T", "iloc", "iat", "at", "empty"}
+
+
+class PipelineError(Exception):
+    pass
+
+
+def _is_row_axis(call: ast.Call) -> bool:
+    for keyword in call.keywords:
+        if keyword.arg == "axis" and isinstance(keyword.value, ast.Constant):
+            return keyword.value.value in (1, "columns")
+        if keyword.arg == "columns":
+            return True
+    return False
+
+
+def _loc_is_row_local(subscript: ast.Subscript) -> bool:
+    # Boolean masks and full slices are row-local; label lookups and ranges are not.
+    key = subscript.slice.elts[0] if isinstance(subscript.slice, ast.Tuple) else subscript.slice
+    if isinstance(key, ast.Slice):
+        return key.lower is None and key.upper is None and key.step is None
+    return isinstance(key, (ast.Compare, ast.BoolOp, ast.UnaryOp, ast.Name, ast.Call, ast.Subscript, ast.BinOp))
+
+
+class StreamPlan:
+    """Which statements run per chunk of `source` and which need materialized frames."""
+    def __init__(self, source: Optional[str], streamed: List[int], materialized: List[int], stream_vars: Set[str]):
+        self.source = source
+        self.streamed = streamed
+        self.materialized = materialized
+        self.stream_vars = stream_vars
+
+    def __repr__(self):
+        return (f"StreamPlan(source={self.source}, streamed={len(self.streamed)} statements, "
+                f"materialized={len(self.materialized)} statements)")
+
+
+def _reads(tree: ast.AST) -> Set[str]:
+    return {node.id for node in ast.walk(tree) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)}
+
+
+def _base_name(target: ast.AST) -> Optional[str]:
+    while isinstance(target, (ast.Subscript, ast.Attribute)):
+        target = target.value
+    return target.id if isinstance(target, ast.Name) else None
+
+
+def _walk(tree: ast.AST):
+    # Like ast.walk, but lambda bodies (which see one value or one row at a time) are skipped.
+    todo = [tree]
+    while todo:
+        node = todo.pop()
+        yield node
+        if not isinstance(node, ast.Lambda):
+            todo.extend(ast.iter_child_nodes(node))
+
+
+def _expression_is_row_local(tree: ast.AST, stream_vars: Set[str]) -> bool:
+    for node in _walk(tree):
+        if isinstance(node, ast.Call):
+            func = node.func
+            if isinstance(func, ast.Name):
+                if func.id in ("len", "sorted", "sum", "max", "min", "list", "set") and _reads(node) & stream_vars:
+                    return False
+            elif isinstance(func, ast.Attribute):
+                receiver = func.value
+                if not (_reads(receiver) & stream_vars):
+                    # e.g. `pd.to_datetime(df['d'])` is fine, `pd.merge(df, other)` is not.
+                    if _reads(node) & stream_vars and func.attr not in ROW_LOCAL_METHODS and not isinstance(receiver, ast.Constant):
+                        return False
+                    continue
+                if isinstance(receiver, ast.Attribute) and receiver.attr in ("str", "dt", "cat"):
+                    continue
+                if func.attr in ROW_LOCAL_METHODS:
+                    continue
+                if func.attr in AXIS_METHODS and _is_row_axis(node):
+                    continue
+                if func.attr == "dropna" and not _is_row_axis(node):
+                    continue  # dropping rows, not columns
+                if func.attr == "apply" and isinstance(receiver, ast.Subscript) and isinstance(receiver.slice, ast.Constant):
+                    continue  # Series.apply is element-wise
+                return False
+        elif isinstance(node, ast.Attribute) and node.attr in TABLE_ATTRIBUTES and _reads(node.value) & stream_vars:
+            # Plain column access (`df.price`) is fine; whole-table attributes are not.
+            return False
+        elif isinstance(node, ast.Subscript) and _reads(node.value) & stream_vars:
+            if isinstance(node.value, ast.Attribute) and node.value.attr == "loc":
+                if not _loc_is_row_local(node):
+                    return False
+            elif isinstance(node.slice, ast.Slice):
+                return False  # positional row slice
+    return True
+
+
+def plan_stream(artifact: PipelineArtifact, source: Optional[str]) -> StreamPlan:
+    """Split the statements into a row-local prefix over `source` and the rest."""
+    if source is None:
+        return StreamPlan(None, [], list(range(len(artifact.trees))), set())
+    stream_vars = {source}
+    streamed = []
+    for i, tree in enumerate(artifact.trees):
+        reads = _reads(tree)
+        touches = bool(reads & stream_vars)
+        if isinstance(tree, (ast.Import, ast.ImportFrom)):
+            streamed.append(i)
+            continue
+        if isinstance(tree, ast.FunctionDef) and not touches:
+            streamed.append(i)
+            continue
+        if not isinstance(tree, (ast.Assign, ast.AugAssign, ast.Expr)):
+            break
+        if not touches:
+            if isinstance(tree, ast.Assign):
+                stream_vars.difference_update(_base_name(t) for t in tree.targets)
+            streamed.append(i)
+            continue
+        if not _expression_is_row_local(tree, stream_vars):
+            break
+        targets = tree.targets if isinstance(tree, ast.Assign) else [tree.target] if isinstance(tree, ast.AugAssign) else []
+        if isinstance(tree, ast.Expr):
+            # Only in-place calls on a streamed frame, e.g. `df.rename(columns=..., inplace=True)`.
+            call = tree.value
+            if not (isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute)
+                    and _base_name(call.func.value) in stream_vars):
+                break
+        bases = [_base_name(t) for t in targets]
+        if any(base is None for base in bases):
+            break
+        # Writing stream data into a column of a non-streamed table would need index alignment.
+        if any(not isinstance(t, ast.Name) and base not in stream_vars for t, base in zip(targets, bases)):
+            break
+        stream_vars.update(bases)
+        streamed.append(i)
+    materialized = list(range(len(streamed), len(artifact.trees)))
+    return StreamPlan(source, streamed, materialized, stream_vars)
+
+
+class PipelineRuntime:
+    """
+    Run a PipelineArtifact on source files.
+
+    :param chunksize: rows per chunk of the streamed input.
+    :param strict: raise when the output columns differ from the declared ones.
+    """
+    def __init__(self, artifact: PipelineArtifact, chunksize: int = DEFAULT_CHUNKSIZE, strict: bool = True, logger=None):
+        self.artifact = artifact
+        self.chunksize = chunksize
+        self.strict = strict
+        self.logger = logger
+
+    def log_info(self, message: str):
+        if self.logger:
+            self.logger.info(message)
+
+    # ------------------------------------------------------------------ inputs
+    def _schema_frame(self, name: str) -> pd.DataFrame:
+        return pd.DataFrame(columns=self.artifact.inputs[name]["columns"])
+
+    def _read_csv(self, name: str, path, **kwargs):
+        options = self.artifact.inputs[name].get("read_options", {})
+        reader = pd.read_csv(path, **kwargs)
+        if not options.get("drop_first_column"):
+            return reader
+        if isinstance(reader, pd.DataFrame):
+            return reader.iloc[:, 1:]
+        return (chunk.iloc[:, 1:] for chunk in reader)
+
+    def _check_inputs(self, sources: Dict[str, Any]):
+        missing = [name for name, spec in self.artifact.inputs.items()
+                   if name not in sources and not spec.get("schema_only")]
+        if missing:
+            raise PipelineError(f"Missing input tables: {missing}")
+
+    def _check_columns(self, name: str, columns):
+        expected = self.artifact.inputs[name]["columns"]
+        absent = [c for c in expected if c not in set(columns)]
+        if absent:
+            raise PipelineError(f"Input {name} lacks columns {absent}")
+
+    # --------------------------------------------------------------- execution
+    def _exec(self, indices: List[int], env: Dict[str, Any]):
+        for i in indices:
+            try:
+                exec(self.artifact.code_objects[i], env)
+            except Exception as e:
+                raise PipelineError(f"{type(e).__name__}: {e} in `{self.artifact.statements[i]}`") from e
+
+    def _output(self, env: Dict[str, Any]) -> pd.DataFrame:
+        variable = self.artifact.output["variable"]
+        result = env.get(variable)
+        if not isinstance(result, pd.DataFrame):
+            raise PipelineError(f"Output variable {variable} is {type(result).__name__}, not a DataFrame")
+        self._check_output(result)
+        return result
+
+    def _check_output(self, result: pd.DataFrame):
+        expected = self.artifact.output.get("columns")
+        if self.strict and expected is not None and set(result.columns) != set(expected):
+            raise PipelineError(f"Output columns {list(result.columns)} differ from declared {expected}")
+
+    def run_frames(self, tables: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """Run the whole pipeline in memory on already loaded tables."""
+        self._check_inputs(tables)
+        env = {'pd': pd}
+        for name, spec in self.artifact.inputs.items():
+            env[name] = self._schema_frame(name) if spec.get("schema_only") else tables[name]
+        self._exec(list(range(len(self.artifact.code_objects))), env)
+        return self._output(env)
+
+    def choose_stream_source(self, sources: Dict[str, Any]) -> Optional[str]:
+        candidates = [name for name, spec in self.artifact.inputs.items()
+                      if not spec.get("schema_only") and name in sources]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda name: os.path.getsize(sources[name]))
+
+    def run(self, sources: Dict[str, Any], output_path=None, stream_source: Optional[str] = None):
+        """
+        Run the pipeline on CSV files.
+        :param sources: {input table name: CSV path}.
+        :param output_path: write the result to this CSV instead of returning it; a fully
+                            row-local pipeline is then written chunk by chunk.
+        :return: the result DataFrame, or the number of rows written when `output_path` is given.
+        """
+        self._check_inputs(sources)
+        source = stream_source or self.choose_stream_source(sources)
+        plan = plan_stream(self.artifact, source)
+        self.log_info(f"Pipeline {self.artifact.digest[:8]}: {plan}")
+
+        env: Dict[str, Any] = {'pd': pd}
+        for name, spec in self.artifact.inputs.items():
+            if spec.get("schema_only"):
+                env[name] = self._schema_frame(name)
+            elif name != source:
+                env[name] = self._read_csv(name, sources[name])
+                self._check_columns(name, env[name].columns)
+
+        if source is None or not plan.streamed:
+            if source is not None:
+                env[source] = self._read_csv(source, sources[source])
+                self._check_columns(source, env[source].columns)
+            self._exec(plan.materialized, env)
+            return self._finish(self._output(env), output_path)
+
+        output_variable = self.artifact.output["variable"]
+        needed = set().union(*(_reads(self.artifact.trees[i]) for i in plan.materialized)) | {output_variable}
+        write_through = output_path is not None and not plan.materialized and output_variable in plan.stream_vars
+        parts: Dict[str, List[Any]] = {}
+        rows_written = 0
+        chunk_env = dict(env)
+        chunks = self._read_csv(source, sources[source], chunksize=self.chunksize)
+        for n_chunk, chunk in enumerate(self._non_empty(chunks, source, sources[source])):
+            if n_chunk == 0:
+                self._check_columns(source, chunk.columns)
+            chunk_env = dict(env)
+            chunk_env[source] = chunk
+            self._exec(plan.streamed, chunk_env)
+            if write_through:
+                result = self._output(chunk_env)
+                result.to_csv(output_path, mode='w' if n_chunk == 0 else 'a', header=n_chunk == 0, index=False)
+                rows_written += len(result)
+                continue
+            for name in plan.stream_vars & needed:
+                if name in chunk_env:
+                    parts.setdefault(name, []).append(chunk_env[name])
+        if write_through:
+            return rows_written
+
+        # Materialize the streamed frames for the statements that need the whole table.
+        env = chunk_env
+        for name, values in parts.items():
+            if all(isinstance(v, (pd.DataFrame, pd.Series)) for v in values):
+                env[name] = pd.concat(values) if len(values) > 1 else values[0]
+        self._exec(plan.materialized, env)
+        return self._finish(self._output(env), output_path)
+
+    def _non_empty(self, chunks, source, path):
+        empty = True
+        for chunk in chunks:
+            empty = False
+            yield chunk
+        if empty:
+            # Header-only files yield no chunks; run the pipeline once on an empty frame.
+            yield self._read_csv(source, path, nrows=0)
+
+    @staticmethod
+    def _finish(result: pd.DataFrame, output_path):
+        if output_path is None:
+            return result
+        result.to_csv(output_path, index=False)
+        return len(result)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run a compiled pipeline artifact on source CSV files")
+    parser.add_argument('--artifact', type=str, required=True, help="Artifact written by src/pipeline/compiler.py")
+    parser.add_argument('--source', type=str, nargs='+', required=True, help="Input tables as name=path.csv")
+    parser.add_argument('--output', type=str, required=True, help="Output CSV path")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--stream_source', type=str, default=None, help="Input to stream (default: largest file)")
+    args = parser.parse_args()
+
+    sources = dict(item.split("=", 1) for item in args.source)
+    runtime = PipelineRuntime(PipelineArtifact.load(args.artifact), chunksize=args.chunksize)
+    rows = runtime.run(sources, output_path=args.output, stream_source=args.stream_source)
+    print(f"Wrote {rows} rows to {args.output}")
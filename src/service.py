@@ -0,0 +1,382 @@
+"""
+Long-running pipeline synthesis service.
+
+Accepts source tables plus a target schema over HTTP, runs MCTSSolver on a pool of
+worker threads and streams progress events and candidate pipelines back as
+newline-delimited JSON. LLM clients (and their connection pools), table profiles,
+compiled statements and the pipeline library stay warm across requests, and
+identical requests are answered from the result cache.
+
+    python src/service.py --port 8080 --workers 2
+
+    POST /v1/tasks              submit a task; ?stream=1 streams its events in the response
+    GET  /v1/tasks/<id>         status and result
+    GET  /v1/tasks/<id>/events  events as NDJSON, until the task finishes
+    GET  /health, GET /metrics
+
+Request body:
+
+    {"tables": {"orders": "id,qty,price\\n1,2,3.5\\n", "customers": [{"id": 1, "name": "a"}]},
+     "target": {"name": "Revenue", "columns": ["id", {"name": "revenue", "type": "NUMERIC"}],
+                "description": "..."},
+     "source_description": "...",
+     "options": {"max_rollout_steps": 5, "time_budget_seconds": 45, "n": 1}}
+"""
+import copy
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import yaml
+
+from src.llm import LLMClient
+from src.main import build_solver, configure_execution, load_pipeline_library
+from src.utils import metrics
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(__file__), "config", "default.yaml")
+# Request options mapped onto the config sections used by build_solver.
+SEARCH_OPTIONS = ("max_rollout_steps", "max_depth", "exploration_constant",
+                  "time_budget_seconds", "token_budget", "llm_call_budget")
+MODEL_OPTIONS = ("n",)
+RESERVED_TABLE_NAMES = ("pd",)
+# Files with these prefixes are not loaded as source tables (target* is the target table).
+RESERVED_TABLE_PREFIXES = ("target", "training")
+
+
+class TaskRequestError(ValueError):
+    pass
+
+
+def _read_table(name: str, spec: Any) -> pd.DataFrame:
+    if isinstance(spec, str):
+        return pd.read_csv(io.StringIO(spec))
+    if isinstance(spec, dict) and "csv" in spec:
+        return pd.read_csv(io.StringIO(spec["csv"]))
+    if isinstance(spec, dict) and "columns" in spec:
+        return pd.DataFrame(spec.get("rows", []), columns=spec["columns"])
+    if isinstance(spec, list):
+        return pd.DataFrame.from_records(spec)
+    raise TaskRequestError(f"Table {name!r} must be CSV text, a list of records or {{columns, rows}}")
+
+
+def _target_columns(target: Dict[str, Any]) -> List[Tuple[str, Optional[str]]]:
+    columns = []
+    for column in target.get("columns") or []:
+        if isinstance(column, dict):
+            columns.append((str(column["name"]), column.get("type")))
+        else:
+            columns.append((str(column), None))
+    if not columns:
+        raise TaskRequestError("target.columns must list at least one column")
+    return columns
+
+
+def materialize_task(workspace: str, payload: Dict[str, Any]) -> Tuple[Path, str]:
+    """
+    Write a request as an Auto-Pipeline style task folder (`<table>.csv` sources,
+    header-only `target.csv`, optional `meta.json` with types and descriptions).
+    The folder name is derived from the content, so resubmitted tables reuse the
+    cached table profiles. Returns (folder, digest).
+    """
+    tables = payload.get("tables")
+    target = payload.get("target") or {}
+    if not isinstance(tables, dict) or not tables:
+        raise TaskRequestError("tables must map table names to table data")
+    for name in tables:
+        if not name.isidentifier() or name in RESERVED_TABLE_NAMES or name.startswith(RESERVED_TABLE_PREFIXES):
+            raise TaskRequestError(f"Invalid table name {name!r}: use a Python identifier other than "
+                                   f"{', '.join(RESERVED_TABLE_NAMES)} or "
+                                   f"{', '.join(prefix + '*' for prefix in RESERVED_TABLE_PREFIXES)}")
+    frames = {name: _read_table(name, spec) for name, spec in tables.items()}
+    columns = _target_columns(target)
+
+    digest_source = json.dumps({"tables": tables, "target": target,
+                                "source_description": payload.get("source_description")},
+                               sort_keys=True, default=str)
+    digest = hashlib.sha1(digest_source.encode("utf-8")).hexdigest()[:16]
+    folder = Path(workspace) / f"length0_{digest}"
+    if (folder / "target.csv").exists():
+        return folder, digest
+    tmp_folder = Path(workspace) / f".tmp_{digest}_{uuid.uuid4().hex[:8]}"
+    tmp_folder.mkdir(parents=True)
+    for name, df in frames.items():
+        # Auto-Pipeline tables carry a leading index column.
+        df.to_csv(tmp_folder / f"{name}.csv")
+    pd.DataFrame(columns=[name for name, _ in columns]).to_csv(tmp_folder / "target.csv")
+    meta = {}
+    if any(sql_type for _, sql_type in columns):
+        meta["Target Data Name"] = target.get("name", "target")
+        meta["Target Data Schema"] = ", ".join(f"{name} {sql_type or 'TEXT'}" for name, sql_type in columns)
+    if target.get("description"):
+        meta["Target Data Description"] = target["description"]
+    if payload.get("source_description"):
+        meta["Source Data Description"] = payload["source_description"]
+    if meta:
+        with open(tmp_folder / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=4)
+    try:
+        os.rename(tmp_folder, folder)
+    except OSError:
+        # Another request with the same tables won the race.
+        for file_path in tmp_folder.iterdir():
+            file_path.unlink()
+        tmp_folder.rmdir()
+    return folder, digest
+
+
+class ServiceTask:
+    """State and event log of one request; readers block on `wait_events`."""
+    def __init__(self, task_id: str, options: Dict[str, Any]):
+        self.task_id = task_id
+        self.options = options
+        self.status = "queued"
+        self.events: List[Dict[str, Any]] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.created = time.time()
+        self.condition = threading.Condition()
+        self.publish("queued")
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def publish(self, event: str, **data):
+        with self.condition:
+            self.events.append({"event": event, "time": round(time.time() - self.created, 3), **data})
+            self.condition.notify_all()
+
+    def finish(self, status: str, **data):
+        with self.condition:
+            self.status = status
+        self.publish(status, **data)
+
+    def wait_events(self, start: int, timeout: float = 1.0) -> List[Dict[str, Any]]:
+        with self.condition:
+            if len(self.events) <= start and not self.finished:
+                self.condition.wait(timeout)
+            return self.events[start:]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"task_id": self.task_id, "status": self.status, "options": self.options,
+                "events": len(self.events), "result": self.result}
+
+
+class SynthesisService:
+    def __init__(self, config: Dict[str, Any], workers: int = 2, workspace: str = "service_workspace",
+                 logger: Optional[logging.Logger] = None, max_cached_results: int = 256):
+        self.config = config
+        self.workspace = workspace
+        self.logger = logger or logging.getLogger("mcts_service")
+        os.makedirs(workspace, exist_ok=True)
+        self.pipeline_library = load_pipeline_library(config.get("library", {}) or {})
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="solver")
+        self.workers = workers
+        self.tasks: Dict[str, ServiceTask] = {}
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.max_cached_results = max_cached_results
+        self.lock = threading.Lock()
+        self._local = threading.local()
+
+    def _llm_client(self) -> LLMClient:
+        # One client per worker thread: its token counters are per task, its connections stay open.
+        if getattr(self._local, "llm_client", None) is None:
+            model_name = self.config.get("model_kwargs", {}).get("model_name", "qwen2.5-coder-32b-instruct")
+            self._local.llm_client = LLMClient(model_name=model_name)
+        return self._local.llm_client
+
+    def _task_config(self, options: Dict[str, Any]) -> Dict[str, Any]:
+        config = copy.deepcopy(self.config)
+        search_config = config["search"] = config.get("search") or {}
+        service_config = config.get("service", {}) or {}
+        if service_config.get("time_budget_seconds") is not None and search_config.get("time_budget_seconds") is None:
+            search_config["time_budget_seconds"] = service_config["time_budget_seconds"]
+        for key in SEARCH_OPTIONS:
+            if key in options:
+                search_config[key] = options[key]
+        for key in MODEL_OPTIONS:
+            if key in options:
+                config.setdefault("model_kwargs", {})[key] = options[key]
+        return config
+
+    def submit(self, payload: Dict[str, Any]) -> ServiceTask:
+        options = payload.get("options") or {}
+        unknown = set(options) - set(SEARCH_OPTIONS) - set(MODEL_OPTIONS)
+        if unknown:
+            raise TaskRequestError(f"Unknown options: {sorted(unknown)}")
+        folder, digest = materialize_task(self.workspace, payload)
+        task = ServiceTask(uuid.uuid4().hex[:12], options)
+        with self.lock:
+            self.tasks[task.task_id] = task
+        cache_key = f"{digest}:{json.dumps(options, sort_keys=True)}"
+        cached = self.results.get(cache_key)
+        if cached is not None:
+            task.result = cached
+            task.finish("done", cached=True, **cached)
+            return task
+        self.executor.submit(self._run, task, folder, cache_key)
+        return task
+
+    def _run(self, task: ServiceTask, folder: Path, cache_key: str):
+        task.status = "running"
+        task.publish("started", folder=str(folder))
+        llm_client = self._llm_client()
+        llm_client.reset_token_usage()
+        solver = build_solver(self._task_config(task.options), llm_client, self.logger, self.pipeline_library)
+        # The final "done" event is published with the result below.
+        solver.progress = lambda event, **data: event != "done" and task.publish(event, **data)
+        start = time.time()
+        try:
+            transformations = solver.solve(bath_path=str(folder.parent), data_type="auto_pipeline",
+                                           length_type=0, length_value=folder.name.split("_", 1)[1])
+        except Exception as e:
+            self.logger.error(f"Service task {task.task_id} failed: {e}", exc_info=True)
+            metrics.inc("tasks_total", data_type="service", outcome="failed")
+            task.finish("failed", error=str(e))
+            return
+        task.result = {
+            "transformations": transformations,
+            "elapsed_time": time.time() - start,
+            "token_usage": dict(llm_client.token_usage),
+            "search": solver.search_stats,
+        }
+        metrics.inc("tasks_total", data_type="service", outcome="solved" if transformations else "empty")
+        with self.lock:
+            if len(self.results) >= self.max_cached_results:
+                self.results.pop(next(iter(self.results)))
+            self.results[cache_key] = task.result
+        task.finish("done", **task.result)
+
+    def health(self) -> Dict[str, Any]:
+        with self.lock:
+            statuses = [task.status for task in self.tasks.values()]
+        return {"status": "ok", "workers": self.workers,
+                "queued": statuses.count("queued"), "running": statuses.count("running"),
+                "finished": sum(status in ("done", "failed") for status in statuses),
+                "cached_results": len(self.results)}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def make_handler(service: SynthesisService):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            service.logger.debug(format % args)
+
+        def _send(self, status: int, payload: Dict[str, Any]):
+            data = json.dumps(payload, ensure_ascii=False, default=str).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, task: ServiceTask):
+            # HTTP/1.0 response without Content-Length: one JSON event per line until close.
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            sent = 0
+            while True:
+                events = task.wait_events(sent)
+                for event in events:
+                    self.wfile.write((json.dumps(event, ensure_ascii=False, default=str) + "\n").encode())
+                self.wfile.flush()
+                sent += len(events)
+                if task.finished and sent >= len(task.events):
+                    return
+
+        def _task(self, task_id: str) -> Optional[ServiceTask]:
+            task = service.tasks.get(task_id)
+            if task is None:
+                self._send(404, {"error": f"unknown task {task_id}"})
+            return task
+
+        def do_GET(self):
+            parts = urlparse(self.path).path.strip("/").split("/")
+            if parts == ["health"]:
+                self._send(200, service.health())
+            elif parts == ["metrics"]:
+                data = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            elif len(parts) == 3 and parts[:2] == ["v1", "tasks"]:
+                task = self._task(parts[2])
+                if task:
+                    self._send(200, task.to_dict())
+            elif len(parts) == 4 and parts[:2] == ["v1", "tasks"] and parts[3] == "events":
+                task = self._task(parts[2])
+                if task:
+                    self._stream(task)
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path.rstrip("/") != "/v1/tasks":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                task = service.submit(payload)
+            except (ValueError, KeyError, TypeError, pd.errors.ParserError) as e:
+                self._send(400, {"error": str(e)})
+                return
+            if parse_qs(url.query).get("stream", ["0"])[0] in ("1", "true"):
+                self._stream(task)
+            else:
+                self._send(202, {"task_id": task.task_id, "status": task.status})
+    return Handler
+
+
+def serve(service: SynthesisService, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+    """Start the HTTP server on a daemon thread; `port=0` picks a free port."""
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    server.service = service
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="MontePrep pipeline synthesis service")
+    parser.add_argument("--config", type=str, default=None, help="Config file path (default: src/config/default.yaml)")
+    parser.add_argument("--host", type=str, default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent solver threads")
+    parser.add_argument("--workspace", type=str, default=None, help="Directory for materialized task folders")
+    args = parser.parse_args()
+
+    with open(args.config or DEFAULT_CONFIG, "r") as f:
+        config = yaml.safe_load(f)
+    service_config = config.get("service", {}) or {}
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if (config.get("metrics", {}) or {}).get("enabled"):
+        metrics.enable()
+    configure_execution(config.get("execution", {}) or {})
+    service = SynthesisService(config,
+                               workers=args.workers or service_config.get("workers", 2),
+                               workspace=args.workspace or service_config.get("workspace", "service_workspace"))
+    server = serve(service, args.host or service_config.get("host", "127.0.0.1"),
+                   args.port if args.port is not None else service_config.get("port", 8080))
+    service.logger.info(f"Pipeline synthesis service listening on http://{server.server_address[0]}:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        service.shutdown()
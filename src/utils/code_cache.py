@@ -0,0 +1,61 @@
+"""
+Process-wide cache of compiled pipeline statements.
+
+Candidate pipelines are executed many times per task (expansion, revision,
+reward, evaluation), mostly with statements seen before. Each distinct
+statement string is tokenized, parsed and compiled once; its code object and
+the variable it assigns last are kept in an LRU cache keyed by the string.
+"""
+import ast
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+CACHE_SIZE = 8192
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _compile(code: str):
+    tree = ast.parse(code)
+    last_var = None
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            for target in reversed(node.targets):
+                if isinstance(target, ast.Name):
+                    last_var = target.id
+                    break
+    return compile(tree, "<string>", "exec"), last_var
+
+
+def compile_code(code: str):
+    """Compiled code object of a statement string; raises SyntaxError like exec()."""
+    return _compile(code)[0]
+
+
+def last_variable(transformation: List[str]) -> Optional[str]:
+    """Name of the last plain variable assigned by the statements, as extract_last_variable."""
+    for code in reversed(transformation):
+        if not code:
+            continue
+        last_var = _compile(code)[1]
+        if last_var is not None:
+            return last_var
+    return None
+
+
+def exec_code(code: str, env: Dict[str, Any]):
+    exec(_compile(code)[0], env)
+
+
+def exec_transformation(transformation: List[str], env: Dict[str, Any]):
+    for code in transformation:
+        if not code:
+            continue
+        exec(_compile(code)[0], env)
+
+
+def cache_info():
+    return _compile.cache_info()
+
+
+def clear():
+    _compile.cache_clear()
@@ -1,4 +1,3 @@
-import ast
 import os
 import pandas as pd
 import json
@@ -6,6 +5,7 @@ from pandas.testing import assert_frame_equal
 import numpy as np
 from typing import Dict, Tuple
 import random 
+from src.utils import code_cache, shared_tables, streaming_compare
 
 global_accuracy = {
     "total_samples": 0,
@@ -17,6 +17,10 @@ global_column_similarity = {
 }
 
 def read_csv_files(folder_path, folder_name):
+    shared = shared_tables.lookup(folder_path)
+    if shared is not None:
+        # Evaluation only needs the sources; the attached target holds just a sample.
+        return {key: df.copy(deep=False) for key, df in shared[0].items() if not key.startswith('target')}
     table_dict = {}
     if folder_name == "auto_pipeline":
         for file_name in os.listdir(folder_path):
@@ -83,15 +87,7 @@ def calculate_column_similarity(result, target):
     return len(common_cols) / len(target.columns)
         
 def extract_last_variable(code_str):
-    tree = ast.parse(code_str)
-    last_var = None
-    for node in tree.body:
-        if isinstance(node, ast.Assign):
-            for target in reversed(node.targets):
-                if isinstance(target, ast.Name):
-                    last_var = target.id
-                    break  
-    return last_var  
+    return code_cache.last_variable([code_str])
 
 def get_output_var(code_lines):
     if not code_lines:
@@ -109,7 +105,10 @@ def process_json_files(
     output_base: str, 
     length_type: int,
     start_num: int,
-    end_num: int
+    end_num: int,
+    streaming: bool = False,
+    chunk_rows: int = streaming_compare.DEFAULT_CHUNK_ROWS,
+    spill_dir: str = None
 ) -> Tuple[Dict, Dict]:
     global global_accuracy, global_column_similarity 
     results = {}
@@ -152,16 +151,23 @@ def process_json_files(
             code_str = None
             for code_line in path:
                 code_str = code_line
-                exec(code_str, exec_env)
+                code_cache.exec_code(code_str, exec_env)
                 last_var = extract_last_variable(code_str)
 
             result = exec_env.get(last_var, pd.DataFrame())
-            if folder_name == "auto_pipeline":
-                target = pd.read_csv(target_file).iloc[:, 1:]
+            if streaming:
+                # Target read in chunks and compared by row hashes, for targets that do not fit in memory.
+                scores = streaming_compare.streaming_similarity(result, target_file, drop_first=folder_name == "auto_pipeline",
+                                                                chunk_rows=chunk_rows, spill_dir=spill_dir)
+                similarity = scores["similarity"]
+                column_similarity = scores["column_similarity"]
             else:
-                target = pd.read_csv(target_file)
-            similarity = calculate_similarity(result, target)
-            column_similarity = calculate_column_similarity(result, target)
+                if folder_name == "auto_pipeline":
+                    target = pd.read_csv(target_file).iloc[:, 1:]
+                else:
+                    target = pd.read_csv(target_file)
+                similarity = calculate_similarity(result, target)
+                column_similarity = calculate_column_similarity(result, target)
         except Exception as e:
             column_similarity = 0
         total_column_similarity += column_similarity
@@ -189,7 +195,8 @@ def process_json_files(
         }
     }
 
-def main(json_folder, data_folder, output_base, length_types, start_num, end_num):
+def main(json_folder, data_folder, output_base, length_types, start_num, end_num,
+         streaming=False, chunk_rows=streaming_compare.DEFAULT_CHUNK_ROWS, spill_dir=None):
     global global_accuracy  
     folder_name = os.path.basename(data_folder)
     if folder_name not in ["auto_pipeline", "buildings"]:
@@ -212,7 +219,10 @@ def main(json_folder, data_folder, output_base, length_types, start_num, end_num
             output_base=output_base,
             length_type=length_type,
             start_num=start_num,
-            end_num=end_num
+            end_num=end_num,
+            streaming=streaming,
+            chunk_rows=chunk_rows,
+            spill_dir=spill_dir
         )
         
 
@@ -251,6 +261,10 @@ if __name__ == "__main__":
     parser.add_argument('--length_types', type=int, nargs='+', default=[6])
     parser.add_argument('--start_num', type=int, default=0)
     parser.add_argument('--end_num', type=int, default=100)
+    parser.add_argument('--streaming', action='store_true',
+                        help='Compare by row hashes with the target read in chunks (exact match = equal row multisets)')
+    parser.add_argument('--chunk_rows', type=int, default=streaming_compare.DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--spill_dir', type=str, default=None, help='With --streaming: keep row hashes on disk here')
     args = parser.parse_args()
     main(
         json_folder=args.json_folder,
@@ -258,5 +272,8 @@ if __name__ == "__main__":
         output_base=args.output_base,
         length_types=args.length_types,
         start_num=args.start_num,
-        end_num=args.end_num
+        end_num=args.end_num,
+        streaming=args.streaming,
+        chunk_rows=args.chunk_rows,
+        spill_dir=args.spill_dir
     )
\ No newline at end of file
@@ -0,0 +1,247 @@
+"""
+Process-wide run metrics exported in the Prometheus text format.
+
+Counters and histograms are keyed by name and labels. Like tracing, recording is
+off by default and every call then returns after one flag check. LLM calls are
+attributed to the action set with `action(...)` on the calling thread.
+
+The text format can be served from a local `/metrics` endpoint (`serve`) or written
+to a file for the node-exporter textfile collector (`write_textfile`); `summary`
+gives per-task deltas for a JSONL log.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+PREFIX = "monteprep_"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "llm_request_seconds": ("histogram", "LLM request latency by action and model.", LATENCY_BUCKETS),
+    "llm_requests_total": ("counter", "LLM requests by action, model and outcome.", None),
+    "llm_tokens_total": ("counter", "LLM tokens by action, model and kind (prompt/completion).", None),
+    "json_repair_total": ("counter", "Responses that needed the JSON repair prompt, by action.", None),
+    "execution_seconds": ("histogram", "Latency of executing a candidate transformation.", LATENCY_BUCKETS),
+    "execution_failures_total": ("counter", "Failed transformation executions by reason.", None),
+    "static_precheck_rejections_total": ("counter", "Candidates rejected by the static column check.", None),
+    "sampled_duplicates_total": ("counter", "Sampled responses dropped as duplicates by adaptive sampling, by action.", None),
+    "table_loads_total": ("counter", "Source table reads for execution by mode (full/pruned/chunked).", None),
+    "lean_executions_total": ("counter", "Executions in the lean environment by outcome (verified/mismatch/error_fallback/unverified).", None),
+    "cache_requests_total": ("counter", "Cache lookups by cache and result (hit/miss).", None),
+    "rollouts": ("histogram", "MCTS rollouts per task.", COUNT_BUCKETS),
+    "tasks_total": ("counter", "Solved tasks by data type and outcome.", None),
+}
+
+_ENABLED = False
+_LOCK = threading.Lock()
+_COUNTERS: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+# (name, labels) -> [bucket counts..., sum, count]
+_HISTOGRAMS: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], list] = {}
+_LOCAL = threading.local()
+
+
+def enable():
+    global _ENABLED
+    _ENABLED = True
+
+
+def disable():
+    global _ENABLED
+    _ENABLED = False
+
+
+def is_enabled() -> bool:
+    return _ENABLED
+
+
+def reset():
+    with _LOCK:
+        _COUNTERS.clear()
+        _HISTOGRAMS.clear()
+
+
+def _key(name: str, labels: Dict[str, Any]):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels):
+    if not _ENABLED:
+        return
+    key = _key(name, labels)
+    with _LOCK:
+        _COUNTERS[key] = _COUNTERS.get(key, 0) + value
+
+
+def observe(name: str, value: float, **labels):
+    if not _ENABLED:
+        return
+    buckets = METRICS[name][2]
+    key = _key(name, labels)
+    with _LOCK:
+        hist = _HISTOGRAMS.get(key)
+        if hist is None:
+            hist = _HISTOGRAMS[key] = [0] * len(buckets) + [0.0, 0]
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                hist[i] += 1
+        hist[-2] += value
+        hist[-1] += 1
+
+
+@contextmanager
+def action(name: str):
+    """Attribute LLM calls made on this thread inside the block to action `name`."""
+    previous = getattr(_LOCAL, "action", None)
+    _LOCAL.action = name
+    try:
+        yield
+    finally:
+        _LOCAL.action = previous
+
+
+def current_action() -> str:
+    return getattr(_LOCAL, "action", None) or "other"
+
+
+def _code_cache_counters():
+    # The compiled-statement cache keeps its own counters; report them as lookups.
+    from src.utils import code_cache
+    info = code_cache.cache_info()
+    return {_key("cache_requests_total", {"cache": "code", "result": "hit"}): info.hits,
+            _key("cache_requests_total", {"cache": "code", "result": "miss"}): info.misses}
+
+
+def _format_labels(labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = (k + '="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"' for k, v in items)
+    return "{" + ",".join(escaped) + "}"
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    current = snapshot()
+    counters, histograms = current["counters"], current["histograms"]
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        full_name = PREFIX + name
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {kind}")
+        if kind == "counter":
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{full_name}{_format_labels(labels)} {value}")
+        else:
+            for (metric, labels), hist in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(buckets, hist):
+                    lines.append(f"{full_name}_bucket{_format_labels(labels, ('le', str(bound)))} {count}")
+                lines.append(f"{full_name}_bucket{_format_labels(labels, ('le', '+Inf'))} {hist[-1]}")
+                lines.append(f"{full_name}_sum{_format_labels(labels)} {hist[-2]}")
+                lines.append(f"{full_name}_count{_format_labels(labels)} {hist[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: str):
+    """Atomically write `render()` to `path` (node-exporter textfile collector)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+
+
+def serve(host: str = "127.0.0.1", port: int = 9464) -> "ThreadingHTTPServer":
+    """Serve `render()` at /metrics on a daemon thread; `port=0` picks a free port."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            data = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def snapshot() -> Dict[str, Any]:
+    with _LOCK:
+        counters = dict(_COUNTERS)
+        histograms = {key: list(value) for key, value in _HISTOGRAMS.items()}
+    if _ENABLED:
+        counters.update(_code_cache_counters())
+    return {"counters": counters, "histograms": histograms}
+
+
+def summary(since: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Compact view of the metrics recorded after the `since` snapshot (default: all):
+    LLM calls, seconds and tokens per action, execution count / seconds / failures,
+    JSON repairs and cache lookups.
+    """
+    current = snapshot()
+    base_counters = since["counters"] if since else {}
+    base_histograms = since["histograms"] if since else {}
+    result: Dict[str, Any] = {"llm": {}, "execution": {"count": 0, "seconds": 0.0, "failures": {}},
+                              "json_repair": {}, "static_precheck_rejections": 0, "cache": {}}
+    for (name, labels), value in current["counters"].items():
+        value -= base_counters.get((name, labels), 0)
+        if not value:
+            continue
+        labels = dict(labels)
+        if name == "llm_tokens_total":
+            entry = result["llm"].setdefault(labels["action"], {})
+            entry[f"{labels['kind']}_tokens"] = entry.get(f"{labels['kind']}_tokens", 0) + value
+        elif name == "llm_requests_total" and labels.get("outcome") == "error":
+            entry = result["llm"].setdefault(labels["action"], {})
+            entry["errors"] = entry.get("errors", 0) + value
+        elif name == "execution_failures_total":
+            result["execution"]["failures"][labels["reason"]] = value
+        elif name == "json_repair_total":
+            result["json_repair"][labels["action"]] = value
+        elif name == "static_precheck_rejections_total":
+            result["static_precheck_rejections"] += value
+        elif name == "cache_requests_total":
+            result["cache"].setdefault(labels["cache"], {})[labels["result"]] = value
+    for (name, labels), hist in current["histograms"].items():
+        base = base_histograms.get((name, labels))
+        count = hist[-1] - (base[-1] if base else 0)
+        seconds = hist[-2] - (base[-2] if base else 0.0)
+        if not count:
+            continue
+        if name == "llm_request_seconds":
+            entry = result["llm"].setdefault(dict(labels)["action"], {})
+            entry["calls"] = entry.get("calls", 0) + count
+            entry["seconds"] = entry.get("seconds", 0.0) + seconds
+        elif name == "execution_seconds":
+            result["execution"]["count"] += count
+            result["execution"]["seconds"] += seconds
+    return result
+
+
+def append_jsonl(path: str, record: Dict[str, Any]):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
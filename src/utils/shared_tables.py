@@ -0,0 +1,247 @@
+"""
+Shared-memory registry for task source tables.
+
+The parent process publishes the tables of each task folder once into
+`multiprocessing.shared_memory`; worker processes attach read-only,
+zero-copy numpy views and rebuild the DataFrames around them.
+
+String columns are stored as integer codes in the segment (viewed in place)
+plus a small pickle of their distinct values: a worker only builds one pointer
+array per column over a single copy of each distinct string. Categorical
+columns are shared the same way and keep their dtype. Other object columns
+(mixed values) cannot be viewed in place and are stored pickled, so they are
+materialized once per worker.
+
+Nothing in the tree runs executions in worker processes yet: `lookup` returns
+None unless the process was started by `SharedTableRegistry.pool` (or called
+`init_worker`), and execution then loads tables from disk as before.
+"""
+import os
+import pickle
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+_ALIGNMENT = 64
+
+# Tables attached in the current process: task key -> (table_dict, target_columns)
+_ATTACHED: Dict[str, Tuple[Dict[str, pd.DataFrame], Optional[List[str]]]] = {}
+# Keep SharedMemory handles alive as long as their views are in use.
+_HANDLES: Dict[str, List[shared_memory.SharedMemory]] = {}
+
+
+def task_key(folder_path) -> str:
+    return os.path.abspath(str(folder_path))
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _is_viewable(series: pd.Series) -> bool:
+    dtype = series.dtype
+    return isinstance(dtype, np.dtype) and dtype.kind in "biufcmM"
+
+
+def _pickled(value) -> np.ndarray:
+    return np.frombuffer(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), dtype=np.uint8)
+
+
+def _string_codes(series: pd.Series) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """(codes, distinct values) of an object column holding only strings and NaN, else None."""
+    values = series.to_numpy(dtype=object)
+    if pd.api.types.infer_dtype(values, skipna=True) != "string":
+        return None
+    codes, uniques = pd.factorize(values)
+    missing = values[codes < 0]
+    # factorize folds None and NaN together; keep the pickle when the distinction exists.
+    if any(not (isinstance(v, float) and v != v) for v in missing):
+        return None
+    return codes, np.asarray(uniques, dtype=object)
+
+
+def _layout_table(df: pd.DataFrame):
+    """Serialize the columns of a DataFrame into (column_specs, [(offset, buffer)], total_size)."""
+    specs = []
+    buffers = []
+    offset = 0
+
+    def place(payload: np.ndarray) -> int:
+        nonlocal offset
+        start = _align(offset)
+        buffers.append((start, payload))
+        offset = start + payload.nbytes
+        return start
+
+    for position in range(df.shape[1]):
+        series = df.iloc[:, position]
+        spec = {"name": df.columns[position]}
+        categorical = isinstance(series.dtype, pd.CategoricalDtype)
+        encoded = None if _is_viewable(series) or categorical else _string_codes(series)
+        if _is_viewable(series):
+            payload = np.ascontiguousarray(series.to_numpy())
+            spec.update({"kind": "array", "dtype": payload.dtype.str, "length": len(payload)})
+        elif categorical:
+            payload = np.ascontiguousarray(series.cat.codes.to_numpy())
+            categories = _pickled(series.cat.categories)
+            spec.update({"kind": "categorical", "dtype": payload.dtype.str, "length": len(payload),
+                         "ordered": bool(series.cat.ordered),
+                         "values_offset": place(categories), "values_nbytes": categories.nbytes})
+        elif encoded is not None:
+            codes, uniques = encoded
+            payload = np.ascontiguousarray(codes.astype(np.int32 if len(uniques) < 2 ** 31 else np.int64))
+            values = _pickled(uniques)
+            spec.update({"kind": "strings", "dtype": payload.dtype.str, "length": len(payload),
+                         "values_offset": place(values), "values_nbytes": values.nbytes})
+        else:
+            payload = _pickled(series.to_numpy(dtype=object))
+            spec.update({"kind": "pickle", "dtype": str(series.dtype)})
+        spec.update({"offset": place(payload), "nbytes": payload.nbytes})
+        specs.append(spec)
+    return specs, buffers, offset
+
+
+def _read_column(spec: Dict[str, Any], buf):
+    if spec["kind"] == "pickle":
+        raw = bytes(buf[spec["offset"]:spec["offset"] + spec["nbytes"]])
+        return pd.array(pickle.loads(raw), dtype=spec["dtype"]) if spec["dtype"] != "object" else pickle.loads(raw)
+    values = np.ndarray((spec["length"],), dtype=np.dtype(spec["dtype"]), buffer=buf, offset=spec["offset"])
+    values.flags.writeable = False
+    if spec["kind"] == "array":
+        return values
+    distinct = pickle.loads(bytes(buf[spec["values_offset"]:spec["values_offset"] + spec["values_nbytes"]]))
+    if spec["kind"] == "categorical":
+        return pd.Categorical.from_codes(values, dtype=pd.CategoricalDtype(distinct, ordered=spec["ordered"]))
+    strings = distinct.take(values)
+    strings[values < 0] = np.nan
+    return strings
+
+
+class SharedTableRegistry:
+    """
+    Owns the shared-memory segments of published tasks.
+
+    Typical use in the parent process:
+        with SharedTableRegistry() as registry:
+            registry.publish_task(folder_path)
+            with registry.pool(processes=8) as pool:
+                pool.starmap(llmRewardModel.execute_transformation, jobs)
+    """
+    def __init__(self):
+        self._segments: Dict[str, List[shared_memory.SharedMemory]] = {}
+        self._manifests: Dict[str, Dict[str, Any]] = {}
+
+    def publish_task(self, folder_path) -> Dict[str, Any]:
+        """Load the tables of a task folder and publish them."""
+        from pathlib import Path
+        from src.mcts.reward import llmRewardModel
+        table_dict, target_columns = llmRewardModel.load_tables(Path(folder_path))
+        return self.publish(task_key(folder_path), table_dict, target_columns)
+
+    def publish(self, key: str, table_dict: Dict[str, pd.DataFrame], target_columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Copy the tables into shared memory once and return a picklable manifest."""
+        if key in self._manifests:
+            return self._manifests[key]
+        segments = []
+        tables = {}
+        try:
+            for name, df in table_dict.items():
+                specs, buffers, total_size = _layout_table(df)
+                segment = shared_memory.SharedMemory(create=True, size=max(total_size, 1))
+                segments.append(segment)
+                for offset, payload in buffers:
+                    target = np.ndarray((payload.nbytes,), dtype=np.uint8, buffer=segment.buf, offset=offset)
+                    target[:] = payload.view(np.uint8).reshape(-1)
+                if isinstance(df.index, pd.RangeIndex):
+                    index = ("range", df.index.start, df.index.stop, df.index.step)
+                else:
+                    index = ("pickle", pickle.dumps(df.index, protocol=pickle.HIGHEST_PROTOCOL))
+                tables[name] = {"segment": segment.name, "columns": specs, "index": index}
+        except Exception:
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+            raise
+        manifest = {"key": key, "tables": tables, "target_columns": target_columns}
+        self._segments[key] = segments
+        self._manifests[key] = manifest
+        return manifest
+
+    def manifests(self) -> List[Dict[str, Any]]:
+        return list(self._manifests.values())
+
+    def pool(self, processes: Optional[int] = None, context: Optional[str] = None):
+        """Create a worker pool whose processes attach every published task on start-up."""
+        ctx = multiprocessing.get_context(context)
+        return ctx.Pool(processes=processes, initializer=init_worker, initargs=(self.manifests(),))
+
+    def release(self, key: str):
+        for segment in self._segments.pop(key, []):
+            segment.close()
+            try:
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+        self._manifests.pop(key, None)
+
+    def close(self):
+        for key in list(self._segments):
+            self.release(key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def attach_task(manifest: Dict[str, Any]) -> Dict[str, pd.DataFrame]:
+    """Attach the tables of a published task as read-only DataFrames."""
+    key = manifest["key"]
+    if key in _ATTACHED:
+        return _ATTACHED[key][0]
+    handles = []
+    table_dict = {}
+    for name, table in manifest["tables"].items():
+        segment = shared_memory.SharedMemory(name=table["segment"])
+        handles.append(segment)
+        columns = {spec["name"]: _read_column(spec, segment.buf) for spec in table["columns"]}
+        if table["index"][0] == "range":
+            _, start, stop, step = table["index"]
+            index = pd.RangeIndex(start, stop, step)
+        else:
+            index = pickle.loads(table["index"][1])
+        # copy=False keeps one block per column, so the numpy views are not consolidated into copies.
+        df = pd.DataFrame(columns, index=index, copy=False)
+        table_dict[name] = df
+    _HANDLES[key] = handles
+    _ATTACHED[key] = (table_dict, manifest.get("target_columns"))
+    return table_dict
+
+
+def init_worker(manifests: List[Dict[str, Any]]):
+    """Pool initializer: attach every published task in the worker process."""
+    for manifest in manifests:
+        attach_task(manifest)
+
+
+def lookup(folder_path) -> Optional[Tuple[Dict[str, pd.DataFrame], Optional[List[str]]]]:
+    """Return (table_dict, target_columns) if the task is attached in this process."""
+    if not _ATTACHED:
+        return None
+    return _ATTACHED.get(task_key(folder_path))
+
+
+def detach_all():
+    _ATTACHED.clear()
+    for handles in _HANDLES.values():
+        for segment in handles:
+            try:
+                segment.close()
+            except BufferError:
+                # Views are still referenced somewhere; the mapping is released with the process.
+                pass
+    _HANDLES.clear()
@@ -0,0 +1,216 @@
+"""
+Out-of-core comparison of a pipeline result with a target table by row hashes.
+
+The target CSV is read in chunks of `chunk_rows` rows and the result (a DataFrame or
+a CSV file) is hashed in slices of the same size, so neither side is copied or read
+beyond one chunk at a time. Each row is reduced to a 64-bit hash of its canonical
+cell values over the target columns the result has, in target column order:
+- columns that are numeric in the result compare as numbers rounded to `decimals`
+  (cells of the target that do not parse as numbers keep their text); unlike the
+  tolerance of `calculate_similarity`, values on either side of a rounding boundary
+  do not match;
+- all other columns compare as text, so booleans and dates compare as written to CSV.
+
+Row hashes are collected in a `RowSketch`, a multiset of hashes kept in memory or
+spilled to `partitions` files (split by hash) under `spill_dir`. Two sketches are
+compared one partition at a time; the number of matched rows is the size of the
+multiset intersection. A 64-bit hash collision can count a differing row as matched.
+
+    python src/utils/streaming_compare.py --result result.csv --target data/auto_pipeline/length1_0/target.csv \
+        --drop_first --spill_dir /tmp/sketches
+"""
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNK_ROWS = 100_000
+NULL_HASH = np.uint64(0x9E3779B97F4A7C15)
+_ROW_PRIME = np.uint64(0x100000001B3)
+
+
+class RowSketch:
+    """Multiset of 64-bit row hashes, in memory or spilled to hash-partitioned files."""
+    def __init__(self, partitions: int = 1, spill_dir: Optional[str] = None):
+        self.partitions = partitions
+        self.rows = 0
+        self._arrays: List[List[np.ndarray]] = [[] for _ in range(partitions)]
+        self._directory = None
+        self._files = None
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._directory = tempfile.mkdtemp(prefix="sketch_", dir=spill_dir)
+            self._files = [open(self._path(i), "ab") for i in range(partitions)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _path(self, partition: int) -> str:
+        return os.path.join(self._directory, f"part_{partition:04d}.u64")
+
+    def add(self, hashes: np.ndarray):
+        self.rows += len(hashes)
+        if self.partitions == 1:
+            parts = [hashes]
+        else:
+            part_ids = (hashes % np.uint64(self.partitions)).astype(np.int64)
+            order = np.argsort(part_ids, kind="stable")
+            bounds = np.cumsum(np.bincount(part_ids, minlength=self.partitions))[:-1]
+            parts = np.split(hashes[order], bounds)
+        for partition, part in enumerate(parts):
+            if not len(part):
+                continue
+            if self._files is not None:
+                part.astype(np.uint64).tofile(self._files[partition])
+            else:
+                self._arrays[partition].append(part)
+
+    def partition(self, partition: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Distinct hashes of a partition (sorted) and their multiplicities."""
+        if self._files is not None:
+            self._files[partition].flush()
+            values = np.fromfile(self._path(partition), dtype=np.uint64)
+        else:
+            arrays = self._arrays[partition]
+            values = np.concatenate(arrays) if arrays else np.empty(0, dtype=np.uint64)
+        return np.unique(values, return_counts=True)
+
+    def close(self):
+        if self._files is not None:
+            for f in self._files:
+                f.close()
+            self._files = None
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+        self._arrays = [[] for _ in range(self.partitions)]
+
+
+def matched_rows(a: RowSketch, b: RowSketch) -> int:
+    """Size of the multiset intersection of two sketches with the same partitioning."""
+    if a.partitions != b.partitions:
+        raise ValueError(f"Sketches are partitioned differently ({a.partitions} vs {b.partitions})")
+    matched = 0
+    for partition in range(a.partitions):
+        values_a, counts_a = a.partition(partition)
+        values_b, counts_b = b.partition(partition)
+        _, index_a, index_b = np.intersect1d(values_a, values_b, assume_unique=True, return_indices=True)
+        matched += int(np.minimum(counts_a[index_a], counts_b[index_b]).sum())
+    return matched
+
+
+def column_kinds(result: pd.DataFrame, columns: List[Any]) -> Dict[Any, str]:
+    """"number" for columns that are numeric (not boolean) in the result, "text" otherwise."""
+    kinds = {}
+    for col in columns:
+        dtype = result[col].dtype
+        numeric = pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+        kinds[col] = "number" if numeric else "text"
+    return kinds
+
+
+def _hash_column(series: pd.Series, kind: str, decimals: int) -> np.ndarray:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    present = series.notna().to_numpy()
+    if kind == "number":
+        numbers = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        parsed = ~np.isnan(numbers)
+        # + 0.0 folds -0.0 into 0.0
+        hashes = pd.util.hash_array(np.where(parsed, np.round(numbers, decimals) + 0.0, 0.0))
+        text = present & ~parsed
+        if text.any():
+            hashes[text] = pd.util.hash_array(series[text].astype(str).to_numpy(dtype=object))
+    else:
+        hashes = pd.util.hash_array(series.astype(str).to_numpy(dtype=object))
+    hashes[~present] = NULL_HASH
+    return hashes
+
+
+def hash_rows(df: pd.DataFrame, columns: List[Any], kinds: Dict[Any, str], decimals: int = 6) -> np.ndarray:
+    """One 64-bit hash per row of the canonical values of `columns`, in that order."""
+    rows = np.zeros(len(df), dtype=np.uint64)
+    for col in columns:
+        rows = rows * _ROW_PRIME ^ _hash_column(df[col], kinds[col], decimals)
+    return rows
+
+
+def csv_columns(file_path: str, drop_first: bool = False) -> List[Any]:
+    columns = list(pd.read_csv(file_path, nrows=0).columns)
+    return columns[1:] if drop_first else columns
+
+
+def _count_rows(file_path: str, chunk_rows: int) -> int:
+    return sum(len(chunk) for chunk in pd.read_csv(file_path, usecols=[0], chunksize=chunk_rows))
+
+
+def _sketch_csv(sketch: RowSketch, file_path: str, columns: List[Any], kinds: Dict[Any, str],
+                chunk_rows: int, decimals: int):
+    for chunk in pd.read_csv(file_path, usecols=columns, dtype=str, chunksize=chunk_rows):
+        sketch.add(hash_rows(chunk, columns, kinds, decimals))
+
+
+def streaming_similarity(result, target_file: str, drop_first: bool = False,
+                         chunk_rows: int = DEFAULT_CHUNK_ROWS, decimals: int = 6,
+                         partitions: Optional[int] = None, spill_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Exact-match and similarity scores of `result` (a DataFrame or the path of a CSV
+    without index column) against the target CSV, comparing rows as multisets (row
+    order is ignored). similarity = column ratio * matched rows / max(rows); it is 1.0
+    exactly when every target column is present and the rows match one to one.
+    """
+    from_file = isinstance(result, (str, os.PathLike))
+    if not from_file and not isinstance(result, pd.DataFrame):
+        raise TypeError(f"Expected a DataFrame result, got {type(result).__name__}")
+    columns = csv_columns(target_file, drop_first)
+    result_columns = set(csv_columns(result) if from_file else result.columns)
+    common = [col for col in dict.fromkeys(columns) if col in result_columns]
+    scores = {"exact_match": False, "similarity": 0.0, "column_similarity": 0.0, "matched_rows": 0,
+              "result_rows": 0, "target_rows": 0}
+    if partitions is None:
+        partitions = 16 if spill_dir is not None else 1
+    if not common:
+        scores["result_rows"] = _count_rows(result, chunk_rows) if from_file else len(result)
+        scores["target_rows"] = _count_rows(target_file, chunk_rows)
+        return scores
+    # Comparison kinds come from the result's dtypes (for a file, as inferred from its first chunk).
+    kinds = column_kinds(pd.read_csv(result, usecols=common, nrows=chunk_rows) if from_file else result, common)
+    with RowSketch(partitions, spill_dir) as result_sketch, RowSketch(partitions, spill_dir) as target_sketch:
+        if from_file:
+            _sketch_csv(result_sketch, result, common, kinds, chunk_rows, decimals)
+        else:
+            for start in range(0, len(result), chunk_rows):
+                result_sketch.add(hash_rows(result.iloc[start:start + chunk_rows], common, kinds, decimals))
+        _sketch_csv(target_sketch, target_file, common, kinds, chunk_rows, decimals)
+        scores["result_rows"] = result_sketch.rows
+        scores["target_rows"] = target_sketch.rows
+        if not result_sketch.rows or not target_sketch.rows:
+            return scores
+        scores["matched_rows"] = matched_rows(result_sketch, target_sketch)
+    col_ratio = len(common) / len(columns)
+    scores["column_similarity"] = col_ratio
+    scores["similarity"] = col_ratio * scores["matched_rows"] / max(scores["result_rows"], scores["target_rows"])
+    scores["exact_match"] = scores["similarity"] == 1.0
+    return scores
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description="Compare a result CSV with a target CSV by row hashes, in chunks")
+    parser.add_argument("--result", type=str, required=True, help="Result table (CSV without index column)")
+    parser.add_argument("--target", type=str, required=True, help="Target table (CSV)")
+    parser.add_argument("--drop_first", action="store_true", help="The target's first column is an index")
+    parser.add_argument("--chunk_rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--decimals", type=int, default=6, help="Numeric values are compared rounded to this many decimals")
+    parser.add_argument("--spill_dir", type=str, default=None, help="Keep row hashes in partition files here instead of memory")
+    args = parser.parse_args()
+
+    print(json.dumps(streaming_similarity(args.result, args.target, args.drop_first, args.chunk_rows,
+                                          args.decimals, spill_dir=args.spill_dir), indent=2))
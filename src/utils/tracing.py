@@ -0,0 +1,130 @@
+"""
+Lightweight span tracing exported as Chrome trace-event JSON (chrome://tracing, Perfetto).
+
+Tracing is off by default; `span` then returns a shared no-op context manager and
+`traced` functions only pay one flag check per call.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, Optional
+
+_ENABLED = False
+_EVENTS: List[Dict[str, Any]] = []
+_LOCK = threading.Lock()
+_NOOP = nullcontext()
+_ORIGIN = time.perf_counter()
+
+
+def enable():
+    global _ENABLED
+    _ENABLED = True
+
+
+def disable():
+    global _ENABLED
+    _ENABLED = False
+
+
+def is_enabled() -> bool:
+    return _ENABLED
+
+
+def reset():
+    """Drop recorded events, e.g. at the start of a new task."""
+    global _ORIGIN
+    with _LOCK:
+        _EVENTS.clear()
+        _ORIGIN = time.perf_counter()
+
+
+def _now_us() -> float:
+    return (time.perf_counter() - _ORIGIN) * 1e6
+
+
+@contextmanager
+def _span(name: str, category: str, args: Dict[str, Any]):
+    start = _now_us()
+    try:
+        yield args
+    finally:
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start,
+            "dur": _now_us() - start,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = {key: value if isinstance(value, (int, float, bool, str)) or value is None else str(value)
+                             for key, value in args.items()}
+        with _LOCK:
+            _EVENTS.append(event)
+
+
+def span(name: str, category: str = "mcts", **args):
+    """
+    Context manager recording one complete event. The yielded dict can be filled
+    with extra arguments while the span is open.
+    """
+    if not _ENABLED:
+        return _NOOP
+    return _span(name, category, args)
+
+
+def traced(name: Optional[str] = None, category: str = "mcts"):
+    """Decorator recording a span around every call of the function."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return func(*args, **kwargs)
+            with _span(span_name, category, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instant(name: str, category: str = "mcts", **args):
+    """Record a zero-duration marker event."""
+    if not _ENABLED:
+        return
+    event = {"name": name, "cat": category, "ph": "i", "s": "t", "ts": _now_us(),
+             "pid": os.getpid(), "tid": threading.get_ident(), "args": args}
+    with _LOCK:
+        _EVENTS.append(event)
+
+
+def events() -> List[Dict[str, Any]]:
+    with _LOCK:
+        return list(_EVENTS)
+
+
+def summary() -> Dict[str, Dict[str, float]]:
+    """Count and total / max duration in seconds per span name."""
+    result: Dict[str, Dict[str, float]] = {}
+    for event in events():
+        if event["ph"] != "X":
+            continue
+        stats = result.setdefault(event["name"], {"count": 0, "total": 0.0, "max": 0.0})
+        stats["count"] += 1
+        stats["total"] += event["dur"] / 1e6
+        stats["max"] = max(stats["max"], event["dur"] / 1e6)
+    return result
+
+
+def export(path: str, metadata: Optional[Dict[str, Any]] = None):
+    """Write the recorded events as a Chrome trace-event JSON file."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    trace = {"traceEvents": events(), "displayTimeUnit": "ms"}
+    if metadata:
+        trace["otherData"] = metadata
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(trace, f)
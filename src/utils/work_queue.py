@@ -0,0 +1,227 @@
+"""
+SQLite work queue of (base_path, length, num) tasks for multi-node runs.
+
+The database file lives on storage shared by all workers and needs no server.
+Workers claim one task at a time under a lease that a background thread renews
+with heartbeats; leases of crashed or stalled workers expire and the task is
+re-queued for the next claim, up to `max_attempts` claims per task.
+
+    python src/utils/work_queue.py --queue runs/queue.db stats
+    python src/utils/work_queue.py --queue runs/queue.db requeue --status failed
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    base_path TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    num INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    enqueued_at REAL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT,
+    UNIQUE (base_path, length, num)
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires);
+"""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Lease:
+    """A claimed task; renewed in the background while used as a context manager."""
+    def __init__(self, queue: "WorkQueue", task_id: int, base_path: str, length: int, num: int,
+                 attempts: int, worker: str):
+        self.queue = queue
+        self.task_id = task_id
+        self.base_path = base_path
+        self.length = length
+        self.num = num
+        self.attempts = attempts
+        self.worker = worker
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _heartbeat(self):
+        interval = max(self.queue.lease_seconds / 3, 0.1)
+        while not self._stop.wait(interval):
+            try:
+                if not self.queue.heartbeat(self.task_id, self.worker):
+                    # The lease expired and another worker took the task over.
+                    self.lost = True
+                    return
+            except sqlite3.Error:
+                # Shared storage hiccup; the next heartbeat retries before the lease runs out.
+                continue
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        if exc_type is not None and not self.lost:
+            self.queue.fail(self.task_id, self.worker, f"{exc_type.__name__}: {exc}")
+        return False
+
+    def complete(self, result: Optional[Dict[str, Any]] = None) -> bool:
+        return self.queue.complete(self.task_id, self.worker, result)
+
+    def fail(self, error: str, final: bool = False) -> bool:
+        return self.queue.fail(self.task_id, self.worker, error, final)
+
+
+class WorkQueue:
+    def __init__(self, path: str, lease_seconds: float = 300.0, max_attempts: int = 3, timeout: float = 60.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # Rollback journal rather than WAL: WAL needs shared memory, which network file systems lack.
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def enqueue(self, base_path: str, tasks: Iterable[Tuple[int, int]]) -> int:
+        """Add (length, num) tasks that are not in the queue yet; returns the number added."""
+        now = time.time()
+        rows = [(base_path, int(length), int(num), now) for length, num in tasks]
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO tasks (base_path, length, num, enqueued_at) VALUES (?, ?, ?, ?)", rows)
+            return conn.total_changes - before
+
+    def claim(self, worker: Optional[str] = None) -> Optional[Lease]:
+        """Lease the oldest queued task, or a task whose lease expired; None if there is none."""
+        worker = worker or default_worker_id()
+        now = time.time()
+        with self._transaction() as conn:
+            # Expired leases that used up their attempts are not retried again.
+            conn.execute("UPDATE tasks SET status = 'failed', error = 'lease expired', finished_at = ? "
+                         "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                         (now, now, self.max_attempts))
+            row = conn.execute(
+                "SELECT id, base_path, length, num, attempts FROM tasks "
+                "WHERE status = 'queued' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY attempts, id LIMIT 1", (now,)).fetchone()
+            if row is None:
+                return None
+            task_id, base_path, length, num, attempts = row
+            conn.execute("UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                         "started_at = ? WHERE id = ?", (worker, now + self.lease_seconds, now, task_id))
+        return Lease(self, task_id, base_path, length, num, attempts + 1, worker)
+
+    def heartbeat(self, task_id: int, worker: str) -> bool:
+        """Extend a lease; False if the worker no longer holds it."""
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE tasks SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                                  (time.time() + self.lease_seconds, task_id, worker))
+            return cursor.rowcount == 1
+
+    def complete(self, task_id: int, worker: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE tasks SET status = 'done', finished_at = ?, result = ?, error = NULL "
+                                  "WHERE id = ? AND worker = ? AND status = 'leased'",
+                                  (time.time(), json.dumps(result, default=str) if result is not None else None,
+                                   task_id, worker))
+            return cursor.rowcount == 1
+
+    def fail(self, task_id: int, worker: str, error: str, final: bool = False) -> bool:
+        """
+        Re-queue the task, or mark it failed once it has used up its attempts.
+        :param final: mark it failed now (for failures that another claim would repeat).
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = CASE WHEN ? OR attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "worker = NULL, lease_expires = NULL, error = ?, finished_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (final, self.max_attempts, error, time.time(), task_id, worker))
+            return cursor.rowcount == 1
+
+    def requeue(self, status: str = "failed") -> int:
+        """Put tasks with `status` back in the queue with fresh attempts."""
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE tasks SET status = 'queued', worker = NULL, lease_expires = NULL, attempts = 0 "
+                                  "WHERE status = ?", (status,))
+            return cursor.rowcount
+
+    def pending(self) -> int:
+        """Tasks that are queued or leased (running, or waiting for their lease to expire)."""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM tasks WHERE status IN ('queued', 'leased')").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+            workers = conn.execute("SELECT worker, COUNT(*) FROM tasks WHERE status = 'done' GROUP BY worker").fetchall()
+            durations = [row[0] for row in conn.execute(
+                "SELECT finished_at - started_at FROM tasks WHERE status = 'done'").fetchall()]
+        return {
+            "counts": counts,
+            "done_per_worker": dict(workers),
+            "mean_task_seconds": sum(durations) / len(durations) if durations else None,
+        }
+
+    def results(self) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT base_path, length, num, worker, result FROM tasks WHERE status = 'done' "
+                                "ORDER BY base_path, length, num").fetchall()
+        return [{"base_path": base_path, "length": length, "num": num, "worker": worker,
+                 "result": json.loads(result) if result else None}
+                for base_path, length, num, worker, result in rows]
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Inspect or reset a MontePrep work queue")
+    parser.add_argument("--queue", type=str, required=True, help="Queue database path")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Task counts per status and worker")
+    requeue_parser = subparsers.add_parser("requeue", help="Put tasks back in the queue")
+    requeue_parser.add_argument("--status", type=str, default="failed")
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.queue)
+    if args.command == "stats":
+        print(json.dumps(queue.stats(), indent=2))
+    elif args.command == "requeue":
+        print(f"Re-queued {queue.requeue(args.status)} task(s)")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules import as `src.x`, as when running with PYTHONPATH=. from the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
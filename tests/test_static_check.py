@@ -0,0 +1,94 @@
+"""Columns inferred by the static pre-check against the columns of real execution."""
+import pandas as pd
+import pytest
+
+from src.mcts.static_check import analyze_transformation
+
+
+def _tables():
+    return {
+        "test_0": pd.DataFrame({"id": [1, 2, 2], "city": ["a", "b", "b"], "DT_STRATA": ["x", "y", "z"],
+                                "amount": [1.0, 2.0, 3.0]}),
+        "test_1": pd.DataFrame({"id": [1, 2], "city": ["a", "c"], "score": [0.5, 0.7]}),
+    }
+
+
+def _execute(transformation):
+    env = {"pd": pd, **_tables()}
+    for code in transformation:
+        exec(code, env)
+    return env
+
+
+def _check(transformation, output_var="out"):
+    tables = {name: list(df.columns) for name, df in _tables().items()}
+    expected = list(_execute(transformation)[output_var].columns)
+    report = analyze_transformation(transformation, tables, expected)
+    assert not report.errors
+    assert not report.rejected
+    # Unknown columns (None) are allowed; known columns must be exactly what pandas produces.
+    if report.columns is not None:
+        assert list(report.columns) == expected
+    return report
+
+
+def test_assign():
+    report = _check(["out = test_0.assign(total=test_0['amount'] * 2, flag=1)"])
+    assert report.columns == ["id", "city", "DT_STRATA", "amount", "total", "flag"]
+
+
+def test_assign_unpacked_kwargs_are_unknown():
+    report = _check([
+        'out = test_0[["DT_STRATA"]].rename(columns={"DT_STRATA": "CST"})',
+        'out = out.assign(**{f"{i}:00": 0 for i in range(1, 25)})',
+    ])
+    assert report.columns is None
+
+
+def test_rename_unpacked_kwargs_are_unknown():
+    report = _check(['out = test_0.rename(**{"columns": {"city": "town"}})'])
+    assert report.columns is None
+
+
+def test_rename():
+    report = _check(['out = test_0.rename(columns={"city": "town", "amount": "total"})'])
+    assert report.columns == ["id", "town", "DT_STRATA", "total"]
+
+
+@pytest.mark.parametrize("code", [
+    'out = test_0.merge(test_1, on="id")',
+    'out = pd.merge(test_0, test_1, on="id", suffixes=("_l", "_r"))',
+    'out = test_0.merge(test_1, left_on="id", right_on="id", how="left")',
+])
+def test_merge_suffixes(code):
+    report = _check([code])
+    assert report.columns is not None
+
+
+@pytest.mark.parametrize("code", [
+    'out = test_0.groupby("city", as_index=False)["amount"].sum()',
+    'out = test_0.groupby("city").agg(total=("amount", "sum")).reset_index()',
+    'out = test_0.groupby(["city", "id"], as_index=False).agg({"amount": "mean"})',
+])
+def test_groupby_agg(code):
+    _check([code])
+
+
+def test_pivot():
+    _check(['out = test_0.pivot_table(index="city", columns="DT_STRATA", values="amount").reset_index()'])
+
+
+@pytest.mark.parametrize("code", [
+    'out = pd.concat([test_0, test_1])',
+    'out = pd.concat([test_0[["id", "city"]], test_1[["id", "city"]]], ignore_index=True)',
+])
+def test_concat(code):
+    _check([code])
+
+
+@pytest.mark.parametrize("code", [
+    'out = test_0.melt(id_vars=["id"], value_vars=["city", "DT_STRATA"])',
+    'out = pd.melt(test_0, id_vars="id", var_name="field", value_name="content")',
+])
+def test_melt(code):
+    _check([code])